@@ -0,0 +1,12 @@
+"""
+Async versions of read-only account views, routed by config/urls_async.py
+when the project runs under ASGI. Responses match the views in views.py.
+"""
+from . import views
+from .authentication import async_api_view, json_response
+from .serializers import UserSerializer
+
+@async_api_view(views.get_user_profile)
+async def get_user_profile(request):
+    # AsyncJWTAuthentication loads request.user with its profile
+    return json_response(UserSerializer(request.user).data)
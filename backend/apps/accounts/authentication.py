@@ -0,0 +1,146 @@
+import functools
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.translation import gettext_lazy as _
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .cache import user_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that takes the user from user_cache: a request with
+    a cached user runs no authentication query, and the user comes with
+    its profile. A miss loads both in one query and caches them.
+    """
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user = self.get_cached_user(user_id)
+        if user is None:
+            try:
+                user = self.user_model.objects.select_related('profile').get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            user_cache.set(user)
+        return self.check_user(user, validated_token)
+
+    def get_cached_user(self, user_id):
+        # The cache is keyed by primary key
+        if api_settings.USER_ID_FIELD != self.user_model._meta.pk.name:
+            return None
+        return user_cache.get(user_id)
+
+    def check_user(self, user, validated_token):
+        """The checks JWTAuthentication.get_user() makes on the loaded user"""
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+
+        return user
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """
+    CachedJWTAuthentication for async views. Reading and validating the
+    token is pure computation and runs inline; the user cache is read with
+    the async cache API, and a user missing from it is loaded with the
+    async ORM.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        """Async counterpart of get_user()"""
+        user_id = self.get_user_id(validated_token)
+        user = await self.aget_cached_user(user_id)
+        if user is None:
+            try:
+                user = await self.user_model.objects.select_related('profile').aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            await user_cache.aset(user)
+        if api_settings.CHECK_REVOKE_TOKEN and 'password' in user.get_deferred_fields():
+            # Cached users come without the password hash
+            await user.arefresh_from_db(fields=['password'])
+        return self.check_user(user, validated_token)
+
+    async def aget_cached_user(self, user_id):
+        if api_settings.USER_ID_FIELD != self.user_model._meta.pk.name:
+            return None
+        return await user_cache.aget(user_id)
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    """JSON rendered exactly as DRF's Response would render it"""
+    return HttpResponse(JSONRenderer().render(data), status=status, headers=headers,
+                        content_type='application/json')
+
+
+def async_api_view(sync_view=None, authenticator=None):
+    """
+    Decorator for async read-only views: the async counterpart of
+    @api_view + @permission_classes([IsAuthenticated]).
+
+    GET and HEAD run the decorated view with request.user set by
+    ``authenticator`` (AsyncJWTAuthentication by default: any object with
+    an async aauthenticate()), and API exceptions (401, 404, ...) are
+    answered the way DRF's exception handler would. Every other method is
+    handed to ``sync_view``, the synchronous DRF view of the same URL, so
+    the route keeps its writes, 405s and OPTIONS responses; without one
+    they get 405.
+    """
+    if authenticator is None:
+        authenticator = AsyncJWTAuthentication()
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                if sync_view is None:
+                    return json_response({'detail': f'Method "{request.method}" not allowed.'},
+                                         status=status.HTTP_405_METHOD_NOT_ALLOWED, headers={'Allow': 'GET, HEAD'})
+                return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+            try:
+                result = await authenticator.aauthenticate(request)
+                if result is None:
+                    raise NotAuthenticated()
+                request.user, request.auth = result
+                return await view(request, *args, **kwargs)
+            except APIException as exc:
+                detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+                headers = None
+                if isinstance(exc, (NotAuthenticated, exceptions.AuthenticationFailed)):
+                    headers = {'WWW-Authenticate': authenticator.authenticate_header(request)}
+                return json_response(detail, status=exc.status_code, headers=headers)
+
+        # Token authentication only: no session cookie to protect
+        return csrf_exempt(wrapper)
+
+    return decorator
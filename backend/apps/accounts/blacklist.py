@@ -0,0 +1,161 @@
+"""
+Blacklist of refresh tokens, built for token rotation under load.
+
+Every refresh blacklists the token it consumed, so the table takes one
+row per refresh and lookups are almost always negative. Rows carry the
+token's expiry and are pruned once it passes (an expired token is refused
+anyway). Lookups are answered from a per-process Bloom filter of the
+blacklisted ids: a negative needs no query, and a positive (rarely false)
+is confirmed against the table.
+
+Each process pulls rows added by the others into its filter at most every
+SYNC_INTERVAL seconds, so is_blacklisted() may miss an entry that recent.
+Rotation does not rely on it: add() inserts the id under a unique
+constraint, so a token can be consumed only once across all processes.
+"""
+import contextlib
+import hashlib
+import math
+import threading
+import time
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import BlacklistedToken
+
+DEFAULT_TOKEN_BLACKLIST_SETTINGS = {
+    'CAPACITY': 1_000_000,
+    'ERROR_RATE': 0.001,
+    'SYNC_INTERVAL': 5,
+}
+
+MASK64 = (1 << 64) - 1
+
+
+class BloomFilter:
+    """
+    Set membership with no false negatives and ``error_rate`` false
+    positives at ``capacity`` keys. Keys are hashed once with BLAKE2b and
+    the bit positions derived by double hashing.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    @staticmethod
+    def _digest(key):
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+    def _positions(self, key):
+        digest = self._digest(key)
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+        return [((h1 + i * h2) & MASK64) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, keys):
+        """add() for many keys, with the bit positions computed by NumPy"""
+        if not keys:
+            return
+        digests = np.frombuffer(b''.join(map(self._digest, keys)), dtype='<u8').reshape(-1, 2)
+        # uint64 arithmetic wraps like the & MASK64 in _positions()
+        positions = (digests[:, :1] + np.arange(self.hashes, dtype=np.uint64) * digests[:, 1:]) % np.uint64(self.size)
+        positions = positions.ravel()
+        np.bitwise_or.at(np.frombuffer(self.bits, dtype=np.uint8), positions >> np.uint64(3),
+                         np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+        self.count += len(keys)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class TokenBlacklist:
+    """
+    BlacklistedToken rows with a Bloom filter in front. The filter is built
+    on first use from the unexpired rows, and rebuilt (dropping expired
+    ones) once it holds more than its capacity.
+    """
+    # Rows read per query while building the filter
+    chunk_size = 50000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._last_id = 0
+        self._synced_at = 0.0
+
+    @property
+    def config(self):
+        return {**DEFAULT_TOKEN_BLACKLIST_SETTINGS, **getattr(settings, 'TOKEN_BLACKLIST', {})}
+
+    def _load(self, bloom, rows):
+        """Add (id, jti) rows to ``bloom`` in chunks; returns the last id"""
+        last_id = self._last_id
+        jtis = []
+        for row_id, jti in rows.iterator(chunk_size=self.chunk_size):
+            jtis.append(jti)
+            last_id = row_id
+            if len(jtis) == self.chunk_size:
+                bloom.update(jtis)
+                jtis = []
+        bloom.update(jtis)
+        return last_id
+
+    def _rebuild(self):
+        config = self.config
+        live = BlacklistedToken.objects.filter(expires_at__gt=timezone.now())
+        bloom = BloomFilter(max(config['CAPACITY'], live.count() * 2), config['ERROR_RATE'])
+        self._last_id = 0
+        self._last_id = self._load(bloom, live.order_by('id').values_list('id', 'jti'))
+        self._filter = bloom
+
+    def sync(self, force=False):
+        """Add rows blacklisted since the last sync (by any process) to the filter"""
+        with self._lock:
+            if self._filter is None:
+                self._rebuild()
+            elif force or time.monotonic() - self._synced_at >= self.config['SYNC_INTERVAL']:
+                rows = BlacklistedToken.objects.filter(id__gt=self._last_id).order_by('id').values_list('id', 'jti')
+                self._last_id = self._load(self._filter, rows)
+                if self._filter.count > self._filter.capacity:
+                    self._rebuild()
+            else:
+                return
+            self._synced_at = time.monotonic()
+
+    def is_blacklisted(self, jti):
+        self.sync()
+        if jti not in self._filter:
+            return False
+        return BlacklistedToken.objects.filter(jti=jti).exists()
+
+    def add(self, jti, expires_at):
+        """Blacklist ``jti``; returns False if it already was"""
+        # A failed INSERT only needs a savepoint inside a transaction
+        atomic = transaction.atomic() if transaction.get_connection().in_atomic_block else contextlib.nullcontext()
+        try:
+            with atomic:
+                BlacklistedToken.objects.create(jti=jti, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+        return True
+
+    def reset(self):
+        """Drop the filter; the next lookup rebuilds it"""
+        with self._lock:
+            self._filter = None
+            self._last_id = 0
+
+
+token_blacklist = TokenBlacklist()
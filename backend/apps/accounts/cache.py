@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+DEFAULT_USER_CACHE_SETTINGS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+}
+
+
+class UserCache:
+    """
+    The authenticated user and profile by user id, so token authentication
+    needs no query on a hit.
+
+    Entries hold the users' field values, not model instances: users are
+    rebuilt with from_db() as if just loaded, with the profile attached.
+    The password hash is left out (it loads on access, as a deferred
+    field). Saving or deleting a user or profile invalidates its entry
+    after commit (see signals.py); writes that bypass signals (update(),
+    raw SQL) show within TIMEOUT. The cache alias and timeout come from
+    the ACCOUNTS_USER_CACHE setting: with the default local memory cache
+    the entries are per process.
+    """
+    key_prefix = 'accounts:user:'
+    excluded_fields = {'password'}
+
+    @property
+    def config(self):
+        return {**DEFAULT_USER_CACHE_SETTINGS, **getattr(settings, 'ACCOUNTS_USER_CACHE', {})}
+
+    @property
+    def cache(self):
+        return caches[self.config['ALIAS']]
+
+    def key(self, user_id):
+        return f"{self.key_prefix}{user_id}"
+
+    @staticmethod
+    def _values(instance, exclude=()):
+        return {
+            field.attname: getattr(instance, field.attname)
+            for field in instance._meta.concrete_fields
+            if field.attname not in exclude
+        }
+
+    @staticmethod
+    def _from_values(model, values):
+        return model.from_db(DEFAULT_DB_ALIAS, list(values), list(values.values()))
+
+    def get(self, user_id):
+        """The cached user with its profile, or None"""
+        return self._from_entry(self.cache.get(self.key(user_id)))
+
+    async def aget(self, user_id):
+        return self._from_entry(await self.cache.aget(self.key(user_id)))
+
+    def _from_entry(self, entry):
+        if entry is None:
+            return None
+
+        user_values, profile_values = entry
+        user = self._from_values(User, user_values)
+        profile_field = User._meta.get_field('profile')
+        if profile_values is None:
+            profile_field.set_cached_value(user, None)
+        else:
+            profile = self._from_values(profile_field.related_model, profile_values)
+            profile_field.set_cached_value(user, profile)
+            profile_field.remote_field.set_cached_value(profile, user)
+        return user
+
+    def set(self, user):
+        """Cache ``user``, loaded with select_related('profile')"""
+        self.cache.set(self.key(user.pk), self._entry(user), self.config['TIMEOUT'])
+
+    async def aset(self, user):
+        await self.cache.aset(self.key(user.pk), self._entry(user), self.config['TIMEOUT'])
+
+    def _entry(self, user):
+        profile = getattr(user, 'profile', None)
+        return (
+            self._values(user, exclude=self.excluded_fields),
+            None if profile is None else self._values(profile),
+        )
+
+    def invalidate(self, user_ids):
+        self.cache.delete_many([self.key(user_id) for user_id in user_ids])
+
+
+user_cache = UserCache()
@@ -0,0 +1,276 @@
+"""
+Profile picture storage and resized variants.
+
+An upload is stored under the SHA-256 of its bytes, and its variants
+(square crops, each as WebP and JPEG) under the same digest, so identical
+uploads share their files and are rendered once. Every path is built
+from the digest alone. Rendering runs on a process-wide thread pool after
+the upload commits; with ACCOUNTS_PICTURE_WORKERS = 0 it is left to
+``manage.py process_profile_pictures``.
+
+Media files are public, so the upload itself is never stored: the
+"original" is a JPEG re-encoded from it, rotated upright from its EXIF
+orientation and without metadata (EXIF, GPS, ICC profiles), like the
+variants.
+
+Profiles holding a digest share its files. store_picture and
+remove_picture lock the profiles involved, so a picture's files are never
+deleted while another upload of the same image is taking them over.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+from .cache import user_cache
+from .models import Profile
+
+logger = logging.getLogger(__name__)
+
+# name: edge in pixels. thumbnail covers the 40-80px avatars on high-DPI screens
+PICTURE_VARIANTS = {
+    'thumbnail': 128,
+    'medium': 512,
+}
+PICTURE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+ORIGINAL_FORMAT = ('JPEG', {'quality': 90, 'optimize': True})
+# Refuse images larger than this before decoding them (decompression bombs)
+MAX_PICTURE_PIXELS = 40_000_000
+
+PICTURE_DIRECTORY = 'profiles'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process-wide pool that renders picture variants off the request thread"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.ACCOUNTS_PICTURE_WORKERS,
+                thread_name_prefix='pictures'
+            )
+        return _executor
+
+
+def picture_digest(upload):
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    upload.seek(0)
+    return digest.hexdigest()
+
+
+def is_image(upload):
+    """Whether Pillow recognises ``upload`` (reads the header only)"""
+    try:
+        with Image.open(upload):
+            return True
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return False
+    finally:
+        upload.seek(0)
+
+
+def original_path(digest):
+    return f"{PICTURE_DIRECTORY}/{digest[:2]}/{digest}.jpg"
+
+
+def variant_path(digest, variant, extension):
+    return f"{PICTURE_DIRECTORY}/{digest[:2]}/{digest}_{variant}.{extension}"
+
+
+def variant_paths(digest):
+    return [
+        variant_path(digest, variant, extension)
+        for variant in PICTURE_VARIANTS
+        for extension in PICTURE_FORMATS
+    ]
+
+
+def variant_urls(profile):
+    """{'thumbnail': {'size': 128, 'webp': url, 'jpeg': url}, ...} once rendered, else None"""
+    if profile.picture_status != 'READY':
+        return None
+    return {
+        variant: {
+            'size': size,
+            **{extension: default_storage.url(variant_path(profile.picture_digest, variant, extension))
+               for extension in PICTURE_FORMATS},
+        }
+        for variant, size in PICTURE_VARIANTS.items()
+    }
+
+
+def decode_picture(source, draft_size=None):
+    """
+    The image in ``source``, upright, as RGB and without metadata.
+    ``draft_size`` lets JPEG decoding skip detail smaller variants don't need.
+    """
+    with Image.open(source) as image:
+        if image.width * image.height > MAX_PICTURE_PIXELS:
+            raise ValueError(f"Image too large ({image.width}x{image.height})")
+        if draft_size:
+            image.draft('RGB', (draft_size, draft_size))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # Flatten transparency (and palettes) onto white: JPEG has no alpha
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+    # Some encoders copy EXIF and ICC profiles from here unless told otherwise
+    image.info = {}
+    return image
+
+
+def encode_original(upload):
+    """``upload`` re-encoded for public storage (see the module docstring)"""
+    try:
+        image = decode_picture(upload)
+    finally:
+        upload.seek(0)
+    image_format, options = ORIGINAL_FORMAT
+    output = io.BytesIO()
+    image.save(output, image_format, **options)
+    return ContentFile(output.getvalue())
+
+
+def render_variants(source):
+    """{(variant, extension): encoded bytes} for the image in ``source``"""
+    # JPEG: decode at the smallest scale that still covers the largest variant
+    image = decode_picture(source, draft_size=max(PICTURE_VARIANTS.values()))
+
+    rendered = {}
+    # Largest first: each smaller variant is resized from the previous one
+    for variant, size in sorted(PICTURE_VARIANTS.items(), key=lambda item: -item[1]):
+        image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        for extension, (image_format, options) in PICTURE_FORMATS.items():
+            output = io.BytesIO()
+            image.save(output, image_format, **options)
+            rendered[variant, extension] = output.getvalue()
+    return rendered
+
+
+def variants_exist(digest):
+    return all(default_storage.exists(path) for path in variant_paths(digest))
+
+
+def store_picture(profile, upload):
+    """
+    Point ``profile`` at ``upload`` in place of its current picture, saving
+    the file unless an identical upload is already stored, and queue its
+    variants unless they exist. Saves the profile.
+    """
+    digest = picture_digest(upload)
+    with transaction.atomic():
+        # This profile, and the ones holding the same image: they can't
+        # release its files while this one takes them over
+        locked = list(
+            Profile.objects.select_for_update()
+            .filter(Q(id=profile.id) | Q(picture_digest=digest)).order_by('id')
+        )
+        current = next(row for row in locked if row.id == profile.id)
+        if current.profile_picture and current.picture_digest != digest:
+            release_picture(current)
+
+        path = original_path(digest)
+        if not default_storage.exists(path):
+            saved = default_storage.save(path, encode_original(upload))
+            if saved != path:
+                # Stored concurrently by an upload no profile held yet
+                default_storage.delete(saved)
+
+        profile.profile_picture = path
+        profile.picture_digest = digest
+        profile.picture_status = 'READY' if variants_exist(digest) else 'PENDING'
+        profile.save(update_fields=['profile_picture', 'picture_digest', 'picture_status', 'updated_at'])
+
+    if profile.picture_status == 'PENDING' and settings.ACCOUNTS_PICTURE_WORKERS > 0:
+        profile_id = profile.id
+        transaction.on_commit(lambda: get_executor().submit(_process_in_thread, profile_id, digest))
+
+
+def remove_picture(profile):
+    """Delete ``profile``'s picture (its files unless shared) and save it"""
+    with transaction.atomic():
+        release_picture(Profile.objects.select_for_update().get(id=profile.id))
+        profile.profile_picture = None
+        profile.picture_digest = ''
+        profile.picture_status = ''
+        profile.save()
+
+
+def release_picture(profile):
+    """
+    Delete the profile's picture files unless another profile uses the
+    same upload. Call inside the transaction that replaces or clears the
+    picture, with the profile locked (select_for_update): a concurrent
+    store_picture of the same image then waits for this to commit, and
+    stores the files again. Does not save the profile.
+    """
+    name = profile.profile_picture.name if profile.profile_picture else ''
+    if profile.picture_digest:
+        if Profile.objects.filter(picture_digest=profile.picture_digest).exclude(id=profile.id).exists():
+            return
+        paths = [original_path(profile.picture_digest)] + variant_paths(profile.picture_digest)
+        if name and name not in paths:
+            paths.append(name)  # Stored before paths were digest-only
+    else:
+        paths = [name] if name else []  # Uploaded before variants existed
+
+    for path in paths:
+        if default_storage.exists(path):
+            default_storage.delete(path)
+
+
+def process_picture(profile_id, digest):
+    """
+    Render and store the variants of the picture with ``digest``. Returns
+    True if they are READY; False if it failed or the profile has moved on
+    to another picture.
+    """
+    profile = Profile.objects.filter(id=profile_id, picture_digest=digest).first()
+    if profile is None:
+        return False
+
+    try:
+        if not variants_exist(digest):
+            with profile.profile_picture.open('rb') as source:
+                rendered = render_variants(source)
+            for (variant, extension), data in rendered.items():
+                path = variant_path(digest, variant, extension)
+                if not default_storage.exists(path):
+                    default_storage.save(path, ContentFile(data))
+        status = 'READY'
+    except Exception:
+        logger.exception("Rendering profile picture %s failed", digest)
+        status = 'FAILED'
+
+    # Only if the picture is still the profile's. update() sends no
+    # post_save, so drop the cached user here
+    updated = Profile.objects.filter(id=profile_id, picture_digest=digest).update(picture_status=status)
+    if updated:
+        user_cache.invalidate([profile.user_id])
+    return bool(updated) and status == 'READY'
+
+
+def _process_in_thread(profile_id, digest):
+    try:
+        process_picture(profile_id, digest)
+    finally:
+        # Worker threads get their own connection; don't leak it
+        connection.close()
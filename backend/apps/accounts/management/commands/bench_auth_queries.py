@@ -0,0 +1,65 @@
+import time
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.accounts.authentication import CachedJWTAuthentication
+from apps.accounts.cache import user_cache
+from apps.banking.management.benchmark import BenchmarkCommand
+from apps.banking.models import Account
+
+MODES = ['jwt', 'cached-cold', 'cached-warm']
+
+
+class Command(BenchmarkCommand):
+    help = ("Compare queries and time per request of read-only endpoints with JWTAuthentication "
+            "and CachedJWTAuthentication, cold and warm (writes to the configured database)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and mode')
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username='bench_auth_queries')
+        try:
+            account = Account.objects.create(user=user, balance=Decimal('100.00'))
+            token = str(AccessToken.for_user(user))
+            paths = ['/api/auth/profile/', f'/api/banking/accounts/{account.id}/balance/',
+                     '/api/banking/accounts/', '/api/banking/transactions/recent/']
+
+            self.stdout.write(f"{'endpoint':<36} {'mode':<12} {'queries':>8} {'ms/req':>8}")
+            for path in paths:
+                for mode in MODES:
+                    queries, elapsed = self._run(path, token, user, mode, options['requests'])
+                    self.stdout.write(f"{path:<36} {mode:<12} {queries:>8.1f} {elapsed * 1000:>8.3f}")
+        finally:
+            user.delete()
+
+    def _run(self, path, token, user, mode, requests):
+        """Mean queries and seconds per request of ``path`` in ``mode``"""
+        match = resolve(path)
+        view_class = match.func.cls
+        original = view_class.authentication_classes
+        view_class.authentication_classes = [JWTAuthentication if mode == 'jwt' else CachedJWTAuthentication]
+        factory = RequestFactory()
+        try:
+            # Warm-up, which also fills the balance cache and the user cache
+            match.func(factory.get(path, HTTP_AUTHORIZATION=f'Bearer {token}'), *match.args, **match.kwargs)
+            queries = 0
+            elapsed = 0.0
+            for _ in range(requests):
+                if mode == 'cached-cold':
+                    user_cache.invalidate([user.id])
+                request = factory.get(path, HTTP_AUTHORIZATION=f'Bearer {token}')
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = match.func(request, *match.args, **match.kwargs)
+                    response.render()
+                    elapsed += time.perf_counter() - started
+                queries += len(captured)
+            return queries / requests, elapsed / requests
+        finally:
+            view_class.authentication_classes = original
@@ -0,0 +1,105 @@
+import time
+import uuid
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+from apps.accounts.blacklist import token_blacklist
+from apps.accounts.models import BlacklistedToken
+from apps.accounts.serializers import RotatingTokenRefreshSerializer
+from apps.banking.management.benchmark import BenchmarkCommand
+
+
+class QueryCounter:
+    """Counts queries without keeping them (CaptureQueriesContext keeps only the last 9000)"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def lookup_refresh(token):
+    """Baseline: the blacklist lookup query every refresh makes without the filter"""
+    if BlacklistedToken.objects.filter(jti=token['jti']).exists():
+        raise ValueError('Token is blacklisted')
+    BlacklistedToken.objects.create(jti=token['jti'], expires_at=timezone.now() + timedelta(days=7))
+    token.set_jti()
+    return str(token)
+
+
+def filtered_refresh(token):
+    """Shipped path: the full refresh serializer"""
+    serializer = RotatingTokenRefreshSerializer(data={'refresh': str(token)})
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data['refresh']
+
+
+class Command(BenchmarkCommand):
+    help = ("Benchmark token refreshes against a blacklist seeded with rotated tokens "
+            "(writes to the configured database)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tokens', type=int, default=2_000_000, help='Blacklisted tokens to seed')
+        parser.add_argument('--refreshes', type=int, default=2000, help='Refreshes per strategy')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username='bench_token_refresh')
+        marker = timezone.now()
+        try:
+            self._seed(options['tokens'], options['batch_size'])
+
+            token_blacklist.reset()
+            started = time.perf_counter()
+            token_blacklist.sync()
+            bloom = token_blacklist._filter
+            self.stdout.write(f"Filter built in {time.perf_counter() - started:.2f}s: {bloom.count} ids, "
+                              f"{len(bloom.bits) / 2**20:.1f} MiB, {bloom.hashes} hashes")
+
+            # The check alone, for ids that are not blacklisted (every legitimate refresh)
+            jtis = [uuid.uuid4().hex for _ in range(options['refreshes'])]
+            for name, check in [('lookup query', lambda jti: BlacklistedToken.objects.filter(jti=jti).exists()),
+                                ('bloom filter', token_blacklist.is_blacklisted)]:
+                started = time.perf_counter()
+                for jti in jtis:
+                    check(jti)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"check   {name:<13} {elapsed / len(jtis) * 1e6:>9.1f} us/check")
+
+            for name, refresh in [('lookup query', lookup_refresh), ('bloom filter', filtered_refresh)]:
+                token = RefreshToken.for_user(user)
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    started = time.perf_counter()
+                    for _ in range(options['refreshes']):
+                        token = RefreshToken(refresh(token))
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(f"refresh {name:<13} {options['refreshes'] / elapsed:>9.1f} refreshes/s, "
+                                  f"{counter.count / options['refreshes']:.2f} queries/refresh")
+
+            # A replayed token is refused
+            token = RefreshToken.for_user(user)
+            filtered_refresh(token)
+            try:
+                filtered_refresh(token)
+                self.stdout.write(self.style.ERROR("Replayed refresh token was accepted"))
+            except Exception:
+                self.stdout.write("Replayed refresh token refused")
+        finally:
+            BlacklistedToken.objects.filter(created_at__gte=marker).delete()
+            token_blacklist.reset()
+            user.delete()
+
+    def _seed(self, count, batch_size):
+        expires_at = timezone.now() + timedelta(days=7)
+        started = time.perf_counter()
+        for offset in range(0, count, batch_size):
+            BlacklistedToken.objects.bulk_create([
+                BlacklistedToken(jti=uuid.uuid4().hex, expires_at=expires_at)
+                for _ in range(min(batch_size, count - offset))
+            ])
+        self.stdout.write(f"Seeded {count} blacklisted tokens in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,27 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import connection
+from apps.accounts.images import process_picture
+from apps.accounts.models import Profile
+
+
+class Command(BaseCommand):
+    help = "Render the resized variants of pending profile pictures (out-of-process picture worker)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2)
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry FAILED pictures')
+
+    def handle(self, *args, **options):
+        statuses = ['PENDING', 'FAILED'] if options['retry_failed'] else ['PENDING']
+        pending = list(Profile.objects.filter(picture_status__in=statuses).values_list('id', 'picture_digest'))
+
+        def process(item):
+            try:
+                return process_picture(*item)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            processed = sum(pool.map(process, pending))
+        self.stdout.write(f"Rendered {processed}/{len(pending)} profile pictures")
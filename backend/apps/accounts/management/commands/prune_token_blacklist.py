@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.accounts.models import BlacklistedToken
+
+
+class Command(BaseCommand):
+    help = "Delete blacklisted tokens that have expired"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted = 0
+        while True:
+            ids = list(BlacklistedToken.objects.filter(expires_at__lte=now).values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += BlacklistedToken.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired blacklisted tokens"))
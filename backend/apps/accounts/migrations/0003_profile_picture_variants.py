@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_blacklistedtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='picture_digest',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='picture_status',
+            field=models.CharField(blank=True, choices=[('PENDING', 'Pending'), ('READY', 'Ready'), ('FAILED', 'Failed')], max_length=10),
+        ),
+    ]
@@ -2,13 +2,24 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
 class Profile(models.Model):
+    PICTURE_STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('READY', 'Ready'),
+        ('FAILED', 'Failed'),
+    ]
+
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
     phone_number = models.CharField(max_length=20, blank=True)
     address = models.TextField(blank=True)
     date_of_birth = models.DateField(null=True, blank=True)
     profile_picture = models.ImageField(upload_to='profiles/', null=True, blank=True)
+    # SHA-256 of the uploaded picture, which names its stored files (see
+    # images.py), and whether its resized variants have been rendered
+    picture_digest = models.CharField(max_length=64, blank=True)
+    picture_status = models.CharField(max_length=10, choices=PICTURE_STATUS_CHOICES, blank=True)
     kyc_verified = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -20,4 +31,19 @@ class Profile(models.Model):
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
-        Profile.objects.create(user=instance)
\ No newline at end of file
+        Profile.objects.create(user=instance)
+
+
+class BlacklistedToken(models.Model):
+    """
+    A refresh token that may no longer be used: rotated away by
+    RotatingTokenRefreshSerializer (see blacklist.py). Rows are only needed
+    until the token itself expires; ``manage.py prune_token_blacklist``
+    deletes them after that.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.jti} (expires {self.expires_at:%Y-%m-%d %H:%M})"
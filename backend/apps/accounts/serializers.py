@@ -1,12 +1,26 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from .authentication import CachedJWTAuthentication
+from .blacklist import token_blacklist
+from .images import variant_urls
 from .models import Profile
 
 class ProfileSerializer(serializers.ModelSerializer):
+    # Resized copies of profile_picture, null until they are rendered
+    profile_picture_variants = serializers.SerializerMethodField()
+    
     class Meta:
         model = Profile
-        fields = ['phone_number', 'address', 'date_of_birth', 'profile_picture', 'kyc_verified']
+        fields = ['phone_number', 'address', 'date_of_birth', 'profile_picture', 'profile_picture_variants', 'kyc_verified']
+    
+    def get_profile_picture_variants(self, profile):
+        return variant_urls(profile)
 
 class UserSerializer(serializers.ModelSerializer):
     profile = ProfileSerializer(read_only=True)
@@ -32,4 +46,37 @@ class RegisterSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data.pop('password2')
         user = User.objects.create_user(**validated_data)
-        return user
\ No newline at end of file
+        return user
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    TokenRefreshSerializer backed by token_blacklist instead of simplejwt's
+    token_blacklist app: a blacklisted refresh token is refused, and with
+    BLACKLIST_AFTER_ROTATION the token consumed by a rotation is
+    blacklisted until it expires. The user comes from the user cache.
+    """
+    
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        jti = refresh[api_settings.JTI_CLAIM]
+        if token_blacklist.is_blacklisted(jti):
+            raise TokenError(_("Token is blacklisted"))
+        
+        user = CachedJWTAuthentication().get_user(refresh)
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        
+        data = {'access': str(refresh.access_token)}
+        
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                # Consumes the token: of two concurrent refreshes with it, one fails here
+                if not token_blacklist.add(jti, datetime_from_epoch(refresh['exp'])):
+                    raise TokenError(_("Token is blacklisted"))
+            
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data['refresh'] = str(refresh)
+        
+        return data
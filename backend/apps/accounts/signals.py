@@ -0,0 +1,18 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import user_cache
+from .models import Profile
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    transaction.on_commit(lambda: user_cache.invalidate([instance.pk]))
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile_user_cache(sender, instance, **kwargs):
+    transaction.on_commit(lambda: user_cache.invalidate([instance.user_id]))
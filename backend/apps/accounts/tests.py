@@ -1,3 +1,201 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from .authentication import AsyncJWTAuthentication
+from .blacklist import BloomFilter, token_blacklist
+from .cache import user_cache
+from .images import PICTURE_FORMATS, PICTURE_VARIANTS, process_picture, variant_path
+from .models import BlacklistedToken, Profile
 
-# Create your tests here.
+
+class CachedAuthenticationTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user('alice', password='x', first_name='Alice')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def profile(self):
+        response = self.client.get(reverse('accounts:get_user_profile'))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_cached_user_needs_no_authentication_query(self):
+        self.profile()
+
+        with CaptureQueriesContext(connection) as queries:
+            self.profile()
+
+        self.assertFalse(any('"auth_user"' in query['sql'] for query in queries))
+
+    def test_saving_the_user_invalidates_its_entry_after_commit(self):
+        self.profile()
+        self.assertIsNotNone(user_cache.get(self.user.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.first_name = 'Alicia'
+            self.user.save()
+
+        self.assertIsNone(user_cache.get(self.user.id))
+        self.assertEqual(self.profile().data['first_name'], 'Alicia')
+
+    def test_async_authentication_shares_the_cache(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        authenticate = async_to_sync(AsyncJWTAuthentication().aauthenticate)
+        authenticate(request)
+        self.assertIsNotNone(user_cache.get(self.user.id))
+
+        with self.assertNumQueries(0):
+            user, _ = authenticate(request)
+
+        self.assertEqual(user.first_name, 'Alice')
+
+
+class TokenRotationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='x')
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post(reverse('accounts:token_refresh'), {'refresh': str(token)}, format='json')
+
+    def test_refresh_token_can_be_used_once(self):
+        refresh = RefreshToken.for_user(self.user)
+
+        first = self.refresh(refresh)
+        self.assertEqual(first.status_code, 200)
+        self.assertNotEqual(first.data['refresh'], str(refresh))
+        self.assertTrue(BlacklistedToken.objects.filter(jti=refresh['jti']).exists())
+
+        self.assertEqual(self.refresh(refresh).status_code, 401)
+        self.assertEqual(self.refresh(first.data['refresh']).status_code, 200)
+
+    def test_blacklisted_by_another_process(self):
+        refresh = RefreshToken.for_user(self.user)
+        token_blacklist.sync(force=True)
+        # Inserted behind this process's Bloom filter
+        BlacklistedToken.objects.create(jti=refresh['jti'], expires_at=datetime_from_epoch(refresh['exp']))
+
+        self.assertEqual(self.refresh(refresh).status_code, 401)
+
+
+class BloomFilterTests(SimpleTestCase):
+
+    def test_bulk_update_sets_the_same_bits_as_add(self):
+        keys = [f'jti-{i}' for i in range(500)]
+        one_by_one, bulk = BloomFilter(1000, 0.01), BloomFilter(1000, 0.01)
+        for key in keys:
+            one_by_one.add(key)
+        bulk.update(keys)
+
+        self.assertEqual(one_by_one.bits, bulk.bits)
+        self.assertTrue(all(key in bulk for key in keys))
+        false_positives = sum(f'other-{i}' in bulk for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+@override_settings(ACCOUNTS_PICTURE_WORKERS=0)
+class ProfilePictureTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user('alice', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, size=(800, 600), color='red', name='me.png', image_format='PNG', **options):
+        data = io.BytesIO()
+        Image.new('RGB', size, color).save(data, image_format, **options)
+        picture = SimpleUploadedFile(name, data.getvalue(), content_type=f'image/{image_format.lower()}')
+        return self.client.post(reverse('accounts:upload-profile-picture'), {'profile_picture': picture})
+
+    def stored_files(self):
+        files = []
+        for directory in default_storage.listdir('profiles')[0]:
+            files += default_storage.listdir(f'profiles/{directory}')[1]
+        return sorted(files)
+
+    def test_variants_are_rendered_after_upload(self):
+        self.assertEqual(self.upload().status_code, 200)
+        profile = self.user.profile
+        profile.refresh_from_db()
+        self.assertEqual(profile.picture_status, 'PENDING')
+
+        self.assertTrue(process_picture(profile.id, profile.picture_digest))
+
+        profile.refresh_from_db()
+        self.assertEqual(profile.picture_status, 'READY')
+        for variant, edge in PICTURE_VARIANTS.items():
+            for extension in PICTURE_FORMATS:
+                with default_storage.open(variant_path(profile.picture_digest, variant, extension)) as f:
+                    self.assertEqual(Image.open(f).size, (edge, edge))
+
+    def test_identical_uploads_share_their_files(self):
+        self.upload()
+        other = User.objects.create_user('bob', password='x')
+        self.client.force_authenticate(other)
+        self.upload()
+
+        digest = Profile.objects.get(user=self.user).picture_digest
+        self.assertEqual(Profile.objects.get(user=other).picture_digest, digest)
+        self.assertEqual(self.stored_files(), [f"{digest}.jpg"])
+
+    def test_stored_original_has_no_metadata(self):
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera maker'
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees to display
+        self.upload(size=(80, 60), name='me.jpg', image_format='JPEG', exif=exif.tobytes(), icc_profile=b'icc')
+
+        profile = Profile.objects.get(user=self.user)
+        with default_storage.open(profile.profile_picture.name) as f:
+            image = Image.open(f)
+            self.assertEqual(image.format, 'JPEG')
+            self.assertEqual(image.size, (60, 80))
+            self.assertNotIn('exif', image.info)
+            self.assertNotIn('icc_profile', image.info)
+
+    def test_same_image_with_another_extension_shares_the_path(self):
+        self.upload(name='me.png')
+        other = User.objects.create_user('bob', password='x')
+        self.client.force_authenticate(other)
+        self.upload(name='me.gif')
+
+        digest = Profile.objects.get(user=self.user).picture_digest
+        self.assertEqual(Profile.objects.get(user=other).profile_picture.name, f"profiles/{digest[:2]}/{digest}.jpg")
+        self.assertEqual(len(self.stored_files()), 1)
+
+    def test_files_are_deleted_with_their_last_profile(self):
+        self.upload()
+        profile = Profile.objects.get(user=self.user)
+        process_picture(profile.id, profile.picture_digest)
+        other = User.objects.create_user('bob', password='x')
+        self.client.force_authenticate(other)
+        self.upload()
+        self.assertEqual(len(self.stored_files()), 5)
+
+        self.assertEqual(self.client.delete(reverse('accounts:delete-profile-picture')).status_code, 200)
+        self.assertEqual(len(self.stored_files()), 5)
+
+        self.client.force_authenticate(self.user)
+        self.upload(color='blue')  # Replacing the picture releases it too
+        self.assertEqual(len(self.stored_files()), 1)
+        self.assertEqual(Profile.objects.get(user=other).picture_digest, '')
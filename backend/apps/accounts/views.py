@@ -4,8 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.models import User
-from django.core.files.storage import default_storage
-import os
+from .images import is_image, remove_picture, store_picture
 from .serializers import RegisterSerializer, UserSerializer, ProfileSerializer
 from .models import Profile
 
@@ -82,14 +81,15 @@ def upload_profile_picture(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Delete old picture if exists
-        if profile.profile_picture:
-            if default_storage.exists(profile.profile_picture.name):
-                default_storage.delete(profile.profile_picture.name)
+        if not is_image(profile_picture):
+            return Response({'error': 'Invalid image file.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Save new picture
-        profile.profile_picture = profile_picture
-        profile.save()
+        # Replace the old picture (deleted unless another profile shares it);
+        # the resized variants are rendered in the background
+        try:
+            store_picture(profile, profile_picture)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'message': 'Profile picture uploaded successfully',
@@ -111,10 +111,7 @@ def delete_profile_picture(request):
         profile = user.profile  # Use the Profile model
         
         if profile.profile_picture:
-            if default_storage.exists(profile.profile_picture.name):
-                default_storage.delete(profile.profile_picture.name)
-            profile.profile_picture = None
-            profile.save()
+            remove_picture(profile)
             return Response({
                 'message': 'Profile picture deleted successfully',
                 'profile': ProfileSerializer(profile).data
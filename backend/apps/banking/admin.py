@@ -1,28 +1,26 @@
 from django.contrib import admin
 from django.contrib import messages
-from .models import Account, Transaction
+from decimal import Decimal
+from rest_framework.exceptions import ValidationError
+from .models import Account
+from .services import BankingService
 
 @admin.register(Account)
 class AccountAdmin(admin.ModelAdmin):
     list_display = ('user', 'account_number', 'account_type', 'balance', 'status')
     search_fields = ('user__username', 'account_number')
+    # Changed with `manage.py set_balance_shards`, which consolidates shards first
+    readonly_fields = ('balance_shards',)
     actions = ['deposit_money']
 
     def deposit_money(self, request, queryset):
         """Add $1000 to selected accounts and create transaction record"""
+        deposit_amount = Decimal('1000')  # Change this amount as you wish
         for account in queryset:
-            deposit_amount = 1000  # Change this amount as you wish
-            account.balance += deposit_amount
-            account.save()
-
-            # Create transaction record
-            Transaction.objects.create(
-                to_account=account,
-                amount=deposit_amount,
-                transaction_type='DEPOSIT',
-                status='COMPLETED',
-                description='Admin deposit'
-            )
+            try:
+                BankingService.create_deposit(account.id, deposit_amount, description='Admin deposit')
+            except ValidationError as e:
+                messages.warning(request, f"{account.account_number}: {e.detail[0]}")
 
         messages.success(request, f"✅ Successfully deposited ${deposit_amount} to selected accounts.")
 
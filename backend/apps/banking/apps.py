@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 class BankingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'apps.banking'
\ No newline at end of file
+    name = 'apps.banking'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,137 @@
+"""
+Async versions of the read-only banking views, routed by
+config/urls_async.py when the project runs under ASGI. Responses, ETags
+and pagination match the views in views.py.
+
+The balance cache is read and written with the async cache API, so a
+slow cache server never blocks the event loop.
+"""
+import time
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.models import Sum
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from apps.accounts.authentication import async_api_view, json_response
+from . import views
+from .cache import balance_cache
+from .conditional import aconditional_get, conditional_get, make_etag
+from .events import StreamTicketAuthentication, format_event, get_broker, get_events_settings
+from .exports import aexport_chunks, astream_csv, astream_ndjson
+from .models import Account
+from .pagination import AsyncPageNumberPagination
+from .serializers import AccountSerializer, LedgerEntrySerializer
+
+@async_api_view(views.AccountListCreateView.as_view())
+async def account_list(request):
+    user = request.user
+    accounts = Account.objects.filter(user=user)
+    state = await accounts.aaggregate(**views.ACCOUNT_LIST_STATE)
+    etag, last_modified = views.account_list_validators(user, state, request.GET.urlencode())
+
+    async def render():
+        # One query for the page: owner and shard totals come with it (as
+        # a GROUP BY query, which ignores Meta.ordering)
+        paginator = AsyncPageNumberPagination()
+        page = await paginator.apaginate_queryset(
+            accounts.select_related('user').annotate(
+                shard_total=Sum('shards__balance')
+            ).order_by(*Account._meta.ordering),
+            request, count=state['count']
+        )
+        data = AccountSerializer(page, many=True, context={'prime_balance_cache': False}).data
+        await sync_to_async(balance_cache.prime_many)(page)
+        return json_response(paginator.get_paginated_response(data).data)
+
+    return await aconditional_get(request, render, etag=etag, last_modified=last_modified)
+
+@async_api_view(views.get_account_balance)
+async def get_account_balance(request, account_id):
+    if 'as_of' in request.GET:
+        # Historical balances replay snapshots and entries: keep them synchronous
+        return await sync_to_async(views.get_account_balance)(request, account_id)
+
+    cached = await balance_cache.aget(account_id)
+    if cached and cached['user_id'] == request.user.id:
+        return conditional_get(request, lambda: json_response({
+            'account_number': cached['account_number'],
+            'balance': cached['balance'],
+            'currency': cached['currency']
+        }), etag=make_etag('balance', account_id, cached['balance']))
+
+    account = await Account.objects.filter(
+        id=account_id, user=request.user
+    ).annotate(shard_total=Sum('shards__balance')).afirst()
+    if account is None:
+        return json_response({'error': 'Account not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    balance = account.total_balance
+    await balance_cache.aprime(account)
+    return conditional_get(request, lambda: json_response({
+        'account_number': account.account_number,
+        'balance': balance,
+        'currency': account.currency
+    }), etag=make_etag('balance', account_id, balance))
+
+@async_api_view(views.get_recent_transactions)
+async def get_recent_transactions(request):
+    last_id, last_created = await views.alatest_ledger_entry(request.user)
+
+    async def render():
+        entries = [entry async for entry in views.get_user_ledger(request.user)[:views.RECENT_TRANSACTIONS]]
+        return json_response(LedgerEntrySerializer(entries, many=True).data)
+
+    return await aconditional_get(request, render,
+                                  etag=make_etag('recent', request.user.id, last_id),
+                                  last_modified=last_created)
+
+@async_api_view(views.export_transactions)
+async def export_transactions(request, account_id):
+    """views.export_transactions, streamed from an async iterator"""
+    account = await Account.objects.filter(id=account_id, user=request.user).afirst()
+    if account is None:
+        return json_response({'error': 'Account not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        entries, output = views.export_entries(account, request.GET)
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    chunks = aexport_chunks(entries)
+    return views.export_response(account, output, astream_ndjson(chunks) if output == 'ndjson' else astream_csv(chunks))
+
+@async_api_view(authenticator=StreamTicketAuthentication())
+async def event_stream(request):
+    """
+    Server-sent events for the user's accounts: 'balance' and 'transaction'
+    as transfers commit, 'resync' when the connection fell too far behind,
+    and 'token_expired' just before the stream closes at the expiry of the
+    access token that minted its ticket. Clients (EventSource) open it with
+    ?ticket=<single-use ticket from POST events/tickets/>, a new one for
+    each (re)connect, and should reload their data every time: events
+    published while disconnected are not replayed.
+    """
+    heartbeat = get_events_settings()['HEARTBEAT']
+    expires_at = request.auth.access_expires_at.timestamp()
+    # The stream outlives the request: don't hold a database connection
+    await sync_to_async(connections.close_all)()
+    broker = get_broker()
+    subscription = broker.subscribe(request.user.id)
+
+    async def stream():
+        try:
+            yield 'retry: 5000\n' + format_event({'type': 'ready'})
+            while True:
+                remaining = expires_at - time.time()
+                if remaining <= 0:
+                    yield format_event({'type': 'token_expired'})
+                    return
+                event = await subscription.get(timeout=min(heartbeat, remaining))
+                yield ': keep-alive\n\n' if event is None else format_event(event)
+        finally:
+            broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response
@@ -0,0 +1,228 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+import numpy as np
+from django.db.models import Case, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import BalanceSnapshot, LedgerEntry
+
+
+def start_of_day(day):
+    """Timezone-aware midnight at the beginning of ``day``"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def parse_as_of(value, end_of_day=True):
+    """
+    Parse an ``as_of`` query value: a datetime, or a date meaning the end of
+    that day (or its start, with ``end_of_day=False``). Returns None when the
+    value is not valid.
+    """
+    try:
+        day = parse_date(value)
+        if day is not None and not end_of_day:
+            return start_of_day(day)
+        if day is not None:
+            return start_of_day(day + timedelta(days=1)) - timedelta(microseconds=1)
+        when = parse_datetime(value)
+    except ValueError:
+        return None
+
+    if when is None:
+        return None
+
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+    return when
+
+
+def opening_balance(account):
+    """
+    Balance of the account before its first ledger entry. Accounts may be
+    opened with a balance and no deposit, so this is derived from the first
+    entry rather than assumed to be zero.
+    """
+    first = account.ledger_entries.order_by('created_at', 'id').first()
+    if first is None:
+        return account.total_balance
+    if first.balance_after is None:
+        # Sharded accounts don't record running balances
+        total = account.ledger_entries.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+        return account.total_balance - total
+    return first.balance_after - first.amount
+
+
+def balance_as_of(account, when):
+    """
+    Balance of ``account`` including every ledger entry created at or before
+    ``when``: the nearest snapshot plus the entries after it.
+    """
+    if when < account.created_at:
+        return Decimal('0.00')
+
+    snapshot = account.balance_snapshots.filter(as_of__lte=when).order_by('-as_of').first()
+    entries = account.ledger_entries.filter(created_at__lte=when)
+
+    if snapshot:
+        base = snapshot.balance
+        entries = entries.filter(created_at__gte=snapshot.as_of)
+    else:
+        base = opening_balance(account)
+
+    delta = entries.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
+    return base + delta
+
+
+def period_balances(accounts, period_start, period_end):
+    """
+    {account id: (opening, closing)} for the period [period_start,
+    period_end): balance_as_of() just before each bound, for a batch of
+    accounts in two queries whatever its size.
+
+    Each account starts from its nearest snapshot at or before the period;
+    the entries after it are summed in one query grouped by account and
+    split at the period bounds. Accounts without a snapshot are worked back
+    from their current total_balance (annotate ``shard_total`` on sharded
+    ones to keep that query-free).
+    """
+    accounts = {account.id: account for account in accounts}
+    nearest = BalanceSnapshot.objects.filter(
+        account_id=OuterRef('account_id'), as_of__lte=period_start
+    ).order_by('-as_of').values('as_of')[:1]
+    snapshots = {
+        snapshot.account_id: snapshot
+        for snapshot in BalanceSnapshot.objects.filter(account_id__in=accounts, as_of=Subquery(nearest))
+    }
+
+    # Entries after each account's snapshot (accounts sharing a snapshot
+    # time share a condition), or all of them when it has none
+    since = {}
+    for account_id, snapshot in snapshots.items():
+        since.setdefault(snapshot.as_of, []).append(account_id)
+    scope = Q(account_id__in=[account_id for account_id in accounts if account_id not in snapshots])
+    for as_of, account_ids in since.items():
+        scope |= Q(account_id__in=account_ids, created_at__gte=as_of, created_at__lt=period_end)
+
+    totals = {
+        row['account_id']: row
+        for row in LedgerEntry.objects.filter(scope).values('account_id').annotate(
+            before=Sum(Case(When(created_at__lt=period_start, then='amount'))),
+            during=Sum(Case(When(created_at__gte=period_start, created_at__lt=period_end, then='amount'))),
+            after=Sum(Case(When(created_at__gte=period_end, then='amount'))),
+        ).order_by()
+    }
+
+    balances = {}
+    for account_id, account in accounts.items():
+        row = totals.get(account_id, {})
+        before, during, after = (row.get(bucket) or Decimal('0.00') for bucket in ('before', 'during', 'after'))
+        snapshot = snapshots.get(account_id)
+        if snapshot:
+            opening = snapshot.balance + before
+        else:
+            opening = account.total_balance - after - during
+        closing = opening + during
+        # Like balance_as_of(): nothing before the account was opened
+        if account.created_at >= period_start:
+            opening = Decimal('0.00')
+        if account.created_at >= period_end:
+            closing = Decimal('0.00')
+        balances[account_id] = (opening, closing)
+    return balances
+
+
+def build_snapshots(account, until=None):
+    """
+    Create end-of-day snapshots for every day with activity since the latest
+    snapshot, up to (but excluding) the day containing ``until``.
+    Returns the number of snapshots created.
+    """
+    until = start_of_day(timezone.localdate(until or timezone.now()))
+
+    last = account.balance_snapshots.order_by('-as_of').first()
+    entries = account.ledger_entries.filter(created_at__lt=until)
+    if last:
+        balance = last.balance
+        entries = entries.filter(created_at__gte=last.as_of)
+    else:
+        balance = opening_balance(account)
+
+    daily_totals = (
+        entries.annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(total=Sum('amount'))
+        .order_by('day')
+    )
+
+    snapshots = []
+    for row in daily_totals:
+        balance += row['total']
+        snapshots.append(BalanceSnapshot(
+            account=account,
+            as_of=start_of_day(row['day'] + timedelta(days=1)),
+            balance=balance
+        ))
+
+    BalanceSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+
+def daily_totals(account, start):
+    """
+    Net signed amount per day since ``start``, aggregated by the database so
+    only one narrow row per active day crosses the wire
+    """
+    return list(
+        account.ledger_entries.filter(created_at__gte=start)
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(total=Sum('amount'))
+        .order_by('day')
+        .values_list('day', 'total')
+    )
+
+
+def bucket_daily_balances(opening, totals, start_day, days):
+    """
+    Vectorized end-of-day balances for ``days`` days from ``start_day``.
+
+    ``totals`` is a sequence of (date, net_amount) pairs and ``opening`` the
+    balance just before the window. Sums are done in integer cents, so the
+    result is exact. Returns an int64 array of cents.
+    """
+    count = len(totals)
+    offsets = np.fromiter((day.toordinal() for day, _ in totals), dtype=np.int64, count=count)
+    cents = np.fromiter((round(total * 100) for _, total in totals), dtype=np.int64, count=count)
+
+    offsets -= start_day.toordinal()
+    in_window = (offsets >= 0) & (offsets < days)
+
+    daily = np.zeros(days, dtype=np.int64)
+    np.add.at(daily, offsets[in_window], cents[in_window])
+    return round(opening * 100) + np.cumsum(daily)
+
+
+def daily_balance_series(account, days):
+    """
+    End-of-day balances of ``account`` for the last ``days`` days (today
+    included): one grouped query, then a NumPy fill and cumulative sum.
+    Balances are Decimals built from the exact cents, never floats.
+    """
+    end_day = timezone.localdate()
+    start_day = end_day - timedelta(days=days - 1)
+    start = start_of_day(start_day)
+
+    opening = balance_as_of(account, start - timedelta(microseconds=1))
+    totals = daily_totals(account, start)
+    if account.created_at >= start:
+        # Opened inside the window (opening is then 0): the balance it was
+        # opened with counts as an inflow on that day
+        totals.append((timezone.localdate(account.created_at), opening_balance(account)))
+    balances = bucket_daily_balances(opening, totals, start_day, days)
+    return {
+        'start': start_day,
+        'end': end_day,
+        'opening_balance': opening,
+        'balances': [Decimal(cents).scaleb(-2) for cents in balances.tolist()],
+    }
@@ -0,0 +1,108 @@
+import threading
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+DEFAULT_BALANCE_CACHE_SETTINGS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_TIMEOUT': 2,
+}
+
+
+class BalanceCache:
+    """
+    Account balance reads backed by Django's cache framework.
+
+    Entries are written after commit by the transfer engine (see
+    signals.py), so a cached balance is never a pre-commit value. The cache
+    alias and timeout come from the BANKING_BALANCE_CACHE setting.
+
+    Writes and invalidations only reach the process's own cache when the
+    backend is per process (LocMemCache): other workers keep serving
+    their entry until it expires. Entries there live LOCAL_TIMEOUT seconds
+    instead of TIMEOUT, which bounds that staleness; use a shared cache to
+    get the full TIMEOUT.
+    """
+    key_prefix = 'banking:balance:'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def config(self):
+        return {**DEFAULT_BALANCE_CACHE_SETTINGS, **getattr(settings, 'BANKING_BALANCE_CACHE', {})}
+
+    @property
+    def cache(self):
+        return caches[self.config['ALIAS']]
+
+    @property
+    def timeout(self):
+        config = self.config
+        if isinstance(self.cache, LocMemCache):
+            return min(config['TIMEOUT'], config['LOCAL_TIMEOUT'])
+        return config['TIMEOUT']
+
+    def key(self, account_id):
+        return f"{self.key_prefix}{account_id}"
+
+    def payload(self, account):
+        return {
+            'user_id': account.user_id,
+            'account_number': account.account_number,
+            'balance': account.total_balance,
+            'currency': account.currency,
+        }
+
+    def get(self, account_id):
+        return self._count(self.cache.get(self.key(account_id)))
+
+    async def aget(self, account_id):
+        return self._count(await self.cache.aget(self.key(account_id)))
+
+    def _count(self, value):
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, account):
+        """Write-through of a committed balance"""
+        self.cache.set(self.key(account.id), self.payload(account), self.timeout)
+
+    def set_many(self, accounts):
+        self.cache.set_many(
+            {self.key(account.id): self.payload(account) for account in accounts},
+            self.timeout
+        )
+
+    def prime(self, account):
+        """Cache a balance just read from the database, unless one is already there"""
+        self.cache.add(self.key(account.id), self.payload(account), self.timeout)
+
+    def prime_many(self, accounts):
+        for account in accounts:
+            self.prime(account)
+
+    async def aprime(self, account):
+        await self.cache.aadd(self.key(account.id), self.payload(account), self.timeout)
+
+    def invalidate(self, account_ids):
+        self.cache.delete_many([self.key(account_id) for account_id in account_ids])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+balance_cache = BalanceCache()
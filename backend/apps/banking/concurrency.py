@@ -0,0 +1,190 @@
+import logging
+import random
+import threading
+import time
+from django.conf import settings
+from django.db import OperationalError, connection
+from rest_framework.exceptions import APIException
+from .models import Account
+
+logger = logging.getLogger(__name__)
+
+# Postgres SQLSTATEs that mean "roll back and try again"
+DEADLOCK_DETECTED = '40P01'
+SERIALIZATION_FAILURE = '40001'
+LOCK_NOT_AVAILABLE = '55P03'
+
+DEFAULT_RETRY_SETTINGS = {
+    'MAX_ATTEMPTS': 5,
+    'BASE_DELAY': 0.02,
+    'MAX_DELAY': 0.5,
+}
+
+
+class TransferContentionError(APIException):
+    status_code = 503
+    default_detail = 'The account is busy, please retry shortly.'
+    default_code = 'transfer_contention'
+
+
+class TransferEngineStats:
+    """Per-process counters for the transfer engine"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.attempts = 0
+            self.retries = 0
+            self.deadlocks = 0
+            self.serialization_failures = 0
+            self.lock_timeouts = 0
+            self.exhausted = 0
+            self.lock_acquisitions = 0
+            self.lock_wait_seconds = 0.0
+
+    def incr(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def snapshot(self):
+        with self._lock:
+            acquisitions = self.lock_acquisitions
+            return {
+                'attempts': self.attempts,
+                'retries': self.retries,
+                'deadlocks': self.deadlocks,
+                'serialization_failures': self.serialization_failures,
+                'lock_timeouts': self.lock_timeouts,
+                'exhausted': self.exhausted,
+                'lock_acquisitions': acquisitions,
+                'lock_wait_seconds': round(self.lock_wait_seconds, 6),
+                'avg_lock_wait_ms': round(self.lock_wait_seconds * 1000 / acquisitions, 3) if acquisitions else 0.0,
+            }
+
+
+stats = TransferEngineStats()
+
+
+def classify_error(exc):
+    """
+    Return 'deadlock', 'serialization' or 'lock_timeout' for errors that are
+    safe to retry, or None for anything else
+    """
+    if not isinstance(exc, OperationalError):
+        return None
+
+    pgcode = getattr(exc.__cause__, 'pgcode', None)
+    if pgcode == DEADLOCK_DETECTED:
+        return 'deadlock'
+    if pgcode == SERIALIZATION_FAILURE:
+        return 'serialization'
+    if pgcode == LOCK_NOT_AVAILABLE:
+        return 'lock_timeout'
+
+    # SQLite reports contention as a generic "database is locked"
+    if 'database is locked' in str(exc):
+        return 'lock_timeout'
+    return None
+
+
+def lock_accounts(account_ids):
+    """
+    Lock the given accounts with SELECT ... FOR UPDATE in ascending id order.
+    Returns a dict of id -> Account; missing ids are simply absent.
+    """
+    ids = sorted({account_id for account_id in account_ids if account_id is not None})
+
+    started = time.monotonic()
+    accounts = list(Account.objects.select_for_update().filter(id__in=ids).order_by('id'))
+    stats.incr('lock_wait_seconds', time.monotonic() - started)
+    stats.incr('lock_acquisitions')
+
+    return {account.id: account for account in accounts}
+
+
+def get_retry_settings():
+    return {**DEFAULT_RETRY_SETTINGS, **getattr(settings, 'BANKING_TRANSFER_RETRY', {})}
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# Post-commit callbacks held back until the outermost run_with_retry() returns
+_post_commit = threading.local()
+
+
+def run_after_retries(callback):
+    """
+    Run ``callback`` once the current run_with_retry() call has finished,
+    or right away outside one. For work that must follow a commit: it runs
+    once, never as part of an attempt that could be retried, and its
+    exceptions are logged instead of raised.
+    """
+    pending = getattr(_post_commit, 'pending', None)
+    if pending is not None:
+        pending.append(callback)
+        return
+    try:
+        callback()
+    except Exception:
+        logger.exception("Post-commit callback failed")
+
+
+def run_with_retry(func, *args, **kwargs):
+    """
+    Run ``func`` (which must open its own atomic block) and retry it when the
+    database aborts it because of a deadlock or serialization failure.
+
+    Inside an outer transaction a retry cannot start from a clean state, so
+    the error is propagated unchanged.
+
+    Callbacks passed to run_after_retries() while ``func`` runs (e.g. from
+    transaction.on_commit) are held until the retries are over: a commit
+    is never followed by another attempt.
+    """
+    if connection.in_atomic_block:
+        stats.incr('attempts')
+        return func(*args, **kwargs)
+
+    outermost = getattr(_post_commit, 'pending', None) is None
+    if outermost:
+        _post_commit.pending = []
+    try:
+        return _run_attempts(func, *args, **kwargs)
+    finally:
+        if outermost:
+            pending, _post_commit.pending = _post_commit.pending, None
+            for callback in pending:
+                run_after_retries(callback)
+
+
+def _run_attempts(func, *args, **kwargs):
+    config = get_retry_settings()
+    max_attempts = max(1, config['MAX_ATTEMPTS'])
+
+    for attempt in range(max_attempts):
+        stats.incr('attempts')
+        try:
+            return func(*args, **kwargs)
+        except OperationalError as e:
+            kind = classify_error(e)
+            if kind is None:
+                raise
+
+            stats.incr({
+                'deadlock': 'deadlocks',
+                'serialization': 'serialization_failures',
+                'lock_timeout': 'lock_timeouts',
+            }[kind])
+
+            if attempt + 1 >= max_attempts:
+                stats.incr('exhausted')
+                raise TransferContentionError() from e
+
+            stats.incr('retries')
+            time.sleep(backoff_delay(attempt, config['BASE_DELAY'], config['MAX_DELAY']))
@@ -0,0 +1,67 @@
+import hashlib
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+
+def make_etag(*parts):
+    """Strong ETag from cheap validator values (ids, timestamps, counts)"""
+    digest = hashlib.md5(repr(parts).encode('utf-8'), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
+
+
+def add_validators(response, etag=None, last_modified=None):
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    # Per-user data: browsers may keep it, but must revalidate every time
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def not_modified_response(request, etag=None, last_modified=None):
+    if request.method in ('GET', 'HEAD') and (etag or last_modified):
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        not_modified = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if not_modified is not None:
+            return add_validators(not_modified, etag, last_modified)
+    return None
+
+
+def conditional_get(request, render, etag=None, last_modified=None):
+    """
+    Answer with 304 Not Modified when the client's If-None-Match /
+    If-Modified-Since still match, without calling ``render``. Otherwise
+    return ``render()`` with the validators attached.
+    """
+    not_modified = not_modified_response(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    return add_validators(render(), etag, last_modified)
+
+
+async def aconditional_get(request, render, etag=None, last_modified=None):
+    """conditional_get() for async views: ``render`` is a coroutine function"""
+    not_modified = not_modified_response(request, etag, last_modified)
+    if not_modified is not None:
+        return not_modified
+    return add_validators(await render(), etag, last_modified)
+
+
+class ConditionalGetMixin:
+    """
+    Conditional GET for generic views. Subclasses implement get_validators()
+    returning (etag, last_modified); either may be None.
+    """
+
+    def get_validators(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = self.get_validators()
+        return conditional_get(
+            request,
+            lambda: super(ConditionalGetMixin, self).get(request, *args, **kwargs),
+            etag=etag,
+            last_modified=last_modified
+        )
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULT_DASHBOARD_CACHE_SETTINGS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+
+class DashboardCache:
+    """
+    Per-user cache of the dashboard payload.
+
+    Entries are keyed by the dashboard's ETag, which is built from database
+    validators (see dashboard_validators in views.py), so every process
+    agrees on it and a write makes the old entry unreachable without any
+    invalidation. A request that read the database before a write committed
+    stores its payload under the validators it read, where nobody will look
+    for it again. The cache alias and timeout come from the
+    BANKING_DASHBOARD_CACHE setting.
+    """
+    key_prefix = 'banking:dashboard:'
+
+    @property
+    def config(self):
+        return {**DEFAULT_DASHBOARD_CACHE_SETTINGS, **getattr(settings, 'BANKING_DASHBOARD_CACHE', {})}
+
+    @property
+    def cache(self):
+        return caches[self.config['ALIAS']]
+
+    def key(self, user_id, etag):
+        digest = etag.strip('"')
+        return f"{self.key_prefix}{user_id}:{digest}"
+
+    def get(self, user_id, etag):
+        return self.cache.get(self.key(user_id, etag))
+
+    def set(self, user_id, etag, payload):
+        self.cache.set(self.key(user_id, etag), payload, self.config['TIMEOUT'])
+
+
+dashboard_cache = DashboardCache()
@@ -0,0 +1,275 @@
+"""
+Server push of balance and transaction events.
+
+BankingService's transaction_committed signal publishes an event per
+changed account and per transaction to the configured broker (see
+signals.py), and the server-sent event stream (async_views.event_stream)
+subscribes to the events of one user. A subscriber is a queue awaited by
+a coroutine, so an idle connection costs no worker thread.
+
+The broker class comes from the BANKING_EVENTS setting. LocalBroker only
+reaches subscribers in the publishing process; PostgresBroker relays
+events between processes with LISTEN/NOTIFY.
+
+EventSource cannot send an Authorization header, so the stream is opened
+with a single-use ticket (issue_stream_ticket) minted by an authenticated
+POST, instead of an access token in the URL.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import secrets
+import select
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from .models import EventStreamTicket
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENTS_SETTINGS = {
+    'BACKEND': 'apps.banking.events.LocalBroker',
+    'QUEUE_SIZE': 100,
+    'HEARTBEAT': 15,
+    'TICKET_TTL': 30,
+    'WORKERS': 1,
+}
+
+
+def get_events_settings():
+    return {**DEFAULT_EVENTS_SETTINGS, **getattr(settings, 'BANKING_EVENTS', {})}
+
+
+def balance_event(account):
+    # A sharded account's row excludes its shard balances: send no figure
+    # and let the client fetch the total
+    return {
+        'type': 'balance',
+        'account_id': account.id,
+        'account_number': account.account_number,
+        'balance': None if account.balance_shards else account.balance,
+        'currency': account.currency,
+    }
+
+
+def transaction_event(txn):
+    return {
+        'type': 'transaction',
+        'id': txn.id,
+        'reference_number': txn.reference_number,
+        'transaction_type': txn.transaction_type,
+        'amount': txn.amount,
+        'status': txn.status,
+        'from_account': txn.from_account_id,
+        'to_account': txn.to_account_id,
+        'created_at': txn.created_at,
+    }
+
+
+def format_event(event):
+    """One server-sent event: the event type as its name, the event as JSON data"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, cls=DjangoJSONEncoder)}\n\n"
+
+
+def ticket_digest(ticket):
+    return hashlib.sha256(ticket.encode('utf-8')).hexdigest()
+
+
+def issue_stream_ticket(user, access_token):
+    """
+    A ticket opening one event stream for ``user`` within TICKET_TTL
+    seconds. The stream closes when ``access_token`` (that of the request
+    minting the ticket) expires.
+    """
+    now = timezone.now()
+    EventStreamTicket.objects.filter(user=user, expires_at__lte=now).delete()
+    ticket = secrets.token_urlsafe(32)
+    EventStreamTicket.objects.create(
+        digest=ticket_digest(ticket),
+        user=user,
+        expires_at=now + timedelta(seconds=get_events_settings()['TICKET_TTL']),
+        access_expires_at=datetime.fromtimestamp(access_token['exp'], tz=dt_timezone.utc)
+    )
+    return ticket
+
+
+class StreamTicketAuthentication(BaseAuthentication):
+    """
+    Async authentication by ``?ticket=`` (see issue_stream_ticket). The
+    ticket is spent by the first request using it; request.auth is its
+    EventStreamTicket.
+    """
+    query_param = 'ticket'
+
+    async def aauthenticate(self, request):
+        ticket = request.GET.get(self.query_param)
+        if not ticket:
+            return None
+
+        tickets = EventStreamTicket.objects.filter(digest=ticket_digest(ticket), expires_at__gt=timezone.now())
+        stream_ticket = await tickets.select_related('user__profile').afirst()
+        # Of concurrent requests with the same ticket, only the one whose
+        # DELETE removes the row gets in
+        if stream_ticket is None or not (await tickets.adelete())[0]:
+            raise AuthenticationFailed(_("Ticket is invalid or expired"), code="ticket_invalid")
+        if not stream_ticket.user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return stream_ticket.user, stream_ticket
+
+    def authenticate_header(self, request):
+        return 'Ticket'
+
+
+class Subscription:
+    """
+    Events for one user, queued for a coroutine running on ``loop``. When
+    the consumer falls QUEUE_SIZE events behind, the backlog is replaced by
+    a single 'resync' event telling the client to reload.
+    """
+
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def put(self, event):
+        # Runs on self.loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'type': 'resync'})
+
+    async def get(self, timeout):
+        """Next event, or None if none arrives within ``timeout`` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalBroker:
+    """
+    Delivers events to subscribers in this process. publish() may be called
+    from any thread; each event is handed to its subscriber's event loop.
+    """
+    # Whether subscribers in other processes receive what this one publishes
+    cross_process = False
+
+    def __init__(self, options):
+        self.options = options
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Start receiving ``user_id``'s events; call from the consuming event loop"""
+        subscription = Subscription(user_id, self.options['QUEUE_SIZE'])
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def deliver(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, event)
+            except RuntimeError:
+                self.unsubscribe(subscription)  # Its event loop has closed
+
+    def publish(self, user_id, event):
+        self.deliver(user_id, event)
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Relays events between processes (gunicorn/uvicorn workers) with
+    PostgreSQL NOTIFY. Each process that has subscribers runs one listener
+    thread on its own connection and delivers the notifications locally.
+    Requires psycopg2; payloads must stay under PostgreSQL's 8000 bytes.
+    """
+    channel = 'banking_events'
+    cross_process = True
+
+    def __init__(self, options):
+        super().__init__(options)
+        self._listener = None
+
+    def subscribe(self, user_id):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='banking-events', daemon=True)
+                self._listener.start()
+        return super().subscribe(user_id)
+
+    def publish(self, user_id, event):
+        payload = json.dumps([user_id, event], cls=DjangoJSONEncoder)
+        with connections['default'].cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [self.channel, payload])
+
+    def _listen(self):
+        database = connections['default']
+        while True:
+            listener = None
+            try:
+                listener = database.get_new_connection(database.get_connection_params())
+                listener.autocommit = True
+                with listener.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel}")
+                while True:
+                    if not select.select([listener], [], [], 60)[0]:
+                        continue
+                    listener.poll()
+                    while listener.notifies:
+                        user_id, event = json.loads(listener.notifies.pop(0).payload)
+                        self.deliver(user_id, event)
+            except Exception:
+                logger.exception("Event listener connection failed, reconnecting")
+                if listener is not None:
+                    listener.close()
+                time.sleep(1)
+
+
+@functools.lru_cache
+def _load_broker(backend):
+    return import_string(backend)(get_events_settings())
+
+
+def get_broker():
+    """The process-wide broker of the configured BACKEND"""
+    return _load_broker(get_events_settings()['BACKEND'])
+
+
+def check_broker():
+    """
+    Refuse to serve several worker processes (WORKERS, from WEB_CONCURRENCY)
+    with a broker that only reaches subscribers in the publishing process:
+    a client would miss every event published by another worker.
+    """
+    config = get_events_settings()
+    if config['WORKERS'] > 1 and not import_string(config['BACKEND']).cross_process:
+        raise ImproperlyConfigured(
+            f"BANKING_EVENTS['BACKEND'] {config['BACKEND']} only reaches subscribers in its own process, "
+            f"but {config['WORKERS']} workers are configured: use apps.banking.events.PostgresBroker"
+        )
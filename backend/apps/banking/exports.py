@@ -0,0 +1,79 @@
+import csv
+import itertools
+import json
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+EXPORT_FIELDS = [
+    ('created_at', 'created_at'),
+    ('reference_number', 'transaction__reference_number'),
+    ('transaction_type', 'transaction__transaction_type'),
+    ('status', 'transaction__status'),
+    ('description', 'transaction__description'),
+    ('from_account_number', 'transaction__from_account__account_number'),
+    ('to_account_number', 'transaction__to_account__account_number'),
+    ('amount', 'amount'),
+    ('balance_after', 'balance_after'),
+]
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object that hands back what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(entries):
+    """
+    Ledger rows as plain tuples, fetched through a server-side cursor in
+    chunks so memory stays flat however many rows are exported
+    """
+    return entries.order_by('created_at', 'id').values_list(
+        *[lookup for _, lookup in EXPORT_FIELDS]
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+async def aexport_chunks(entries):
+    """
+    export_rows() for async views, as lists of up to EXPORT_CHUNK_SIZE rows.
+    Each chunk is fetched on the request's sync thread, so the server-side
+    cursor stays on one connection. (QuerySet.aiterator() would run the
+    values_list() query on the event loop.)
+    """
+    rows = export_rows(entries)
+    fetch = sync_to_async(lambda: list(itertools.islice(rows, EXPORT_CHUNK_SIZE)))
+    while chunk := await fetch():
+        yield chunk
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in EXPORT_FIELDS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_ndjson(rows):
+    names = [name for name, _ in EXPORT_FIELDS]
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+async def astream_csv(chunks):
+    """
+    stream_csv() over aexport_chunks(), one message per chunk. Under ASGI a
+    synchronous iterator is read to the end before anything is sent.
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, _ in EXPORT_FIELDS])
+    async for chunk in chunks:
+        yield ''.join(writer.writerow(row) for row in chunk)
+
+
+async def astream_ndjson(chunks):
+    names = [name for name, _ in EXPORT_FIELDS]
+    async for chunk in chunks:
+        yield ''.join(json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n' for row in chunk)
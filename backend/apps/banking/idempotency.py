@@ -0,0 +1,159 @@
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .concurrency import run_with_retry
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def get_idempotency_settings():
+    config = getattr(settings, 'BANKING_IDEMPOTENCY', {})
+    return {
+        'TTL': config.get('TTL', 24 * 60 * 60),
+        'LOCK_TIMEOUT': config.get('LOCK_TIMEOUT', 60),
+        'WAIT_TIMEOUT': config.get('WAIT_TIMEOUT', 10),
+        'POLL_INTERVAL': config.get('POLL_INTERVAL', 0.05),
+    }
+
+
+def request_fingerprint(request):
+    """Hash of what the key promises to repeat: method, path and body"""
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    payload = f"{request.method}\n{request.path}\n{body}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def claim_key(user, key, request_hash, now):
+    """
+    Claim ``key`` for a new request. Returns (record, claimed): claimed is
+    False when another request already holds or completed the key.
+
+    Expired records are taken over. That includes IN_PROGRESS records whose
+    worker died: they expire after LOCK_TIMEOUT instead of the full TTL.
+    """
+    lock_timeout = timedelta(seconds=get_idempotency_settings()['LOCK_TIMEOUT'])
+    while True:
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is None:
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=user, key=key, request_hash=request_hash,
+                        created_at=now, expires_at=now + lock_timeout
+                    )
+                return record, True
+            except IntegrityError:
+                continue  # Lost the race to a concurrent duplicate
+
+        if record.expires_at > now:
+            return record, False
+
+        taken = IdempotencyKey.objects.filter(id=record.id, expires_at=record.expires_at).update(
+            request_hash=request_hash, status='IN_PROGRESS', response_status=None,
+            response_body=None, created_at=now, expires_at=now + lock_timeout
+        )
+        if taken:
+            record.refresh_from_db()
+            return record, True
+
+
+def wait_for_result(record):
+    """Poll until the request holding ``record`` completes, or give up (None)"""
+    config = get_idempotency_settings()
+    deadline = time.monotonic() + config['WAIT_TIMEOUT']
+    while time.monotonic() < deadline:
+        time.sleep(config['POLL_INTERVAL'])
+        record = IdempotencyKey.objects.filter(id=record.id).first()
+        if record is None:
+            return None  # The first request failed and released the key
+        if record.status == 'COMPLETED':
+            return record
+    return None
+
+
+def replay(record):
+    response = Response(record.response_body, status=record.response_status)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Make a function view safe to retry with an ``Idempotency-Key`` header.
+
+    The first request with a key runs the view and stores its response.
+    Retries with the same key and body get that stored response back
+    without running the view again, so no account is locked twice. A
+    duplicate that arrives while the first is still running waits for its
+    result. Reusing a key with a different body is rejected with 422.
+    Server errors (5xx) are not stored, so they can be retried with the
+    same key. Requests without the header are not affected.
+
+    The view runs in one atomic block together with the write of its
+    stored response, retried as a whole on deadlocks, so a key is never
+    released once the view's changes have committed.
+
+    Apply below @api_view/@permission_classes so request.user is known.
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view(request, *args, **kwargs)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        request_hash = request_fingerprint(request)
+        record, claimed = claim_key(request.user, key, request_hash, timezone.now())
+
+        if not claimed:
+            if record.request_hash != request_hash:
+                return Response({'error': f'{IDEMPOTENCY_HEADER} was already used for a different request'},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if record.status != 'COMPLETED':
+                record = wait_for_result(record)
+                if record is None or record.request_hash != request_hash:
+                    return Response({'error': 'A request with this Idempotency-Key is still being processed'},
+                                    status=status.HTTP_409_CONFLICT)
+            return replay(record)
+
+        def run():
+            with transaction.atomic():
+                response = view(request, *args, **kwargs)
+                if response.status_code >= 500:
+                    transaction.set_rollback(True)
+                    return response
+                # Stored in the view's own transaction: the key is completed
+                # exactly when the transfer commits
+                IdempotencyKey.objects.filter(id=record.id).update(
+                    status='COMPLETED',
+                    response_status=response.status_code,
+                    response_body=response.data,
+                    expires_at=record.created_at + timedelta(seconds=get_idempotency_settings()['TTL'])
+                )
+                return response
+
+        try:
+            response = run_with_retry(run)
+        except Exception:
+            # Raised before or during the commit: everything rolled back
+            record.delete()
+            raise
+
+        if response.status_code >= 500:
+            record.delete()
+        return response
+
+    return wrapper
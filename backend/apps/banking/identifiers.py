@@ -0,0 +1,251 @@
+"""
+Collision-free account numbers and transaction references.
+
+Neither generator queries for existing values. Account numbers come from a
+sequence handed out to each process in blocks; references are Snowflake
+style ids built from the clock, a leased per-process worker id and a
+counter.
+"""
+import atexit
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import timedelta
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import NumberSequence, ReferenceWorkerLease
+
+ACCOUNT_NUMBER_SEQUENCE = 'account_number'
+ACCOUNT_NUMBER_DIGITS = 11
+
+# Reference layout: 40 bits of milliseconds since REFERENCE_EPOCH_MS,
+# 10 bits of worker id, 12 bits of per-millisecond counter
+REFERENCE_EPOCH_MS = 1735689600000  # 2025-01-01T00:00:00Z
+WORKER_BITS = 10
+COUNTER_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_COUNTER = (1 << COUNTER_BITS) - 1
+REFERENCE_LENGTH = 12
+BASE36 = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def luhn_check_digit(digits):
+    """Check digit that makes ``digits`` + digit pass the Luhn checksum"""
+    total = 0
+    for i, char in enumerate(reversed(digits)):
+        value = int(char)
+        if i % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_account_number(number):
+    return len(number) == 12 and number.isdigit() and luhn_check_digit(number[:-1]) == number[-1]
+
+
+def to_base36(value, width):
+    chars = []
+    while value:
+        value, remainder = divmod(value, 36)
+        chars.append(BASE36[remainder])
+    return ''.join(reversed(chars)).rjust(width, '0')
+
+
+def sequence_is_durable():
+    """
+    Whether values allocated now survive a rollback of the current
+    transaction. PostgreSQL sequences are non-transactional; the fallback
+    table is only durable when we are not inside an atomic block.
+    """
+    return connection.vendor == 'postgresql' or not connection.in_atomic_block
+
+
+def allocate_sequence_values(name, count):
+    """Reserve ``count`` unique values from the named sequence in one query"""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval(%s) FROM generate_series(1, %s)", [f'banking_{name}_seq', count])
+            return [row[0] for row in cursor.fetchall()]
+
+    with transaction.atomic():
+        # UPDATE first so the row is write-locked before it is read
+        NumberSequence.objects.filter(name=name).update(next_value=F('next_value') + count)
+        end = NumberSequence.objects.values_list('next_value', flat=True).get(name=name)
+    return list(range(end - count, end))
+
+
+class SequenceBlock:
+    """
+    Per-process cache of values reserved from a sequence, refilled a block
+    at a time. A block reserved inside a transaction that could roll it back
+    is only cached once that transaction commits, so another process can't
+    be handed the same block.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._values = deque()
+        self._lock = threading.Lock()
+
+    def next(self):
+        with self._lock:
+            if self._values:
+                return self._values.popleft()
+            durable = sequence_is_durable()
+            values = allocate_sequence_values(self.name, settings.BANKING_SEQUENCE_BLOCK_SIZE)
+            if durable:
+                self._values.extend(values[1:])
+            else:
+                transaction.on_commit(lambda: self._keep(values[1:]))
+            return values[0]
+
+    def _keep(self, values):
+        with self._lock:
+            if not self._values:
+                self._values.extend(values)
+
+    def reset(self):
+        self._values = deque()
+        self._lock = threading.Lock()
+
+
+def claim_worker_lease(token, now, duration):
+    """Lease a free (expired) worker id to ``token``. Returns the id."""
+    for _ in range(10):
+        worker_id = ReferenceWorkerLease.objects.filter(
+            expires_at__lt=now
+        ).order_by('expires_at').values_list('worker_id', flat=True).first()
+        if worker_id is None:
+            raise RuntimeError(f"All {MAX_WORKER_ID + 1} reference worker ids are leased")
+        # Only matches while the id is still free: a concurrent claim wins
+        if ReferenceWorkerLease.objects.filter(worker_id=worker_id, expires_at__lt=now).update(
+            token=token, expires_at=now + duration
+        ):
+            return worker_id
+    raise RuntimeError("Could not lease a reference worker id")
+
+
+def renew_worker_lease(worker_id, token, now, duration):
+    """Extend the lease; False if it expired and another process took it"""
+    return bool(
+        ReferenceWorkerLease.objects.filter(worker_id=worker_id, token=token).update(expires_at=now + duration)
+    )
+
+
+class ReferenceGenerator:
+    """
+    Time-ordered 62-bit ids, unique because no two live processes hold the
+    same worker id: each leases one (ReferenceWorkerLease) and renews it
+    once half the lease has passed, before generating any further ids.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self._token = uuid.uuid4().hex
+        self._lease = None
+        self._pending = None
+        self._last_ms = -1
+        self._counter = 0
+
+    def _get_worker_id(self):
+        now = timezone.now()
+        if self._lease is not None and now < self._lease[1]:
+            return self._lease[0]
+        if self._pending is not None and any(func is self._pending[1] for _, func, _ in connection.run_on_commit):
+            # Leased earlier in the current transaction, which is still open
+            return self._pending[0]
+
+        duration = timedelta(seconds=settings.BANKING_REFERENCE_WORKER_LEASE)
+        durable = not connection.in_atomic_block
+        if self._lease is not None and renew_worker_lease(self._lease[0], self._token, now, duration):
+            worker_id = self._lease[0]
+        else:
+            self._lease = None
+            worker_id = claim_worker_lease(self._token, now, duration)
+
+        lease = (worker_id, now + duration / 2)
+        if durable:
+            self._lease = lease
+        else:
+            # A rollback would undo the lease: only keep it once committed
+            keep = lambda: self._keep_lease(lease)
+            self._pending = (worker_id, keep)
+            transaction.on_commit(keep)
+        return worker_id
+
+    def _keep_lease(self, lease):
+        with self._lock:
+            self._lease = lease
+            self._pending = None
+
+    def release(self):
+        """Hand the worker id back, e.g. at exit"""
+        with self._lock:
+            if self._lease is not None:
+                ReferenceWorkerLease.objects.filter(
+                    worker_id=self._lease[0], token=self._token
+                ).update(expires_at=timezone.now())
+                self._lease = None
+
+    def next_id(self):
+        with self._lock:
+            worker_id = self._get_worker_id()
+            now = int(time.time() * 1000) - REFERENCE_EPOCH_MS
+            if now > self._last_ms:
+                self._last_ms = now
+                self._counter = 0
+            elif self._counter < MAX_COUNTER:
+                # Same millisecond, or the clock stepped backwards
+                self._counter += 1
+            else:
+                # Counter exhausted: borrow the next millisecond
+                self._last_ms += 1
+                self._counter = 0
+            return (self._last_ms << (WORKER_BITS + COUNTER_BITS)) | (worker_id << COUNTER_BITS) | self._counter
+
+
+account_numbers = SequenceBlock(ACCOUNT_NUMBER_SEQUENCE)
+references = ReferenceGenerator()
+
+
+def next_account_number():
+    """11-digit sequence value followed by a Luhn check digit"""
+    digits = str(account_numbers.next()).zfill(ACCOUNT_NUMBER_DIGITS)
+    if len(digits) > ACCOUNT_NUMBER_DIGITS:
+        raise RuntimeError("The account number sequence is exhausted")
+    return digits + luhn_check_digit(digits)
+
+
+def next_reference_number():
+    """'TXN' + 12 base-36 characters, sortable by creation time"""
+    return 'TXN' + to_base36(references.next_id(), REFERENCE_LENGTH)
+
+
+def _reset_after_fork():
+    # Forked workers (gunicorn --preload) must not reuse the parent's block
+    # or worker id
+    account_numbers.reset()
+    references.reset()
+
+
+def _release_at_exit():
+    try:
+        references.release()
+    except DatabaseError:
+        # The lease simply expires
+        pass
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(_release_at_exit)
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class BenchmarkCommand(BaseCommand):
+    """
+    Base of the bench_* commands. They seed and delete rows in whatever
+    database is configured, so they refuse to run unless DEBUG is on or
+    --i-know is passed.
+    """
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        parser.add_argument('--i-know', action='store_true',
+                            help='Run with DEBUG off: seeds and deletes benchmark rows in the configured database')
+        return parser
+
+    def execute(self, *args, **options):
+        if not (settings.DEBUG or options.get('i_know')):
+            raise CommandError(
+                f"DEBUG is off: refusing to seed and delete benchmark data in "
+                f"database '{connection.settings_dict['NAME']}'. Pass --i-know to run anyway."
+            )
+        return super().execute(*args, **options)
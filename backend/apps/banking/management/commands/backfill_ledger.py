@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from apps.banking.models import Account, Transaction, LedgerEntry
+
+
+class Command(BaseCommand):
+    help = "Create ledger entries for completed transactions that predate the ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--account', type=int, action='append', dest='accounts',
+                            help='Only backfill this account id (repeatable)')
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.order_by('id')
+        if options['accounts']:
+            accounts = accounts.filter(id__in=options['accounts'])
+
+        created = 0
+        for account_id in accounts.values_list('id', flat=True).iterator():
+            created += self.backfill_account(account_id, options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"Created {created} ledger entries"))
+
+    @transaction.atomic
+    def backfill_account(self, account_id, batch_size):
+        """
+        Walk the account's completed transactions backwards from its current
+        balance, so running balances stay correct even for accounts that were
+        opened with an initial balance and no deposit transaction.
+        """
+        # Hold the account still while its history is replayed
+        account = Account.objects.select_for_update().get(id=account_id)
+
+        existing = set(
+            LedgerEntry.objects.filter(account=account).values_list('transaction_id', flat=True)
+        )
+        legs = Transaction.objects.filter(
+            Q(from_account=account) | Q(to_account=account),
+            status='COMPLETED'
+        ).order_by('-created_at', '-id').values_list(
+            'id', 'to_account_id', 'amount', 'created_at'
+        )
+
+        balance = account.total_balance
+        entries = []
+        for txn_id, to_account_id, amount, created_at in legs.iterator():
+            signed = amount if to_account_id == account.id else -amount
+            if txn_id not in existing:
+                entries.append(LedgerEntry(
+                    account=account,
+                    transaction_id=txn_id,
+                    amount=signed,
+                    balance_after=balance,
+                    created_at=created_at
+                ))
+            balance -= signed
+
+        LedgerEntry.objects.bulk_create(entries, batch_size=batch_size)
+        return len(entries)
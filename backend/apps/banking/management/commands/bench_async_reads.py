@@ -0,0 +1,204 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+from apps.banking.management.benchmark import BenchmarkCommand
+from apps.banking.models import Account
+from apps.banking.services import BankingService
+
+DEPLOYMENTS = {
+    # name: (server, ROOT_URLCONF)
+    'wsgi': ('gunicorn', 'config.urls'),
+    'asgi-sync': ('uvicorn', 'config.urls'),
+    'asgi-async': ('uvicorn', 'config.urls_async'),
+}
+
+
+async def fetch(reader, writer, request):
+    """Send one keep-alive request and read the whole response; returns the status"""
+    writer.write(request)
+    await writer.drain()
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed by server')
+
+    length, chunked = 0, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding' and 'chunked' in value.lower():
+            chunked = True
+
+    if chunked:
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif length:
+        await reader.readexactly(length)
+    return int(status_line.split()[1])
+
+
+async def run_load(port, requests, connections, duration):
+    """``connections`` keep-alive clients cycling through ``requests`` for ``duration`` seconds"""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client(offset):
+        nonlocal errors
+        reader = writer = None
+        i = offset
+        while time.perf_counter() < deadline:
+            request = requests[i % len(requests)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                status = await fetch(reader, writer, request)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                errors += 1
+                if writer is not None:
+                    writer.close()
+                reader = writer = None
+                continue
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(offset) for offset in range(connections)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'throughput': len(latencies) / wall,
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0.0,
+        'errors': errors,
+    }
+
+
+class Command(BenchmarkCommand):
+    help = ("Compare read throughput of the balance, account list, recent transactions and "
+            "profile endpoints under gunicorn (WSGI) and uvicorn (ASGI, sync and async views) "
+            "by number of concurrent connections (writes to the configured database)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', default='1,16,64,256',
+                            help='Comma-separated concurrent connection counts to compare')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per run')
+        parser.add_argument('--deployments', default=','.join(DEPLOYMENTS),
+                            help=f"Comma-separated subset of: {', '.join(DEPLOYMENTS)}")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Server worker processes')
+        parser.add_argument('--threads', type=int, default=8, help='Threads per gunicorn worker')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--accounts', type=int, default=5, help='Accounts of the benchmark user')
+
+    def handle(self, *args, **options):
+        connection_counts = [int(count) for count in options['connections'].split(',') if count.strip()]
+        deployments = [name.strip() for name in options['deployments'].split(',') if name.strip()]
+        unknown = set(deployments) - set(DEPLOYMENTS)
+        if unknown:
+            raise CommandError(f"Unknown deployments: {', '.join(sorted(unknown))}")
+
+        user, _ = User.objects.get_or_create(username='bench_async_reads')
+        try:
+            requests = self._setup(user, options['accounts'])
+            results = {}
+            for name in deployments:
+                server = self._start(name, options)
+                try:
+                    self._wait_ready(server, options['port'], requests[0])
+                    for connections in connection_counts:
+                        results[name, connections] = asyncio.run(
+                            run_load(options['port'], requests, connections, options['duration'])
+                        )
+                        self.stdout.write(f"{name} x{connections}: {results[name, connections]['throughput']:.1f} req/s")
+                finally:
+                    server.terminate()
+                    server.wait(timeout=30)
+        finally:
+            user.delete()
+
+        self.stdout.write(f"\n{'deployment':<11} {'conns':>6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} "
+                          f"{'errors':>7} {'vs wsgi':>8}")
+        for (name, connections), result in results.items():
+            baseline = results.get(('wsgi', connections))
+            ratio = f"{result['throughput'] / baseline['throughput']:>7.2f}x" if baseline else f"{'-':>8}"
+            self.stdout.write(
+                f"{name:<11} {connections:>6} {result['throughput']:>9.1f} {result['p50_ms']:>9.2f} "
+                f"{result['p99_ms']:>9.2f} {result['errors']:>7} {ratio}"
+            )
+
+    def _setup(self, user, count):
+        """Accounts with some history; returns the raw HTTP requests to cycle through"""
+        Account.objects.filter(user=user).delete()
+        accounts = [
+            Account.objects.create(user=user, account_type='CHECKING', balance=Decimal('10000.00'))
+            for _ in range(count)
+        ]
+        for i in range(count * 10):
+            BankingService.create_transfer(
+                accounts[i % count].id, accounts[(i + 1) % count].account_number, Decimal('1.00')
+            )
+
+        token = str(AccessToken.for_user(user))
+        paths = ['/api/auth/profile/', '/api/banking/accounts/', '/api/banking/transactions/recent/']
+        paths += [f'/api/banking/accounts/{account.id}/balance/' for account in accounts]
+        return [
+            (f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+             f"Authorization: Bearer {token}\r\nAccept: application/json\r\n\r\n").encode('ascii')
+            for path in paths
+        ]
+
+    def _start(self, name, options):
+        server, urlconf = DEPLOYMENTS[name]
+        port = str(options['port'])
+        if server == 'gunicorn':
+            command = [sys.executable, '-m', 'gunicorn', 'config.wsgi:application',
+                       '--bind', f"127.0.0.1:{port}", '--workers', str(options['workers']),
+                       '--threads', str(options['threads']), '--log-level', 'warning']
+        else:
+            command = [sys.executable, '-m', 'uvicorn', 'config.asgi:application',
+                       '--host', '127.0.0.1', '--port', port, '--workers', str(options['workers']),
+                       '--log-level', 'warning', '--no-access-log']
+
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE, 'DJANGO_ROOT_URLCONF': urlconf}
+        return subprocess.Popen(command, cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL)
+
+    def _wait_ready(self, server, port, request, timeout=30):
+        async def probe():
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            try:
+                return await fetch(reader, writer, request)
+            finally:
+                writer.close()
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f"Server exited with status {server.returncode}")
+            try:
+                if asyncio.run(probe()) == 200:
+                    return
+            except (OSError, ConnectionError, asyncio.IncompleteReadError):
+                pass
+            time.sleep(0.2)
+        raise CommandError(f"Server did not answer on port {port} within {timeout}s")
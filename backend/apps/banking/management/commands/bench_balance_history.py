@@ -0,0 +1,108 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+import numpy as np
+from django.contrib.auth.models import User
+from django.utils import timezone
+from apps.banking.balances import bucket_daily_balances, daily_totals, start_of_day
+from apps.banking.management.benchmark import BenchmarkCommand
+from apps.banking.models import Account, Transaction, LedgerEntry
+
+
+def naive_series(account, start, days):
+    """Baseline: fetch every row and bucket it in a per-row Python loop"""
+    totals = [Decimal('0.00')] * days
+    rows = account.ledger_entries.filter(created_at__gte=start).values_list('created_at', 'amount')
+    for created_at, amount in rows.iterator(chunk_size=10000):
+        totals[(created_at - start).days] += amount
+
+    balances = []
+    balance = Decimal('0.00')
+    for total in totals:
+        balance += total
+        balances.append(int(balance * 100))
+    return balances
+
+
+def per_row_numpy_series(account, start, days):
+    """Fetch every row but bucket with NumPy instead of a Python loop"""
+    rows = list(account.ledger_entries.filter(created_at__gte=start).values_list('created_at', 'amount'))
+    count = len(rows)
+    seconds = np.fromiter((created_at.timestamp() for created_at, _ in rows), dtype=np.float64, count=count)
+    cents = np.rint(np.fromiter((float(amount) for _, amount in rows), dtype=np.float64, count=count) * 100)
+
+    day_index = ((seconds - start.timestamp()) // 86400).astype(np.int64)
+    daily = np.bincount(day_index, weights=cents, minlength=days)
+    return np.cumsum(daily.astype(np.int64)).tolist()
+
+
+def aggregated_series(account, start, days):
+    """Shipped path: grouped per-day query, NumPy fill and cumulative sum"""
+    start_day = timezone.localdate(start)
+    return bucket_daily_balances(Decimal('0.00'), daily_totals(account, start), start_day, days).tolist()
+
+
+class Command(BenchmarkCommand):
+    help = "Benchmark balance-history strategies on a seeded account (writes to the configured database)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Ledger rows to seed')
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rows, days = options['rows'], options['days']
+        start = start_of_day(timezone.localdate() - timedelta(days=days - 1))
+
+        user, _ = User.objects.get_or_create(username='bench_balance_history')
+        account = Account.objects.create(user=user, account_type='BUSINESS')
+        try:
+            self.stdout.write(f"Seeding {rows:,} ledger rows over {days} days...")
+            self._seed(account, rows, start, days, options['batch_size'])
+
+            strategies = [
+                ('python loop', naive_series),
+                ('numpy per row', per_row_numpy_series),
+                ('grouped + numpy', aggregated_series),
+            ]
+            timings = {}
+            results = {}
+            for name, func in strategies:
+                started = time.perf_counter()
+                results[name] = func(account, start, days)
+                timings[name] = time.perf_counter() - started
+
+            if len({tuple(result) for result in results.values()}) != 1:
+                self.stderr.write(self.style.ERROR("Strategies returned different series"))
+
+            baseline = timings['python loop']
+            for name, elapsed in timings.items():
+                self.stdout.write(f"{name:<16} {elapsed * 1000:10.1f} ms  {baseline / elapsed:6.1f}x")
+        finally:
+            user.delete()
+
+    def _seed(self, account, rows, start, days, batch_size):
+        rng = random.Random(42)
+        span = days * 86400
+        for offset in range(0, rows, batch_size):
+            count = min(batch_size, rows - offset)
+            created = [start + timedelta(seconds=rng.randrange(span)) for _ in range(count)]
+            amounts = [Decimal(rng.randrange(-50000, 50000) or 1) / 100 for _ in range(count)]
+
+            txns = Transaction.objects.bulk_create([
+                Transaction(
+                    from_account=account if amount < 0 else None,
+                    to_account=account if amount > 0 else None,
+                    amount=abs(amount),
+                    transaction_type='PAYMENT' if amount < 0 else 'DEPOSIT',
+                    status='COMPLETED',
+                    reference_number=f"BENCH{account.id:05d}{offset + i:010d}"
+                )
+                for i, amount in enumerate(amounts)
+            ])
+            LedgerEntry.objects.bulk_create([
+                LedgerEntry(account=account, transaction=txn, amount=amount,
+                            balance_after=Decimal('0.00'), created_at=created_at)
+                for txn, amount, created_at in zip(txns, amounts, created)
+            ])
@@ -0,0 +1,98 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from rest_framework.exceptions import APIException
+from apps.banking.management.benchmark import BenchmarkCommand
+from apps.banking.models import Account
+from apps.banking.services import BankingService
+
+
+class Command(BenchmarkCommand):
+    help = ("Benchmark concurrent transfers into one hot account by shard count "
+            "(writes to the configured database; use PostgreSQL to see scaling)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shards', default='0,1,4,16', help='Comma-separated shard counts to compare')
+        parser.add_argument('--transfers', type=int, default=2000, help='Transfers per shard count')
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent workers')
+        parser.add_argument('--payers', type=int, default=64, help='Accounts paying into the hot account')
+        parser.add_argument('--debit-percent', type=int, default=5,
+                            help='Share of operations that are payouts from the hot account')
+
+    def handle(self, *args, **options):
+        shard_counts = [int(count) for count in options['shards'].split(',') if count.strip()]
+        user, _ = User.objects.get_or_create(username='bench_hot_account')
+
+        try:
+            results = {}
+            for shards in shard_counts:
+                results[shards] = self._run(user, shards, options)
+                Account.objects.filter(user=user).delete()
+
+            baseline = results[shard_counts[0]]['throughput']
+            self.stdout.write(f"\n{'shards':>6} {'ops/s':>10} {'avg ms':>9} {'p95 ms':>9} {'failed':>7} {'vs first':>9}")
+            for shards, result in results.items():
+                self.stdout.write(
+                    f"{shards:>6} {result['throughput']:>10.1f} {result['avg_ms']:>9.2f} "
+                    f"{result['p95_ms']:>9.2f} {result['failed']:>7} {result['throughput'] / baseline:>8.2f}x"
+                )
+        finally:
+            user.delete()
+
+    def _run(self, user, shards, options):
+        hot = Account.objects.create(user=user, account_type='BUSINESS')
+        if shards:
+            BankingService.set_balance_shards(hot.id, shards)
+        payers = [
+            Account.objects.create(user=user, account_type='CHECKING', balance=Decimal('1000000.00'))
+            for _ in range(options['payers'])
+        ]
+
+        rng = random.Random(shards)
+        operations = [
+            (rng.random() * 100 < options['debit_percent'], payers[i % len(payers)])
+            for i in range(options['transfers'])
+        ]
+
+        def run(operation):
+            payout, payer = operation
+            started = time.perf_counter()
+            try:
+                if payout:
+                    BankingService.create_transfer(hot.id, payer.account_number, Decimal('1.00'))
+                else:
+                    BankingService.create_transfer(payer.id, hot.account_number, Decimal('1.00'))
+                ok = True
+            except APIException:
+                # Insufficient funds early on, or contention retries exhausted
+                ok = False
+            finally:
+                connection.close()
+            return ok, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            outcomes = list(pool.map(run, operations))
+        wall = time.perf_counter() - started
+
+        # The sharded total must match the money that actually moved
+        hot.refresh_from_db()
+        payer_total = sum(
+            Account.objects.filter(id__in=[payer.id for payer in payers]).values_list('balance', flat=True)
+        )
+        expected = Decimal('1000000.00') * len(payers) - payer_total
+        if hot.total_balance != expected:
+            self.stderr.write(self.style.ERROR(
+                f"{shards} shards: hot balance {hot.total_balance} != {expected}"
+            ))
+
+        latencies = sorted(latency for ok, latency in outcomes)
+        return {
+            'throughput': len(operations) / wall,
+            'avg_ms': sum(latencies) / len(latencies) * 1000,
+            'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            'failed': sum(1 for ok, latency in outcomes if not ok),
+        }
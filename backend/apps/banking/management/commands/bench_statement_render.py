@@ -0,0 +1,118 @@
+import json
+import random
+import resource
+import subprocess
+import sys
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from apps.banking.management.benchmark import BenchmarkCommand
+from apps.banking.models import Account, Transaction, LedgerEntry
+from apps.banking.statements import render_statement_history
+from apps.banking.utils import generate_statement_pdf
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class Command(BenchmarkCommand):
+    help = ("Benchmark statement rendering time and peak RSS by history size "
+            "(writes to the configured database)")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+        parser.add_argument('--legacy-max', type=int, default=10_000,
+                            help='Also time the single-table renderer up to this many rows')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        # Internal: render one statement in this (fresh) process and report as JSON
+        parser.add_argument('--child', choices=['paginated', 'legacy'], help='==SUPPRESS==')
+        parser.add_argument('--account-id', type=int, help='==SUPPRESS==')
+        parser.add_argument('--rows', type=int, help='==SUPPRESS==')
+
+    def handle(self, *args, **options):
+        if options['child']:
+            return self.run_child(options['child'], options['account_id'], options['rows'])
+
+        sizes = sorted(options['sizes'])
+        user, _ = User.objects.get_or_create(username='bench_statement_render')
+        try:
+            self.stdout.write(f"Seeding {sum(sizes):,} ledger rows...")
+            accounts = self._seed(user, sizes, options['batch_size'])
+
+            self.stdout.write(f"{'renderer':<10} {'rows':>9} {'time':>10} {'peak RSS':>10} {'growth':>10} {'size':>10}")
+            for size in sizes:
+                renderers = ['paginated'] + (['legacy'] if size <= options['legacy_max'] else [])
+                for renderer in renderers:
+                    # Each run in a fresh interpreter so peak RSS is not inherited
+                    result = json.loads(subprocess.run(
+                        [sys.executable, '-m', 'django', 'bench_statement_render', '--i-know',
+                         '--child', renderer, '--account-id', str(accounts[size]), '--rows', str(size)],
+                        cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+                    ).stdout.strip().splitlines()[-1])
+                    self.stdout.write(
+                        f"{renderer:<10} {size:>9,} {result['seconds']:>9.2f}s "
+                        f"{result['peak_rss_mb']:>8.1f}MB "
+                        f"{result['peak_rss_mb'] - result['baseline_rss_mb']:>8.1f}MB {result['pdf_kb']:>8,}KB"
+                    )
+        finally:
+            user.delete()
+
+    def run_child(self, renderer, account_id, rows):
+        account = Account.objects.select_related('user').get(id=account_id)
+        last_entry_id = account.ledger_entries.order_by('-id').values_list('id', flat=True).first()
+        baseline = peak_rss_mb()
+
+        started = time.perf_counter()
+        if renderer == 'paginated':
+            pdf = render_statement_history(account, last_entry_id)
+        else:
+            entries = account.ledger_entries.select_related('transaction__to_account').order_by('created_at', 'id')
+            pdf = generate_statement_pdf(account, [entry.transaction for entry in entries])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(json.dumps({
+            'seconds': elapsed,
+            'peak_rss_mb': peak_rss_mb(),
+            'baseline_rss_mb': baseline,
+            'pdf_kb': len(pdf.getvalue()) // 1024,
+        }))
+
+    def _seed(self, user, sizes, batch_size):
+        """One account per benchmark size; returns {size: account_id}"""
+        rng = random.Random(42)
+        accounts = {}
+        start = timezone.now() - timedelta(days=365)
+        for size in sizes:
+            account = Account.objects.create(user=user, account_type='BUSINESS')
+            accounts[size] = account.id
+            balance = Decimal('0.00')
+            for offset in range(0, size, batch_size):
+                count = min(batch_size, size - offset)
+                amounts = [Decimal(rng.randrange(-50000, 50000) or 1) / 100 for _ in range(count)]
+                txns = Transaction.objects.bulk_create([
+                    Transaction(
+                        from_account=account if amount < 0 else None,
+                        to_account=account if amount > 0 else None,
+                        amount=abs(amount),
+                        transaction_type='PAYMENT' if amount < 0 else 'DEPOSIT',
+                        status='COMPLETED',
+                        description=f"Bench transaction {offset + i}",
+                        reference_number=f"BSR{account.id:06d}{offset + i:09d}"
+                    )
+                    for i, amount in enumerate(amounts)
+                ])
+                entries = []
+                for i, (txn, amount) in enumerate(zip(txns, amounts)):
+                    balance += amount
+                    entries.append(LedgerEntry(
+                        account=account, transaction=txn, amount=amount, balance_after=balance,
+                        created_at=start + timedelta(seconds=(offset + i) * 30)
+                    ))
+                LedgerEntry.objects.bulk_create(entries)
+        return accounts
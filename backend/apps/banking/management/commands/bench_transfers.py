@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from apps.banking.management.benchmark import BenchmarkCommand
+from apps.banking.models import Account
+from apps.banking.services import BankingService
+
+
+class Command(BenchmarkCommand):
+    help = "Benchmark transfer execution modes against the configured database"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transfers', type=int, default=500, help='Transfers per mode')
+        parser.add_argument('--accounts', type=int, default=20, help='Accounts to spread transfers over')
+        parser.add_argument('--threads', type=int, default=1, help='Concurrent workers')
+        parser.add_argument('--modes', default='locking,conditional', help='Comma-separated modes to compare')
+
+    def handle(self, *args, **options):
+        modes = [mode.strip() for mode in options['modes'].split(',') if mode.strip()]
+        user, _ = User.objects.get_or_create(username='bench_transfers')
+
+        try:
+            results = {}
+            for mode in modes:
+                accounts = self._create_accounts(user, options['accounts'])
+                results[mode] = self._run(mode, accounts, options['transfers'], options['threads'])
+                Account.objects.filter(user=user).delete()
+
+            self.stdout.write(f"\n{'mode':<12} {'transfers/s':>12} {'avg ms':>9} {'p95 ms':>9} {'queries':>8}")
+            for mode, result in results.items():
+                self.stdout.write(
+                    f"{mode:<12} {result['throughput']:>12.1f} {result['avg_ms']:>9.2f} "
+                    f"{result['p95_ms']:>9.2f} {result['queries']:>8}"
+                )
+
+            if 'locking' in results and 'conditional' in results:
+                speedup = results['conditional']['throughput'] / results['locking']['throughput']
+                self.stdout.write(self.style.SUCCESS(f"\nconditional vs locking: {speedup:.2f}x throughput"))
+        finally:
+            user.delete()
+
+    def _create_accounts(self, user, count):
+        return [
+            Account.objects.create(user=user, account_type='CHECKING', balance=Decimal('1000000.00'))
+            for _ in range(count)
+        ]
+
+    def _run(self, mode, accounts, transfers, threads):
+        pairs = [
+            (accounts[i % len(accounts)], accounts[(i + 1) % len(accounts)])
+            for i in range(transfers)
+        ]
+
+        # Query count of a single transfer, measured separately
+        with CaptureQueriesContext(connection) as queries:
+            BankingService.create_transfer(accounts[0].id, accounts[1].account_number, Decimal('1.00'), mode=mode)
+
+        def transfer(pair):
+            from_account, to_account = pair
+            started = time.perf_counter()
+            BankingService.create_transfer(from_account.id, to_account.account_number, Decimal('1.00'), mode=mode)
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        if threads > 1:
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                latencies = list(pool.map(transfer, pairs))
+        else:
+            latencies = [transfer(pair) for pair in pairs]
+        wall = time.perf_counter() - started
+
+        latencies.sort()
+        return {
+            'throughput': transfers / wall,
+            'avg_ms': sum(latencies) / len(latencies) * 1000,
+            'p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+            'queries': len(queries),
+        }
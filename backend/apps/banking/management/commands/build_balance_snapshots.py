@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from apps.banking.balances import build_snapshots
+from apps.banking.models import Account
+
+
+class Command(BaseCommand):
+    help = "Create end-of-day balance snapshots for activity since the last snapshot"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', type=int, action='append', dest='accounts',
+                            help='Only snapshot this account id (repeatable)')
+
+    def handle(self, *args, **options):
+        accounts = Account.objects.order_by('id')
+        if options['accounts']:
+            accounts = accounts.filter(id__in=options['accounts'])
+
+        created = 0
+        for account in accounts.iterator():
+            created += build_snapshots(account)
+
+        self.stdout.write(self.style.SUCCESS(f"Created {created} balance snapshots"))
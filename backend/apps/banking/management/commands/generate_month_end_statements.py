@@ -0,0 +1,97 @@
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from apps.banking.models import Account
+from apps.banking.statements import month_end_statement_path, month_period, render_month_end_shard
+
+
+def _init_worker():
+    # A no-op after fork; needed when the platform spawns workers instead
+    import django
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = "Render month-end PDF statements for every account across a process pool"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='YYYY-MM (default: the previous calendar month)')
+        parser.add_argument('--output', help='Output directory (default: STATEMENTS_ROOT/month-end/YYYY-MM)')
+        parser.add_argument('--archive', action='store_true', help='Also pack the statements into YYYY-MM.zip')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--shard-size', type=int, default=200, help='Accounts per worker task')
+        parser.add_argument('--include-inactive', action='store_true')
+
+    def handle(self, *args, **options):
+        year, month = self.parse_month(options['month'])
+        period_start, period_end = month_period(year, month)
+        label = f"{year:04d}-{month:02d}"
+        directory = options['output'] or os.path.join(settings.STATEMENTS_ROOT, 'month-end', label)
+        os.makedirs(directory, exist_ok=True)
+
+        accounts = Account.objects.filter(created_at__lt=period_end)
+        if not options['include_inactive']:
+            accounts = accounts.filter(status='ACTIVE')
+
+        # Resumable: statements already on disk from an earlier run are skipped
+        pending = [
+            account_id
+            for account_id, account_number in accounts.order_by('id').values_list('id', 'account_number')
+            if not os.path.exists(month_end_statement_path(directory, account_number))
+        ]
+        shard_size = max(1, options['shard_size'])
+        shards = [pending[i:i + shard_size] for i in range(0, len(pending), shard_size)]
+        self.stdout.write(f"{label}: {len(pending)} statements to render in {len(shards)} shards")
+
+        # Forked workers must not share the parent's database sockets
+        connections.close_all()
+
+        started = time.perf_counter()
+        written = 0
+        if shards:
+            with ProcessPoolExecutor(max_workers=max(1, options['workers']), initializer=_init_worker) as pool:
+                futures = [
+                    pool.submit(render_month_end_shard, shard, period_start, period_end, directory)
+                    for shard in shards
+                ]
+                for future in as_completed(futures):
+                    written += future.result()
+                    self.stdout.write(f"  {written}/{len(pending)}")
+        elapsed = time.perf_counter() - started
+
+        rate = written / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {written} statements in {elapsed:.2f}s ({rate:.1f} statements/sec) into {directory}"
+        ))
+
+        if options['archive']:
+            archive = self.write_archive(directory)
+            self.stdout.write(self.style.SUCCESS(f"Archive: {archive}"))
+
+    def parse_month(self, value):
+        if not value:
+            last_month = timezone.localdate().replace(day=1) - timedelta(days=1)
+            value = last_month.strftime('%Y-%m')
+        try:
+            year, month = (int(part) for part in value.split('-'))
+            if not 1 <= month <= 12:
+                raise ValueError
+        except ValueError:
+            raise CommandError(f"Invalid --month '{value}', expected YYYY-MM")
+        return year, month
+
+    def write_archive(self, directory):
+        archive = f"{directory.rstrip(os.sep)}.zip"
+        tmp_archive = f"{archive}.tmp"
+        with zipfile.ZipFile(tmp_archive, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for name in sorted(os.listdir(directory)):
+                if name.endswith('.pdf'):
+                    zf.write(os.path.join(directory, name), arcname=name)
+        os.replace(tmp_archive, archive)
+        return archive
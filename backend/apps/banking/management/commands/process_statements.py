@@ -0,0 +1,41 @@
+import itertools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connections
+from apps.banking.statements import pending_statements, render_queued_statement
+
+
+def _init_worker():
+    # A no-op after fork; needed when the platform spawns workers instead
+    import django
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = "Render queued PDF statements across a process pool (the statement worker)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--stale-minutes', type=int, default=10,
+                            help='Re-claim RUNNING statements older than this')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new work')
+        parser.add_argument('--interval', type=float, default=2.0, help='Polling interval with --loop')
+
+    def handle(self, *args, **options):
+        stale_after = timedelta(minutes=options['stale_minutes'])
+
+        with ProcessPoolExecutor(max_workers=max(1, options['workers']), initializer=_init_worker) as pool:
+            while True:
+                statement_ids = list(pending_statements(stale_after))
+                # Workers forked from here must not share our database socket
+                connections.close_all()
+                rendered = sum(pool.map(render_queued_statement, statement_ids, itertools.repeat(stale_after)))
+                if statement_ids:
+                    self.stdout.write(f"Rendered {rendered}/{len(statement_ids)} statements")
+
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
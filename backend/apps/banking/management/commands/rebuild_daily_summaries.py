@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from apps.banking.models import Account
+from apps.banking.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = "Recompute the daily account summaries from the ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--account', action='append', dest='accounts', metavar='ACCOUNT_NUMBER',
+                            help='Only this account (repeatable)')
+        parser.add_argument('--since', help='Only days from this date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        account_ids = None
+        if options['accounts']:
+            account_ids = list(
+                Account.objects.filter(account_number__in=options['accounts']).values_list('id', flat=True)
+            )
+            if len(account_ids) != len(set(options['accounts'])):
+                raise CommandError("Unknown account number")
+
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError("--since must be a date (YYYY-MM-DD)")
+
+        written = rebuild_summaries(account_ids, since)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily summary rows"))
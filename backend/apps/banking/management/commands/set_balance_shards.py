@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from apps.banking.models import Account
+from apps.banking.services import BankingService
+
+
+class Command(BaseCommand):
+    help = "Spread credits to a hot account over N balance shards (0 turns sharding off)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('account_number')
+        parser.add_argument('shards', type=int)
+
+    def handle(self, *args, **options):
+        if not 0 <= options['shards'] <= 256:
+            raise CommandError("shards must be between 0 and 256")
+
+        account_id = Account.objects.filter(
+            account_number=options['account_number']
+        ).values_list('id', flat=True).first()
+        try:
+            account = BankingService.set_balance_shards(account_id, options['shards'])
+        except ValidationError as e:
+            raise CommandError(str(e.detail[0]))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{account.account_number}: {account.balance_shards} shards, balance {account.total_balance}"
+        ))
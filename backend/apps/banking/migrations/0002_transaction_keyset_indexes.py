@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['-created_at', '-id'], name='txn_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['from_account', '-created_at', '-id'], name='txn_from_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['to_account', '-created_at', '-id'], name='txn_to_created_id_idx'),
+        ),
+    ]
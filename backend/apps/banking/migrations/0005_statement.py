@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:49
+
+import apps.banking.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0004_balancesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Statement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_entry_id', models.BigIntegerField(default=0)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('READY', 'Ready'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('file', models.FileField(blank=True, storage=apps.banking.models.statement_storage, upload_to='statements/')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statements', to='banking.account')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'unique_together': {('account', 'last_entry_id')},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:57
+
+from django.db import migrations, models
+
+# name -> first value. Account numbers start at 11 digits so they never
+# need zero padding.
+SEQUENCES = {
+    'account_number': 10_000_000_000,
+    'reference_worker': 0,
+}
+
+
+def create_sequences(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name, start in SEQUENCES.items():
+            schema_editor.execute(f"CREATE SEQUENCE IF NOT EXISTS banking_{name}_seq START WITH {start} MINVALUE 0")
+    else:
+        NumberSequence = apps.get_model('banking', 'NumberSequence')
+        for name, start in SEQUENCES.items():
+            NumberSequence.objects.get_or_create(name=name, defaults={'next_value': start})
+
+
+def drop_sequences(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for name in SEQUENCES:
+            schema_editor.execute(f"DROP SEQUENCE IF EXISTS banking_{name}_seq")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0005_statement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberSequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('next_value', models.BigIntegerField()),
+            ],
+        ),
+        migrations.RunPython(create_sequences, drop_sequences),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:59
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0007_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='balance_shards',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='balance_after',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=15, null=True),
+        ),
+        migrations.CreateModel(
+            name='AccountBalanceShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='banking.account')),
+            ],
+            options={
+                'unique_together': {('account', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:01
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0008_balance_shards'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='RUNNING', max_length=10)),
+                ('incremental', models.BooleanField(default=False)),
+                ('since', models.DateTimeField(blank=True, null=True)),
+                ('accounts_checked', models.PositiveIntegerField(default=0)),
+                ('mismatch_count', models.PositiveIntegerField(default=0)),
+                ('mismatches', models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:02
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0009_reconciliationrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyAccountSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('transaction_type', models.CharField(choices=[('TRANSFER', 'Transfer'), ('DEPOSIT', 'Deposit'), ('WITHDRAWAL', 'Withdrawal'), ('PAYMENT', 'Payment')], max_length=10)),
+                ('inflow', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('outflow', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=15)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='banking.account')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('account', 'date', 'transaction_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 09:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0010_dailyaccountsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='beneficiary',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
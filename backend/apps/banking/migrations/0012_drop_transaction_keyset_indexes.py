@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:02
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0011_beneficiary_updated_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_created_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_from_created_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='txn_to_created_id_idx',
+        ),
+    ]
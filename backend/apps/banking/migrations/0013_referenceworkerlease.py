@@ -0,0 +1,79 @@
+# Generated by Django 5.2.7 on 2026-10-18 10:18
+
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+from django.db.models import Max
+
+WORKER_IDS = 1024
+
+
+def create_leases(apps, schema_editor):
+    ReferenceWorkerLease = apps.get_model('banking', 'ReferenceWorkerLease')
+    expired = datetime(2000, 1, 1, tzinfo=timezone.utc)
+    ReferenceWorkerLease.objects.bulk_create([
+        ReferenceWorkerLease(worker_id=worker_id, expires_at=expired) for worker_id in range(WORKER_IDS)
+    ])
+
+
+def drop_worker_sequence(apps, schema_editor):
+    # Worker ids are leased now, not taken from a sequence modulo 1024
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP SEQUENCE IF EXISTS banking_reference_worker_seq")
+    else:
+        apps.get_model('banking', 'NumberSequence').objects.filter(name='reference_worker').delete()
+
+
+def create_worker_sequence(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("CREATE SEQUENCE IF NOT EXISTS banking_reference_worker_seq START WITH 0 MINVALUE 0")
+    else:
+        apps.get_model('banking', 'NumberSequence').objects.get_or_create(
+            name='reference_worker', defaults={'next_value': 0}
+        )
+
+
+def start_account_numbers_above_existing(apps, schema_editor):
+    """
+    Legacy account numbers are 12 random digits, so a sequence value (the
+    first 11 digits of a new number) could match one. Move the sequence
+    past the highest 11-digit prefix in use.
+    """
+    Account = apps.get_model('banking', 'Account')
+    highest = Account.objects.filter(account_number__regex=r'^[0-9]{12}$').aggregate(
+        highest=Max('account_number')
+    )['highest']
+    if highest is None:
+        return
+    start = int(highest[:11]) + 1
+
+    if schema_editor.connection.vendor == 'postgresql':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("SELECT last_value FROM banking_account_number_seq")
+            if cursor.fetchone()[0] < start:
+                cursor.execute("SELECT setval('banking_account_number_seq', %s, false)", [start])
+    else:
+        apps.get_model('banking', 'NumberSequence').objects.filter(
+            name='account_number', next_value__lt=start
+        ).update(next_value=start)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0012_drop_transaction_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceWorkerLease',
+            fields=[
+                ('worker_id', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('token', models.CharField(blank=True, max_length=32)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(create_leases, migrations.RunPython.noop),
+        migrations.RunPython(drop_worker_sequence, create_worker_sequence),
+        migrations.RunPython(start_account_numbers_above_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 11:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0013_referenceworkerlease'),
+    ]
+
+    operations = [
+        # Existing legs were already added by record_transactions (or are
+        # picked up by the next rebuild_daily_summaries): mark them summarized
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='summarized',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='summarized',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,9 +1,11 @@
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from decimal import Decimal
-import random
-import string
 
 class Account(models.Model):
     ACCOUNT_TYPES = [
@@ -24,6 +26,9 @@ class Account(models.Model):
     balance = models.DecimalField(max_digits=15, decimal_places=2, default=0.00, validators=[MinValueValidator(0)])
     currency = models.CharField(max_length=3, default='USD')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='ACTIVE')
+    # Hot accounts only: number of AccountBalanceShard rows that take credits
+    # (0 = not sharded, every credit updates this row)
+    balance_shards = models.PositiveSmallIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -33,6 +38,18 @@ class Account(models.Model):
     def __str__(self):
         return f"{self.account_number} - {self.user.username}"
     
+    @property
+    def total_balance(self):
+        """The reported balance: this row plus any credits still sitting in shards"""
+        if not self.balance_shards:
+            return self.balance
+        # Querysets can annotate shard_total=Sum('shards__balance') to avoid
+        # a query per account
+        shard_total = getattr(self, 'shard_total', None)
+        if shard_total is None:
+            shard_total = self.shards.aggregate(total=models.Sum('balance'))['total']
+        return self.balance + (shard_total or Decimal('0.00'))
+    
     def save(self, *args, **kwargs):
         if not self.account_number:
             self.account_number = self.generate_account_number()
@@ -40,11 +57,9 @@ class Account(models.Model):
     
     @staticmethod
     def generate_account_number():
-        """Generate a unique 12-digit account number"""
-        while True:
-            number = ''.join(random.choices(string.digits, k=12))
-            if not Account.objects.filter(account_number=number).exists():
-                return number
+        """Generate a unique 12-digit account number (sequence + Luhn check digit)"""
+        from .identifiers import next_account_number
+        return next_account_number()
 
 
 class Transaction(models.Model):
@@ -85,11 +100,132 @@ class Transaction(models.Model):
     
     @staticmethod
     def generate_reference_number():
-        """Generate a unique reference number"""
-        while True:
-            ref = 'TXN' + ''.join(random.choices(string.ascii_uppercase + string.digits, k=12))
-            if not Transaction.objects.filter(reference_number=ref).exists():
-                return ref
+        """Generate a unique, time-ordered reference number"""
+        from .identifiers import next_reference_number
+        return next_reference_number()
+
+
+class AccountBalanceShard(models.Model):
+    """
+    A sub-balance of a hot (sharded) account. Credits land on a random shard
+    instead of the account row, so concurrent payers don't queue on a single
+    row lock; debits move shard balances back onto the account as needed.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='shards')
+    shard = models.PositiveSmallIntegerField()
+    balance = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['account', 'shard']
+    
+    def __str__(self):
+        return f"{self.account.account_number} shard {self.shard}: {self.balance}"
+
+
+class LedgerEntry(models.Model):
+    """
+    One leg of a Transaction as seen from a single account.
+    
+    Money leaving the account is negative, money arriving is positive, and
+    balance_after is the account balance once the leg was applied (NULL for
+    sharded accounts, whose total is not known without reading every shard).
+    History reads hit the (account, created_at) index instead of OR-ing over
+    Transaction.from_account / to_account.
+    
+    summarized is set once the leg is folded into DailyAccountSummary, by
+    whichever of record_transactions and rebuild_summaries gets it first.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='ledger_entries')
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='ledger_entries')
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=15, decimal_places=2, null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    summarized = models.BooleanField(default=False)
+    
+    class Meta:
+        ordering = ['-created_at', '-id']
+        unique_together = ['transaction', 'account']
+        indexes = [
+            models.Index(fields=['account', '-created_at', '-id'], name='ledger_account_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.account.account_number} {self.amount:+} ({self.transaction.reference_number})"
+
+
+class BalanceSnapshot(models.Model):
+    """
+    Balance of an account at a point in time (end of day), including every
+    ledger entry created before ``as_of``. Balance-as-of queries start from
+    the nearest snapshot and only sum the entries after it.
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='balance_snapshots')
+    as_of = models.DateTimeField()
+    balance = models.DecimalField(max_digits=15, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-as_of']
+        unique_together = ['account', 'as_of']
+    
+    def __str__(self):
+        return f"{self.account.account_number} @ {self.as_of:%Y-%m-%d %H:%M}: {self.balance}"
+
+
+def statement_storage():
+    # Statements are private: keep them out of MEDIA_ROOT, which is served publicly
+    return FileSystemStorage(location=settings.STATEMENTS_ROOT)
+
+
+class DailyAccountSummary(models.Model):
+    """
+    Per-account, per-day, per-type totals of completed transactions, kept up
+    to date after every commit so analytics never scan Transaction
+    """
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='daily_summaries')
+    date = models.DateField()
+    transaction_type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    inflow = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    outflow = models.DecimalField(max_digits=15, decimal_places=2, default=Decimal('0.00'))
+    count = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-date']
+        unique_together = ['account', 'date', 'transaction_type']
+    
+    def __str__(self):
+        return f"{self.account.account_number} {self.date} {self.transaction_type}: +{self.inflow} -{self.outflow}"
+
+
+class Statement(models.Model):
+    """
+    A rendered PDF statement, keyed by account and the last ledger entry it
+    covers. While no new entry is posted the stored file is reused as-is;
+    once a later one is READY the earlier ones are deleted.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('READY', 'Ready'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='statements')
+    last_entry_id = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    file = models.FileField(upload_to='statements/', storage=statement_storage, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        unique_together = ['account', 'last_entry_id']
+    
+    def __str__(self):
+        return f"Statement {self.account.account_number} @{self.last_entry_id} ({self.status})"
 
 
 class Beneficiary(models.Model):
@@ -99,6 +235,7 @@ class Beneficiary(models.Model):
     bank_name = models.CharField(max_length=100, default='Demo Bank')
     nickname = models.CharField(max_length=50, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name_plural = 'Beneficiaries'
@@ -106,4 +243,101 @@ class Beneficiary(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"{self.name} - {self.account_number}"
\ No newline at end of file
+        return f"{self.name} - {self.account_number}"
+
+
+class NumberSequence(models.Model):
+    """
+    Counter behind sequence-allocated identifiers on databases without
+    native sequences. On PostgreSQL the ``banking_<name>_seq`` sequences
+    are used instead.
+    """
+    name = models.CharField(max_length=50, primary_key=True)
+    next_value = models.BigIntegerField()
+    
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+
+
+class ReferenceWorkerLease(models.Model):
+    """
+    One of the 1024 worker ids embedded in transaction references. A
+    process leases a free (expired) id before generating references and
+    renews it while it runs, so no two live processes share an id.
+    """
+    worker_id = models.PositiveSmallIntegerField(primary_key=True)
+    token = models.CharField(max_length=32, blank=True)
+    expires_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"worker {self.worker_id} until {self.expires_at:%Y-%m-%d %H:%M:%S}"
+
+class IdempotencyKey(models.Model):
+    """
+    The stored outcome of a request sent with an ``Idempotency-Key`` header,
+    replayed to retries of that request until ``expires_at``.
+    """
+    STATUS_CHOICES = [
+        ('IN_PROGRESS', 'In progress'),
+        ('COMPLETED', 'Completed'),
+    ]
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default='IN_PROGRESS')
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        unique_together = ['user', 'key']
+    
+    def __str__(self):
+        return f"{self.user_id}:{self.key} ({self.status})"
+
+
+
+class EventStreamTicket(models.Model):
+    """
+    A single-use credential for opening the event stream, which EventSource
+    cannot send an Authorization header to. Only the ticket's SHA-256 digest
+    is stored; the stream it opens closes at ``access_expires_at``, the
+    expiry of the access token that minted it.
+    """
+    digest = models.CharField(max_length=64, primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='event_stream_tickets')
+    expires_at = models.DateTimeField()
+    access_expires_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.user_id} until {self.expires_at:%Y-%m-%d %H:%M:%S}"
+
+class ReconciliationRun(models.Model):
+    """
+    One run of ``manage.py reconcile_ledger``: which accounts were checked
+    and which balances did not match their completed transactions
+    """
+    STATUS_CHOICES = [
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='RUNNING')
+    incremental = models.BooleanField(default=False)
+    since = models.DateTimeField(null=True, blank=True)
+    accounts_checked = models.PositiveIntegerField(default=0)
+    mismatch_count = models.PositiveIntegerField(default=0)
+    mismatches = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+    
+    def __str__(self):
+        return f"Reconciliation {self.started_at:%Y-%m-%d %H:%M} ({self.status}, {self.mismatch_count} mismatches)"
@@ -0,0 +1,119 @@
+import base64
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over (created_at, id), newest first.
+
+    The cursor encodes the position of the last row of the previous page, so
+    each page is a single index range scan and no COUNT(*) is issued. Page 1
+    and page 10,000 cost the same.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 20)
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by('-created_at', '-id')
+        position = self.decode_cursor(request)
+        if position:
+            created_at, pk = position
+            # The redundant created_at__lte bound lets the database range-scan
+            # the (created_at, id) index instead of evaluating the OR per row
+            queryset = queryset.filter(created_at__lte=created_at).filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(last))
+
+    def encode_cursor(self, row):
+        raw = f"{row.created_at.isoformat()}|{row.pk}"
+        return base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            created_at, pk = base64.urlsafe_b64decode(padded.encode('ascii')).decode('ascii').split('|')
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
+
+
+class AsyncPageNumberPagination(PageNumberPagination):
+    """
+    PageNumberPagination for async views: same page parameter, links and
+    response body, with the count and page queries run on the async ORM.
+    Pass ``count`` when the view already knows it to skip the COUNT(*).
+    """
+
+    async def apaginate_queryset(self, queryset, request, count=None):
+        self.request = request
+        paginator = self.django_paginator_class(queryset, self.page_size)
+        paginator.count = await queryset.acount() if count is None else count
+
+        page_number = request.GET.get(self.page_query_param) or 1
+        if page_number in self.last_page_strings:
+            page_number = paginator.num_pages
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        return self.page.object_list
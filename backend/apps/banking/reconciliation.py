@@ -0,0 +1,77 @@
+from decimal import Decimal
+from django.db import connection
+from django.db.models import DecimalField, Exists, F, OuterRef, Q, Sum, Value
+from .models import Account, AccountBalanceShard, LedgerEntry, Transaction
+
+CENT = Decimal('0.01')
+ZERO = Value(Decimal('0.00'), output_field=DecimalField(max_digits=15, decimal_places=2))
+
+
+def account_ranges(first_id, last_id, size):
+    """Split [first_id, last_id] into half-open id ranges of ``size`` ids"""
+    return [(start, min(start + size, last_id + 1)) for start in range(first_id, last_id + 1, size)]
+
+
+def _flows(completed, side, accounts, inflow, outflow):
+    """Per-account totals of ``completed`` grouped by its ``side`` account"""
+    return completed.filter(**{f'{side}__in': accounts}).order_by().values(
+        account=F(side)
+    ).annotate(inflow=inflow, outflow=outflow).values_list('account', 'inflow', 'outflow')
+
+
+def reconcile_range(start_id, end_id, since=None, recheck_ids=()):
+    """
+    Check every account with start_id <= id < end_id: its balance (plus
+    shard balances) against incoming minus outgoing COMPLETED transactions.
+    The transaction totals come from one grouped query (a UNION of the
+    incoming and outgoing sides) and the shard totals from another, joined
+    to the accounts here. With ``since``, only accounts touched since then,
+    plus ``recheck_ids``, are checked. Returns (accounts_checked, mismatches).
+
+    Runs in a worker process; closes its database connection when done.
+    """
+    try:
+        accounts = Account.objects.filter(id__gte=start_id, id__lt=end_id)
+        if since is not None:
+            accounts = accounts.filter(
+                Q(id__in=[account_id for account_id in recheck_ids if start_id <= account_id < end_id])
+                | Q(updated_at__gte=since)
+                | Exists(LedgerEntry.objects.filter(account=OuterRef('pk'), created_at__gte=since))
+                | Exists(AccountBalanceShard.objects.filter(account=OuterRef('pk'), updated_at__gte=since))
+            )
+        account_ids = accounts.values('id')
+
+        completed = Transaction.objects.filter(status='COMPLETED')
+        flows = {}
+        for account_id, inflow, outflow in _flows(completed, 'to_account', account_ids, Sum('amount'), ZERO).union(
+            _flows(completed, 'from_account', account_ids, ZERO, Sum('amount')), all=True
+        ):
+            # SQLite sums decimals as floats: work in whole cents
+            totals = flows.setdefault(account_id, [Decimal('0.00'), Decimal('0.00')])
+            totals[0] += Decimal(str(inflow)).quantize(CENT)
+            totals[1] += Decimal(str(outflow)).quantize(CENT)
+
+        shard_totals = dict(
+            AccountBalanceShard.objects.filter(account__in=account_ids).order_by().values('account')
+            .annotate(total=Sum('balance')).values_list('account', 'total')
+        )
+
+        checked = 0
+        mismatches = []
+        rows = accounts.order_by('id').values_list('id', 'account_number', 'balance')
+        for account_id, account_number, balance in rows.iterator(chunk_size=5000):
+            checked += 1
+            inflow, outflow = flows.get(account_id, (Decimal('0.00'), Decimal('0.00')))
+            actual = (Decimal(str(balance)) + Decimal(str(shard_totals.get(account_id, 0)))).quantize(CENT)
+            expected = inflow - outflow
+            if actual != expected:
+                mismatches.append({
+                    'account_id': account_id,
+                    'account_number': account_number,
+                    'balance': actual,
+                    'expected': expected,
+                    'difference': actual - expected,
+                })
+        return checked, mismatches
+    finally:
+        connection.close()
@@ -1,14 +1,25 @@
 from rest_framework import serializers
-from .models import Account, Transaction, Beneficiary
+from .models import Account, Transaction, LedgerEntry, Statement, Beneficiary
+from .cache import balance_cache
 from django.contrib.auth.models import User
+from django.urls import reverse
 
 class AccountSerializer(serializers.ModelSerializer):
     username = serializers.CharField(source='user.username', read_only=True)
+    balance = serializers.DecimalField(source='total_balance', max_digits=15, decimal_places=2, read_only=True)
     
     class Meta:
         model = Account
         fields = ['id', 'account_number', 'account_type', 'balance', 'currency', 'status', 'username', 'created_at']
         read_only_fields = ['id', 'account_number', 'balance', 'created_at']
+    
+    def to_representation(self, instance):
+        # The balance was just read from the database: keep it for the
+        # balance endpoint, without overwriting a newer write-through value.
+        # Async views pass prime_balance_cache=False and prime it themselves
+        if self.context.get('prime_balance_cache', True):
+            balance_cache.prime(instance)
+        return super().to_representation(instance)
 
 class TransactionSerializer(serializers.ModelSerializer):
     from_account_number = serializers.CharField(source='from_account.account_number', read_only=True)
@@ -21,6 +32,31 @@ class TransactionSerializer(serializers.ModelSerializer):
                   'created_at', 'completed_at']
         read_only_fields = ['id', 'reference_number', 'status', 'created_at', 'completed_at']
 
+class LedgerEntrySerializer(serializers.ModelSerializer):
+    """
+    A Transaction as seen from one account: the TransactionSerializer fields
+    plus the signed amount and running balance of that account's leg
+    """
+    id = serializers.IntegerField(source='transaction_id', read_only=True)
+    from_account = serializers.IntegerField(source='transaction.from_account_id', read_only=True)
+    to_account = serializers.IntegerField(source='transaction.to_account_id', read_only=True)
+    from_account_number = serializers.CharField(source='transaction.from_account.account_number', read_only=True)
+    to_account_number = serializers.CharField(source='transaction.to_account.account_number', read_only=True)
+    amount = serializers.DecimalField(source='transaction.amount', max_digits=15, decimal_places=2, read_only=True)
+    transaction_type = serializers.CharField(source='transaction.transaction_type', read_only=True)
+    status = serializers.CharField(source='transaction.status', read_only=True)
+    description = serializers.CharField(source='transaction.description', read_only=True)
+    reference_number = serializers.CharField(source='transaction.reference_number', read_only=True)
+    completed_at = serializers.DateTimeField(source='transaction.completed_at', read_only=True)
+    signed_amount = serializers.DecimalField(source='amount', max_digits=15, decimal_places=2, read_only=True)
+    
+    class Meta:
+        model = LedgerEntry
+        fields = ['id', 'from_account', 'to_account', 'from_account_number', 'to_account_number', 
+                  'amount', 'transaction_type', 'status', 'description', 'reference_number', 
+                  'created_at', 'completed_at', 'account', 'signed_amount', 'balance_after']
+        read_only_fields = fields
+
 class TransferSerializer(serializers.Serializer):
     from_account_id = serializers.IntegerField()
     to_account_number = serializers.CharField(max_length=12)
@@ -32,6 +68,24 @@ class TransferSerializer(serializers.Serializer):
             raise serializers.ValidationError("Amount must be greater than zero.")
         return value
 
+class BatchTransferSerializer(serializers.Serializer):
+    transfers = TransferSerializer(many=True, allow_empty=False, max_length=500)
+
+class StatementSerializer(serializers.ModelSerializer):
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Statement
+        fields = ['id', 'account', 'last_entry_id', 'status', 'error', 'created_at', 'completed_at', 'download_url']
+        read_only_fields = fields
+    
+    def get_download_url(self, obj):
+        if obj.status != 'READY':
+            return None
+        url = reverse('statement-download', args=[obj.id])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
 class BeneficiarySerializer(serializers.ModelSerializer):
     class Meta:
         model = Beneficiary
@@ -1,75 +1,342 @@
+import random
+from django.conf import settings
 from django.db import transaction
+from django.db.models import F, Q
 from django.utils import timezone
 from decimal import Decimal
-from .models import Account, Transaction
+from .models import Account, AccountBalanceShard, Transaction, LedgerEntry
+from .concurrency import lock_accounts, run_with_retry
+from .signals import send_transaction_committed
 from rest_framework.exceptions import ValidationError
 
+
+def _validate_transfer(from_account, to_account, amount, user=None):
+    """
+    Check that a transfer between two (already locked) accounts is allowed
+    """
+    if from_account is None:
+        raise ValidationError("Account not found")
+    
+    if user and from_account.user_id != user.id:
+        raise ValidationError("You don't have permission to transfer from this account")
+    
+    if from_account.status != 'ACTIVE':
+        raise ValidationError("Source account is not active")
+    
+    if from_account.balance < amount:
+        raise ValidationError("Insufficient funds")
+    
+    if to_account is None:
+        raise ValidationError("Destination account not found")
+    
+    if to_account.status != 'ACTIVE':
+        raise ValidationError("Destination account is not active")
+    
+    if from_account.id == to_account.id:
+        raise ValidationError("Cannot transfer to the same account")
+
+
+def _ledger_entries(txn, balances):
+    """
+    Build the ledger legs of a completed transaction.
+    ``balances`` maps account id -> balance after the transaction.
+    """
+    entries = []
+    if txn.from_account_id:
+        entries.append(LedgerEntry(
+            account_id=txn.from_account_id,
+            transaction=txn,
+            amount=-txn.amount,
+            balance_after=balances[txn.from_account_id],
+            created_at=txn.created_at
+        ))
+    if txn.to_account_id:
+        entries.append(LedgerEntry(
+            account_id=txn.to_account_id,
+            transaction=txn,
+            amount=txn.amount,
+            balance_after=balances[txn.to_account_id],
+            created_at=txn.created_at
+        ))
+    return entries
+
+
+class ShardedAccountTransfer(Exception):
+    """A conditional-mode transfer touched a sharded account; use the locking path"""
+
+
+def _balance_after(account):
+    # A sharded account's total is spread over rows we haven't locked
+    return None if account.balance_shards else account.balance
+
+
+def _credit_shard(account, amount):
+    """
+    Credit a sharded account through one of its shard rows, picked at random,
+    so concurrent credits contend on 1/N of the locks. The account row itself
+    is neither locked nor written.
+    """
+    updated = AccountBalanceShard.objects.filter(
+        account_id=account.id, shard=random.randrange(account.balance_shards)
+    ).update(balance=F('balance') + amount, updated_at=timezone.now())
+    if not updated:
+        # Shards were resized or disabled under us: credit the account row
+        Account.objects.filter(id=account.id).update(balance=F('balance') + amount, updated_at=timezone.now())
+
+
+def _consolidate_shards(account):
+    """
+    Move every shard balance of a locked account back onto its row (in
+    memory; the caller saves the account). Returns the amount moved.
+    """
+    shards = list(
+        AccountBalanceShard.objects.select_for_update().filter(account_id=account.id).order_by('shard')
+    )
+    moved = sum((shard.balance for shard in shards), Decimal('0.00'))
+    if moved:
+        AccountBalanceShard.objects.filter(
+            id__in=[shard.id for shard in shards if shard.balance]
+        ).update(balance=Decimal('0.00'), updated_at=timezone.now())
+        account.balance += moved
+    return moved
+
+
 class BankingService:
     
     @staticmethod
-    @transaction.atomic
-    def create_transfer(from_account_id, to_account_number, amount, description='', user=None):
+    def create_transfer(from_account_id, to_account_number, amount, description='', user=None, mode=None):
         """
-        Create and execute a transfer between accounts
+        Create and execute a transfer between accounts.
+        Deadlocks and serialization failures are retried with backoff.
+        
+        ``mode`` selects the execution strategy (defaults to the
+        BANKING_TRANSFER_MODE setting):
+        - 'locking': SELECT ... FOR UPDATE both accounts, then save them
+        - 'conditional': guarded single-statement UPDATEs, no row reads
+        
+        Transfers involving a sharded (hot) account always take the locking
+        path: credits go to a shard, debits consolidate shards when the
+        account row alone can't cover them.
         """
+        mode = mode or getattr(settings, 'BANKING_TRANSFER_MODE', 'locking')
+        executors = {
+            'locking': BankingService._execute_transfer,
+            'conditional': BankingService._execute_conditional_transfer,
+        }
+        if mode not in executors:
+            raise ValueError(f"Unknown transfer mode: {mode}")
+        
         try:
-            # Get source account
-            from_account = Account.objects.select_for_update().get(id=from_account_id)
-            
-            # Verify ownership
-            if user and from_account.user != user:
-                raise ValidationError("You don't have permission to transfer from this account")
-            
-            # Check account status
-            if from_account.status != 'ACTIVE':
-                raise ValidationError("Source account is not active")
-            
-            # Check balance
-            if from_account.balance < amount:
+            return run_with_retry(
+                executors[mode],
+                from_account_id, to_account_number, amount, description, user
+            )
+        except ShardedAccountTransfer:
+            return run_with_retry(
+                BankingService._execute_transfer,
+                from_account_id, to_account_number, amount, description, user
+            )
+    
+    @staticmethod
+    @transaction.atomic
+    def _execute_transfer(from_account_id, to_account_number, amount, description, user):
+        # Resolve the destination without locking it, so that both rows can
+        # then be locked together in ascending id order
+        to_account_id, to_shards = (
+            Account.objects.filter(account_number=to_account_number)
+            .values_list('id', 'balance_shards')
+            .first()
+        ) or (None, 0)
+        
+        # A sharded destination is credited through a shard row, so its
+        # account row is read but not locked
+        accounts = lock_accounts([from_account_id] if to_shards else [from_account_id, to_account_id])
+        from_account = accounts.get(from_account_id)
+        to_account = Account.objects.filter(id=to_account_id).first() if to_shards else accounts.get(to_account_id)
+        
+        if from_account and from_account.balance_shards and from_account.balance < amount:
+            _consolidate_shards(from_account)
+        
+        _validate_transfer(from_account, to_account, amount, user)
+        
+        # Create transaction
+        txn = Transaction.objects.create(
+            from_account=from_account,
+            to_account=to_account,
+            amount=amount,
+            transaction_type='TRANSFER',
+            description=description,
+            status='PENDING'
+        )
+        
+        # Execute transfer
+        from_account.balance -= amount
+        from_account.save()
+        
+        if to_account.balance_shards:
+            _credit_shard(to_account, amount)
+        else:
+            to_account.balance += amount
+            to_account.save()
+        
+        # Mark transaction as completed
+        txn.status = 'COMPLETED'
+        txn.completed_at = timezone.now()
+        txn.save()
+        
+        LedgerEntry.objects.bulk_create(_ledger_entries(txn, {
+            from_account.id: _balance_after(from_account),
+            to_account.id: _balance_after(to_account),
+        }))
+        send_transaction_committed(BankingService, [txn], [from_account, to_account])
+        
+        return txn
+    
+    @staticmethod
+    @transaction.atomic
+    def _execute_conditional_transfer(from_account_id, to_account_number, amount, description, user):
+        """
+        Transfer with guarded UPDATE statements instead of locked reads.
+        
+        The debit only matches when the source is active, owned by ``user``
+        and has enough funds, so the balance check and the write happen in a
+        single statement. The transaction row is inserted already COMPLETED.
+        """
+        to_account = Account.objects.filter(account_number=to_account_number).first()
+        if to_account is None:
+            raise ValidationError("Destination account not found")
+        
+        if to_account.id == from_account_id:
+            raise ValidationError("Cannot transfer to the same account")
+        
+        if to_account.balance_shards:
+            raise ShardedAccountTransfer()
+        
+        now = timezone.now()
+        debit = Account.objects.filter(id=from_account_id, status='ACTIVE', balance_shards=0, balance__gte=amount)
+        if user:
+            debit = debit.filter(user=user)
+        credit = Account.objects.filter(id=to_account.id, status='ACTIVE')
+        
+        # Touch the rows in ascending id order, like the locking path
+        updates = sorted([
+            (from_account_id, debit, -amount),
+            (to_account.id, credit, amount),
+        ], key=lambda update: update[0])
+        
+        for account_id, queryset, delta in updates:
+            if not queryset.update(balance=F('balance') + delta, updated_at=now):
+                # Nothing matched: work out why (this rolls back the other leg)
+                if account_id == to_account.id:
+                    raise ValidationError("Destination account is not active")
+                from_account = Account.objects.filter(id=from_account_id).first()
+                if from_account and from_account.balance_shards:
+                    raise ShardedAccountTransfer()
+                _validate_transfer(from_account, to_account, amount, user)
                 raise ValidationError("Insufficient funds")
+        
+        txn = Transaction.objects.create(
+            from_account_id=from_account_id,
+            to_account=to_account,
+            amount=amount,
+            transaction_type='TRANSFER',
+            description=description,
+            status='COMPLETED',
+            completed_at=now
+        )
+        
+        # Both rows are write-locked by the UPDATEs, so this read is stable
+        accounts = list(Account.objects.filter(id__in=[from_account_id, to_account.id]))
+        LedgerEntry.objects.bulk_create(
+            _ledger_entries(txn, {account.id: account.balance for account in accounts})
+        )
+        send_transaction_committed(BankingService, [txn], accounts)
+        
+        return txn
+    
+    @staticmethod
+    def create_batch_transfer(transfers, user=None):
+        """
+        Execute a list of transfers inside a single database transaction.
+        
+        Every account involved is locked once, in ascending id order, so
+        concurrent batches cannot deadlock each other. Items are validated
+        against the running balances of the batch; invalid items are skipped
+        and the rest are applied and bulk-inserted.
+        
+        Returns a list of (transaction, error) pairs in input order.
+        """
+        return run_with_retry(BankingService._execute_batch_transfer, transfers, user)
+    
+    @staticmethod
+    @transaction.atomic
+    def _execute_batch_transfer(transfers, user):
+        from_ids = {item['from_account_id'] for item in transfers}
+        to_numbers = {item['to_account_number'] for item in transfers}
+        
+        # Lock all involved accounts once, in canonical order
+        account_ids = Account.objects.filter(
+            Q(id__in=from_ids) | Q(account_number__in=to_numbers)
+        ).values_list('id', flat=True)
+        accounts_by_id = lock_accounts(account_ids)
+        accounts_by_number = {account.account_number: account for account in accounts_by_id.values()}
+        
+        now = timezone.now()
+        results = []
+        balances_after = []
+        changed = {}
+        
+        for item in transfers:
+            from_account = accounts_by_id.get(item['from_account_id'])
+            to_account = accounts_by_number.get(item['to_account_number'])
+            amount = item['amount']
             
-            # Get destination account
-            try:
-                to_account = Account.objects.select_for_update().get(account_number=to_account_number)
-            except Account.DoesNotExist:
-                raise ValidationError("Destination account not found")
+            if from_account and from_account.balance_shards and from_account.balance < amount:
+                if _consolidate_shards(from_account):
+                    from_account.updated_at = now
+                    changed[from_account.id] = from_account
             
-            # Check destination account status
-            if to_account.status != 'ACTIVE':
-                raise ValidationError("Destination account is not active")
+            try:
+                _validate_transfer(from_account, to_account, amount, user)
+            except ValidationError as e:
+                results.append((None, str(e.detail[0])))
+                continue
             
-            # Cannot transfer to same account
-            if from_account.id == to_account.id:
-                raise ValidationError("Cannot transfer to the same account")
+            # Apply to the in-memory balances so later items see earlier ones
+            from_account.balance -= amount
+            to_account.balance += amount
+            from_account.updated_at = to_account.updated_at = now
+            changed[from_account.id] = from_account
+            changed[to_account.id] = to_account
             
-            # Create transaction
-            txn = Transaction.objects.create(
+            txn = Transaction(
                 from_account=from_account,
                 to_account=to_account,
                 amount=amount,
                 transaction_type='TRANSFER',
-                description=description,
-                status='PENDING'
+                description=item.get('description', ''),
+                status='COMPLETED',
+                completed_at=now,
+                reference_number=Transaction.generate_reference_number()
             )
-            
-            # Execute transfer
-            from_account.balance -= amount
-            to_account.balance += amount
-            
-            from_account.save()
-            to_account.save()
-            
-            # Mark transaction as completed
-            txn.status = 'COMPLETED'
-            txn.completed_at = timezone.now()
-            txn.save()
-            
-            return txn
-            
-        except Account.DoesNotExist:
-            raise ValidationError("Account not found")
-        except Exception as e:
-            raise ValidationError(str(e))
+            results.append((txn, None))
+            balances_after.append({
+                from_account.id: _balance_after(from_account),
+                to_account.id: _balance_after(to_account),
+            })
+        
+        if changed:
+            Account.objects.bulk_update(changed.values(), ['balance', 'updated_at'])
+        if balances_after:
+            txns = Transaction.objects.bulk_create([txn for txn, error in results if txn])
+            LedgerEntry.objects.bulk_create([
+                entry
+                for txn, balances in zip(txns, balances_after)
+                for entry in _ledger_entries(txn, balances)
+            ])
+            send_transaction_committed(BankingService, txns, list(changed.values()))
+        
+        return results
     
     @staticmethod
     @transaction.atomic
@@ -101,7 +368,33 @@ class BankingService:
             txn.completed_at = timezone.now()
             txn.save()
             
+            LedgerEntry.objects.bulk_create(_ledger_entries(txn, {account.id: _balance_after(account)}))
+            send_transaction_committed(BankingService, [txn], [account])
+            
             return txn
             
         except Account.DoesNotExist:
-            raise ValidationError("Account not found")
\ No newline at end of file
+            raise ValidationError("Account not found")
+    
+    @staticmethod
+    @transaction.atomic
+    def set_balance_shards(account_id, count):
+        """
+        Spread credits to a hot account over ``count`` shard rows, or turn
+        sharding off with 0. Existing shard balances are folded back into
+        the account first, so the total never changes.
+        """
+        try:
+            account = Account.objects.select_for_update().get(id=account_id)
+        except Account.DoesNotExist:
+            raise ValidationError("Account not found")
+        
+        _consolidate_shards(account)
+        AccountBalanceShard.objects.filter(account=account).delete()
+        AccountBalanceShard.objects.bulk_create([
+            AccountBalanceShard(account=account, shard=shard) for shard in range(count)
+        ])
+        
+        account.balance_shards = count
+        account.save(update_fields=['balance', 'balance_shards', 'updated_at'])
+        return account
@@ -0,0 +1,79 @@
+import logging
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import Signal, receiver
+from .cache import balance_cache
+from .concurrency import run_after_retries
+from .events import balance_event, get_broker, transaction_event
+from .models import Account
+from .summaries import record_transactions
+
+logger = logging.getLogger(__name__)
+
+# Sent by BankingService once a money-moving database transaction has
+# committed. Arguments:
+#   transactions - the Transaction rows it created
+#   accounts     - the Account instances it changed, with committed balances
+transaction_committed = Signal()
+
+# Sent by BankingService inside that database transaction, before it
+# commits, with the same arguments: what receivers write commits or rolls
+# back with the transfer. Keep receivers to a quick insert (e.g. the
+# notifications outbox); they run while the accounts are locked.
+transaction_recorded = Signal()
+
+
+def send_transaction_committed(sender, transactions, accounts):
+    """
+    Send transaction_recorded now, and schedule transaction_committed for
+    after the current atomic block commits (and after any retry loop
+    running it: see run_after_retries)
+    """
+    transaction_recorded.send(sender=sender, transactions=transactions, accounts=accounts)
+    transaction.on_commit(lambda: run_after_retries(
+        lambda: _send_committed(sender, transactions, accounts)
+    ), robust=True)
+
+
+def _send_committed(sender, transactions, accounts):
+    # The transfer has committed: a failing receiver (cache or broker
+    # outage) must neither fail the request nor stop the other receivers
+    responses = transaction_committed.send_robust(sender=sender, transactions=transactions, accounts=accounts)
+    for receiver_func, response in responses:
+        if isinstance(response, Exception):
+            logger.error("transaction_committed receiver %s failed", receiver_func.__qualname__,
+                         exc_info=response)
+
+
+@receiver(transaction_committed)
+def update_balance_cache(sender, accounts, **kwargs):
+    # A sharded account's in-memory balance excludes its shards: drop it
+    # rather than pay a SUM on every credit to a hot account
+    balance_cache.set_many([account for account in accounts if not account.balance_shards])
+    balance_cache.invalidate([account.id for account in accounts if account.balance_shards])
+
+
+@receiver(transaction_committed)
+def update_daily_summaries(sender, transactions, **kwargs):
+    # Runs after commit: if the process dies in between, the rollup is
+    # repaired by `manage.py rebuild_daily_summaries`
+    record_transactions(transactions)
+
+
+@receiver(transaction_committed)
+def publish_events(sender, transactions, accounts, **kwargs):
+    # Pushed to the owners' open event streams (see events.py)
+    broker = get_broker()
+    owners = {account.id: account.user_id for account in accounts}
+    for account in accounts:
+        broker.publish(account.user_id, balance_event(account))
+    for txn in transactions:
+        event = transaction_event(txn)
+        for user_id in {owners.get(txn.from_account_id), owners.get(txn.to_account_id)} - {None}:
+            broker.publish(user_id, event)
+
+
+@receiver(post_save, sender=Account)
+def invalidate_balance_cache(sender, instance, **kwargs):
+    # Covers writes that bypass BankingService (admin edits, scripts)
+    transaction.on_commit(lambda: balance_cache.invalidate([instance.id]))
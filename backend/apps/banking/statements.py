@@ -0,0 +1,216 @@
+import itertools
+import os
+import tempfile
+from datetime import datetime
+from operator import itemgetter
+from django.core.files import File
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+from .balances import opening_balance, period_balances
+from .models import Account, LedgerEntry, Statement
+from .utils import generate_paginated_statement_pdf
+
+STATEMENT_CHUNK_SIZE = 2000
+
+
+def statement_rows(account, last_entry_id):
+    """
+    (created_at, type, description, signed amount) for every ledger entry up
+    to ``last_entry_id``, oldest first, fetched in chunks
+    """
+    return LedgerEntry.objects.filter(
+        account=account, id__lte=last_entry_id
+    ).order_by('created_at', 'id').values_list(
+        'created_at', 'transaction__transaction_type', 'transaction__description', 'amount'
+    ).iterator(chunk_size=STATEMENT_CHUNK_SIZE)
+
+
+def render_statement_history(account, last_entry_id, output=None):
+    """Full-history paginated PDF for the account up to ``last_entry_id``"""
+    return generate_paginated_statement_pdf(
+        account, statement_rows(account, last_entry_id), opening_balance(account), output=output
+    )
+
+
+def current_entry_id(account):
+    return account.ledger_entries.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def find_current_statement(account):
+    """The Statement row for the account's current ledger position, or None"""
+    return Statement.objects.filter(account=account, last_entry_id=current_entry_id(account)).first()
+
+
+def current_statement(account):
+    """
+    The Statement row for the account's current ledger position, created
+    (PENDING) if this position has never been requested
+    """
+    last_entry_id = current_entry_id(account)
+    try:
+        with transaction.atomic():
+            statement, _ = Statement.objects.get_or_create(account=account, last_entry_id=last_entry_id)
+    except IntegrityError:
+        # Lost a race with a concurrent request for the same position
+        statement = Statement.objects.get(account=account, last_entry_id=last_entry_id)
+    return statement
+
+
+def request_statement(account):
+    """
+    Return the statement for the account's current ledger position, queued
+    (PENDING) for `manage.py process_statements` unless it is already
+    rendered or in progress. Rendering is CPU-bound, so it never runs in
+    the web workers.
+    """
+    statement = current_statement(account)
+
+    if statement.status == 'FAILED':
+        Statement.objects.filter(id=statement.id, status='FAILED').update(status='PENDING', error='')
+        statement.status = 'PENDING'
+
+    return statement
+
+
+def claim_statement(statement_id, stale_after=None):
+    """
+    Atomically move a statement to RUNNING. Returns False if another worker
+    owns it. RUNNING rows older than ``stale_after`` are treated as abandoned.
+    """
+    claimable = Q(status='PENDING')
+    if stale_after is not None:
+        claimable |= Q(status='RUNNING', started_at__lt=timezone.now() - stale_after)
+    return bool(
+        Statement.objects.filter(claimable, id=statement_id).update(status='RUNNING', started_at=timezone.now())
+    )
+
+
+def render_statement(statement_id, stale_after=None):
+    """Render a claimed statement to storage. Returns True if it is READY."""
+    if not claim_statement(statement_id, stale_after):
+        return False
+
+    statement = Statement.objects.select_related('account__user').get(id=statement_id)
+    account = statement.account
+    try:
+        with tempfile.TemporaryFile() as pdf:
+            render_statement_history(account, statement.last_entry_id, output=pdf)
+            pdf.seek(0)
+            statement.file.save(
+                f"{account.account_number}_{statement.last_entry_id}.pdf",
+                File(pdf),
+                save=False
+            )
+        statement.status = 'READY'
+        statement.completed_at = timezone.now()
+        statement.save(update_fields=['file', 'status', 'completed_at'])
+    except Exception as e:
+        statement.status = 'FAILED'
+        statement.error = str(e)
+        statement.save(update_fields=['status', 'error'])
+        return False
+
+    prune_superseded(statement)
+    return True
+
+
+def prune_superseded(statement):
+    """
+    Delete the account's statements for earlier ledger positions, rows and
+    files. RUNNING ones are left to their worker and pruned next time.
+    """
+    superseded = list(
+        Statement.objects.filter(account_id=statement.account_id, last_entry_id__lt=statement.last_entry_id)
+        .exclude(status='RUNNING')
+        .only('id', 'file')
+    )
+    if not superseded:
+        return 0
+
+    # PENDING rows may have been claimed since; READY ones never change
+    deleted, _ = Statement.objects.filter(id__in=[old.id for old in superseded]).exclude(status='RUNNING').delete()
+    for old in superseded:
+        if old.file:
+            old.file.storage.delete(old.file.name)
+    return deleted
+
+
+def render_queued_statement(statement_id, stale_after=None):
+    """render_statement() in a statement worker process"""
+    try:
+        return render_statement(statement_id, stale_after)
+    finally:
+        connection.close()
+
+
+def pending_statements(stale_after):
+    """Ids of queued statements, plus RUNNING ones whose worker went away"""
+    return Statement.objects.filter(
+        Q(status='PENDING') | Q(status='RUNNING', started_at__lt=timezone.now() - stale_after)
+    ).order_by('created_at').values_list('id', flat=True)
+
+
+def month_period(year, month):
+    """[start, end) of a calendar month in the current timezone"""
+    start = timezone.make_aware(datetime(year, month, 1))
+    end = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1))
+    return start, end
+
+
+def month_end_statement_path(directory, account_number):
+    return os.path.join(directory, f"{account_number}.pdf")
+
+
+def render_month_end_shard(account_ids, period_start, period_end, directory):
+    """
+    Render month-end statements for a shard of accounts into ``directory``.
+
+    Runs inside a worker process. Each statement lists the period's entries
+    oldest first, from the balance at the start of the period to the one
+    at its end (period_balances). The queries don't depend on the shard
+    size: one for the accounts, two for their balances and one chunked
+    query for the entries. Every PDF is written to a temporary file and
+    renamed into place, so an interrupted run never leaves a truncated
+    statement behind.
+    Returns the number of statements written.
+    """
+    try:
+        accounts = list(
+            Account.objects.filter(id__in=account_ids).select_related('user')
+            .annotate(shard_total=Sum('shards__balance')).order_by('id')
+        )
+        # Before the entries cursor is opened: no queries while it is read
+        balances = period_balances(accounts, period_start, period_end)
+        entries = LedgerEntry.objects.filter(
+            account_id__in=account_ids,
+            created_at__gte=period_start,
+            created_at__lt=period_end
+        ).order_by('account_id', 'created_at', 'id').values_list(
+            'account_id', 'created_at', 'transaction__transaction_type', 'transaction__description', 'amount'
+        ).iterator(chunk_size=STATEMENT_CHUNK_SIZE)
+        groups = itertools.groupby(entries, key=itemgetter(0))
+        group = next(groups, None)
+
+        written = 0
+        for account in accounts:
+            has_entries = group is not None and group[0] == account.id
+            rows = (row[1:] for row in group[1]) if has_entries else ()
+            opening, closing = balances[account.id]
+            path = month_end_statement_path(directory, account.account_number)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'wb') as f:
+                    generate_paginated_statement_pdf(account, rows, opening, output=f,
+                                                     period=(period_start, period_end, closing))
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            if has_entries:
+                # Only once the PDF has read them: advancing discards the group
+                group = next(groups, None)
+            written += 1
+        return written
+    finally:
+        connection.close()
@@ -0,0 +1,163 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from .concurrency import lock_accounts
+from .models import Account, DailyAccountSummary, LedgerEntry
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def summary_deltas(entries):
+    """
+    Fold ledger legs (dicts with account_id, amount, created_at and
+    transaction__transaction_type) into {(account_id, date, type): [inflow,
+    outflow, count]}
+    """
+    deltas = defaultdict(lambda: [ZERO, ZERO, 0])
+    for entry in entries:
+        day = timezone.localdate(entry['created_at'])
+        delta = deltas[(entry['account_id'], day, entry['transaction__transaction_type'])]
+        if entry['amount'] > 0:
+            delta[0] += entry['amount']
+        else:
+            delta[1] -= entry['amount']
+        delta[2] += 1
+    return deltas
+
+
+@transaction.atomic
+def record_transactions(transactions):
+    """
+    Add committed transactions to the daily rollup. Each (account, day,
+    type) row is bumped with a single F() UPDATE, and created the first
+    time that key is seen.
+    
+    Runs under the accounts' row locks, which rebuild_summaries also takes,
+    and only adds legs not yet marked summarized: a leg the rebuild already
+    counted is skipped, and one it did not see is added to the rebuilt row.
+    """
+    completed = [txn for txn in transactions if txn.status == 'COMPLETED']
+    if not completed:
+        return
+    lock_accounts([txn.from_account_id for txn in completed] + [txn.to_account_id for txn in completed])
+
+    pending = LedgerEntry.objects.filter(transaction__in=completed, summarized=False)
+    entries = list(pending.values('id', 'account_id', 'amount', 'created_at', 'transaction__transaction_type'))
+    if not entries:
+        return
+    LedgerEntry.objects.filter(id__in=[entry['id'] for entry in entries]).update(summarized=True)
+
+    for (account_id, day, txn_type), (inflow, outflow, count) in summary_deltas(entries).items():
+        updated = DailyAccountSummary.objects.filter(
+            account_id=account_id, date=day, transaction_type=txn_type
+        ).update(
+            inflow=F('inflow') + inflow,
+            outflow=F('outflow') + outflow,
+            count=F('count') + count,
+        )
+        if not updated:
+            DailyAccountSummary.objects.create(
+                account_id=account_id, date=day, transaction_type=txn_type,
+                inflow=inflow, outflow=outflow, count=count
+            )
+
+
+def rebuild_summaries(account_ids=None, since=None, batch_size=500):
+    """
+    Recompute rollup rows from the ledger (for all accounts, or only
+    ``account_ids``), from day ``since`` onwards. Accounts are rebuilt
+    ``batch_size`` at a time, each batch in its own transaction holding
+    their row locks. Returns the number of rows written.
+    """
+    accounts = Account.objects.order_by('id').values_list('id', flat=True)
+    if account_ids is not None:
+        accounts = accounts.filter(id__in=account_ids)
+    accounts = list(accounts)
+
+    written = 0
+    for start in range(0, len(accounts), batch_size):
+        written += _rebuild_batch(accounts[start:start + batch_size], since)
+    return written
+
+
+@transaction.atomic
+def _rebuild_batch(account_ids, since):
+    # record_transactions waits on these locks, so it never bumps a row
+    # that is about to be replaced
+    lock_accounts(account_ids)
+
+    existing = DailyAccountSummary.objects.filter(account_id__in=account_ids)
+    entries = LedgerEntry.objects.filter(account_id__in=account_ids)
+    if since is not None:
+        existing = existing.filter(date__gte=since)
+        entries = entries.filter(created_at__date__gte=since)
+
+    # Claim every leg committed so far. A transaction committing after this
+    # keeps its legs unsummarized and is added by its own
+    # record_transactions once the locks are released
+    entries.filter(summarized=False).update(summarized=True)
+
+    rows = (
+        entries.filter(summarized=True)
+        .annotate(day=TruncDate('created_at'))
+        .values('account_id', 'day', 'transaction__transaction_type')
+        .annotate(
+            inflow=Sum('amount', filter=Q(amount__gt=0)),
+            outflow=Sum('amount', filter=Q(amount__lt=0)),
+            count=Count('id')
+        )
+        .order_by()
+    )
+
+    existing.delete()
+    summaries = DailyAccountSummary.objects.bulk_create([
+        DailyAccountSummary(
+            account_id=row['account_id'],
+            date=row['day'],
+            transaction_type=row['transaction__transaction_type'],
+            inflow=Decimal(str(row['inflow'] or 0)).quantize(CENT),
+            outflow=-Decimal(str(row['outflow'] or 0)).quantize(CENT),
+            count=row['count']
+        )
+        for row in rows.iterator(chunk_size=5000)
+    ], batch_size=5000)
+    return len(summaries)
+
+
+def summarize(account, period, start, end):
+    """
+    Inflow/outflow/count per day or month between ``start`` and ``end``
+    (dates, inclusive), broken down by transaction type. Reads only rollup
+    rows, so the cost depends on the window, not on the account's history.
+    """
+    rows = account.daily_summaries.filter(date__gte=start, date__lte=end)
+    bucket = TruncMonth('date') if period == 'month' else F('date')
+    rows = (
+        rows.annotate(bucket=bucket)
+        .values('bucket', 'transaction_type')
+        .annotate(inflow=Sum('inflow'), outflow=Sum('outflow'), count=Sum('count'))
+        .order_by('bucket', 'transaction_type')
+    )
+
+    results = {}
+    for row in rows:
+        key = row['bucket'].strftime('%Y-%m' if period == 'month' else '%Y-%m-%d')
+        inflow = Decimal(str(row['inflow'])).quantize(CENT)
+        outflow = Decimal(str(row['outflow'])).quantize(CENT)
+        summary = results.setdefault(key, {
+            'period': key, 'inflow': ZERO, 'outflow': ZERO, 'net': ZERO, 'count': 0, 'by_type': {}
+        })
+        summary['inflow'] += inflow
+        summary['outflow'] += outflow
+        summary['net'] += inflow - outflow
+        summary['count'] += row['count']
+        summary['by_type'][row['transaction_type']] = {
+            'inflow': inflow,
+            'outflow': outflow,
+            'count': row['count'],
+        }
+    return list(results.values())
@@ -1,3 +1,1373 @@
-from django.test import TestCase
+import csv
+import importlib
+import io
+import json
+import tempfile
+import time
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock, skipIf
+import asyncio
+import threading
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from datetime import datetime, timedelta
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import CommandError, call_command
+from django.core.files.storage import FileSystemStorage
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from config.handlers import StreamingASGIHandler
+from .async_views import event_stream
+from .balances import balance_as_of, build_snapshots, daily_balance_series, period_balances, start_of_day
+from .cache import balance_cache
+from .concurrency import TransferContentionError, lock_accounts, run_with_retry
+from .events import LocalBroker, PostgresBroker, check_broker, get_broker, ticket_digest
+from .exports import (
+    EXPORT_FIELDS, aexport_chunks, astream_csv, astream_ndjson, export_rows, stream_csv, stream_ndjson
+)
+from .identifiers import (
+    ACCOUNT_NUMBER_SEQUENCE, COUNTER_BITS, MAX_COUNTER, MAX_WORKER_ID, WORKER_BITS, ReferenceGenerator, SequenceBlock,
+    account_numbers, allocate_sequence_values, is_valid_account_number, luhn_check_digit, next_account_number,
+    next_reference_number
+)
+from .models import (
+    Account, AccountBalanceShard, Beneficiary, DailyAccountSummary, EventStreamTicket, IdempotencyKey,
+    LedgerEntry, ReferenceWorkerLease, Statement, Transaction
+)
+from .reconciliation import reconcile_range
+from .services import BankingService
+from .signals import transaction_committed
+from .statements import month_end_statement_path, month_period, render_month_end_shard, render_statement
+from .summaries import rebuild_summaries, record_transactions
 
-# Create your tests here.
+
+class PostCommitHookTests(TransactionTestCase):
+    """transaction_committed receivers run once, after commit, and cannot fail the transfer"""
+    # Keep the number sequences created by migrations
+    serialized_rollback = True
+
+    def setUp(self):
+        user = User.objects.create_user('alice', password='x')
+        self.source = Account.objects.create(user=user, balance=Decimal('100.00'))
+        self.destination = Account.objects.create(user=user)
+
+    def connect(self, receiver):
+        transaction_committed.connect(receiver, dispatch_uid='test-receiver')
+        self.addCleanup(transaction_committed.disconnect, dispatch_uid='test-receiver')
+
+    def test_retryable_receiver_error_does_not_rerun_transfer(self):
+        calls = []
+
+        def locked(sender, **kwargs):
+            calls.append(1)
+            raise OperationalError('database is locked')
+
+        self.connect(locked)
+        with self.assertLogs('apps.banking.signals', 'ERROR'):
+            BankingService.create_transfer(self.source.id, self.destination.account_number, Decimal('20.00'))
+
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal('80.00'))
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(len(calls), 1)
+
+    def test_receiver_error_is_logged_not_raised(self):
+        def broken(sender, **kwargs):
+            raise ConnectionError('cache is down')
+
+        self.connect(broken)
+        with self.assertLogs('apps.banking.signals', 'ERROR'):
+            results = BankingService.create_batch_transfer([
+                {'from_account_id': self.source.id, 'to_account_number': self.destination.account_number,
+                 'amount': Decimal('5.00')},
+            ])
+
+        self.assertIsNone(results[0][1])
+        self.destination.refresh_from_db()
+        self.assertEqual(self.destination.balance, Decimal('5.00'))
+
+    def test_receivers_run_after_commit(self):
+        seen = []
+
+        def check(sender, transactions, **kwargs):
+            seen.append(Transaction.objects.filter(id=transactions[0].id, status='COMPLETED').exists())
+
+        self.connect(check)
+        BankingService.create_deposit(self.destination.id, Decimal('1.00'))
+        self.assertEqual(seen, [True])
+
+
+class IdempotentTransferTests(TransactionTestCase):
+    serialized_rollback = True
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='x')
+        self.source = Account.objects.create(user=self.user, balance=Decimal('100.00'))
+        self.destination = Account.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.body = {'from_account_id': self.source.id, 'to_account_number': self.destination.account_number,
+                     'amount': '10.00'}
+
+    def transfer(self, key, body=None):
+        return self.client.post(reverse('create-transfer'), body or self.body, format='json',
+                                HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_stored_response(self):
+        first = self.transfer('key-1')
+        second = self.transfer('key-1')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal('90.00'))
+
+    def test_key_reused_with_different_body_is_rejected(self):
+        self.transfer('key-1')
+        response = self.transfer('key-1', {**self.body, 'amount': '11.00'})
+        self.assertEqual(response.status_code, 422)
+
+    def test_key_completes_with_the_transfer(self):
+        self.transfer('key-1')
+        record = IdempotencyKey.objects.get(key='key-1')
+        self.assertEqual(record.status, 'COMPLETED')
+        self.assertEqual(record.response_status, 201)
+
+    def test_failed_key_write_rolls_back_transfer_and_releases_key(self):
+        original = IdempotencyKey.objects.filter
+
+        def failing_filter(*args, **kwargs):
+            queryset = original(*args, **kwargs)
+            queryset.update = lambda **fields: (_ for _ in ()).throw(RuntimeError('crash'))
+            return queryset
+
+        with mock.patch.object(IdempotencyKey.objects, 'filter', side_effect=failing_filter):
+            with self.assertRaises(RuntimeError):
+                self.transfer('key-1')
+
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.source.refresh_from_db()
+        self.assertEqual(self.source.balance, Decimal('100.00'))
+
+
+class BalanceSnapshotTests(TestCase):
+
+    def setUp(self):
+        self.account = Account.objects.create(user=User.objects.create_user('alice', password='x'))
+        self.day = start_of_day(timezone.localdate() - timedelta(days=5))
+        Account.objects.filter(id=self.account.id).update(created_at=self.day - timedelta(hours=1))
+        # 10.00 on day one; 5.00 exactly at midnight and 7.00 at noon on day two
+        for amount, created_at in (('10.00', self.day + timedelta(hours=10)),
+                                   ('5.00', self.day + timedelta(days=1)),
+                                   ('7.00', self.day + timedelta(days=1, hours=12))):
+            txn = BankingService.create_deposit(self.account.id, Decimal(amount))
+            LedgerEntry.objects.filter(transaction=txn).update(created_at=created_at)
+        self.account.refresh_from_db()
+
+    def as_of(self, when):
+        return balance_as_of(self.account, when)
+
+    def test_command_snapshots_each_day_with_activity_once(self):
+        out = io.StringIO()
+        call_command('build_balance_snapshots', stdout=out)
+        call_command('build_balance_snapshots', stdout=out)
+
+        self.assertEqual(out.getvalue().splitlines(), ['Created 2 balance snapshots', 'Created 0 balance snapshots'])
+        self.assertEqual(
+            list(self.account.balance_snapshots.order_by('as_of').values_list('as_of', 'balance')),
+            [(self.day + timedelta(days=1), Decimal('10.00')), (self.day + timedelta(days=2), Decimal('22.00'))]
+        )
+
+    def test_as_of_before_the_first_snapshot(self):
+        build_snapshots(self.account)
+
+        self.assertEqual(self.as_of(self.day - timedelta(hours=2)), Decimal('0.00'))
+        self.assertEqual(self.as_of(self.day + timedelta(hours=9)), Decimal('0.00'))
+        self.assertEqual(self.as_of(self.day + timedelta(hours=10)), Decimal('10.00'))
+
+    def test_as_of_at_a_snapshot_boundary(self):
+        build_snapshots(self.account)
+        midnight = self.day + timedelta(days=1)
+
+        # The snapshot holds entries before its as_of; the one at midnight is summed on top
+        self.assertEqual(self.as_of(midnight - timedelta(microseconds=1)), Decimal('10.00'))
+        self.assertEqual(self.as_of(midnight), Decimal('15.00'))
+        self.assertEqual(self.as_of(self.day + timedelta(days=2)), Decimal('22.00'))
+
+    def test_as_of_starts_from_the_nearest_snapshot(self):
+        build_snapshots(self.account)
+        # Only the snapshot itself can account for this
+        self.account.balance_snapshots.filter(as_of=self.day + timedelta(days=1)).update(balance=Decimal('110.00'))
+
+        self.assertEqual(self.as_of(self.day + timedelta(days=1, hours=13)), Decimal('122.00'))
+        self.assertEqual(self.as_of(timezone.now()), Decimal('22.00'))
+        self.assertEqual(self.as_of(timezone.now()), self.account.balance)
+
+
+class DailyBalanceSeriesTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('alice', password='x')
+        self.account = Account.objects.create(user=user, balance=Decimal('100.00'))
+        self.other = Account.objects.create(user=user)
+
+    def test_opening_balance_counts_on_the_day_the_account_opened(self):
+        BankingService.create_transfer(self.account.id, self.other.account_number, Decimal('16.00'))
+
+        series = daily_balance_series(self.account, 3)
+
+        self.assertEqual(series['balances'], [Decimal('0.00'), Decimal('0.00'), Decimal('84.00')])
+        self.account.refresh_from_db()
+        self.assertEqual(series['balances'][-1], self.account.balance)
+
+    def test_account_opened_before_the_window(self):
+        BankingService.create_transfer(self.account.id, self.other.account_number, Decimal('16.00'))
+        BankingService.create_deposit(self.account.id, Decimal('4.00'))
+        # Move the account and its first transfer back five days
+        five_days_ago = timezone.now() - timedelta(days=5)
+        Account.objects.filter(id=self.account.id).update(created_at=five_days_ago - timedelta(hours=1))
+        first = Transaction.objects.filter(transaction_type='TRANSFER').get()
+        LedgerEntry.objects.filter(transaction=first).update(created_at=five_days_ago)
+        self.account.refresh_from_db()
+
+        series = daily_balance_series(self.account, 3)
+
+        self.assertEqual(series['opening_balance'], Decimal('84.00'))
+        self.assertEqual(series['balances'], [Decimal('84.00'), Decimal('84.00'), Decimal('88.00')])
+
+    def test_endpoint_serialises_balances_as_decimal_strings(self):
+        BankingService.create_transfer(self.account.id, self.other.account_number, Decimal('0.10'))
+        client = APIClient()
+        client.force_authenticate(self.account.user)
+
+        response = client.get(reverse('account-balance-history', args=[self.account.id]), {'days': 2})
+
+        self.assertEqual(response.json()['opening_balance'], '0.00')
+        self.assertEqual(response.json()['balances'], ['0.00', '99.90'])
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.user = User.objects.create_user('alice', password='x')
+        self.account = Account.objects.create(user=self.user)
+        self.other = Account.objects.create(user=self.user)
+        self.deposit('10.00')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.urls = {
+            'accounts': reverse('account-list'),
+            'account': reverse('account-detail', args=[self.account.id]),
+            'balance': reverse('account-balance', args=[self.account.id]),
+            'transactions': reverse('transaction-list'),
+            'recent': reverse('recent-transactions'),
+        }
+
+    def deposit(self, amount):
+        with self.captureOnCommitCallbacks(execute=True):
+            BankingService.create_deposit(self.account.id, Decimal(amount))
+
+    def etags(self):
+        tags = {}
+        for name, url in self.urls.items():
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, name)
+            self.assertIn('private', response['Cache-Control'])
+            tags[name] = response['ETag']
+        return tags
+
+    def test_etag_is_stable(self):
+        self.assertEqual(self.etags(), self.etags())
+
+    def test_matching_validator_returns_304(self):
+        for name, etag in self.etags().items():
+            with self.subTest(name):
+                response = self.client.get(self.urls[name], HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+
+        stale = self.client.get(self.urls['balance'], HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self.client.get(self.urls['transactions'])['Last-Modified']
+
+        response = self.client.get(self.urls['transactions'], HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_balance_and_transaction_changes_produce_new_tags(self):
+        before = self.etags()
+        self.deposit('1.00')
+        after_deposit = self.etags()
+        with self.captureOnCommitCallbacks(execute=True):
+            BankingService.create_transfer(self.account.id, self.other.account_number, Decimal('5.00'))
+        after_transfer = self.etags()
+
+        for name in self.urls:
+            with self.subTest(name):
+                self.assertEqual(len({before[name], after_deposit[name], after_transfer[name]}), 3)
+
+    def test_account_update_produces_a_new_tag(self):
+        before = self.etags()
+        # Stand-in for an admin or migration writing the row directly
+        Account.objects.filter(id=self.account.id).update(status='FROZEN', updated_at=timezone.now())
+
+        after = self.etags()
+        self.assertNotEqual(before['accounts'], after['accounts'])
+        self.assertNotEqual(before['account'], after['account'])
+
+
+class ExportFilterTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='x')
+        self.account = Account.objects.create(user=self.user)
+        other = Account.objects.create(user=self.user)
+        self.day = timezone.localdate() - timedelta(days=3)
+        # A deposit on each of two days, then a transfer out on the third
+        for offset, txn in enumerate([
+            BankingService.create_deposit(self.account.id, Decimal('10.00')),
+            BankingService.create_deposit(self.account.id, Decimal('20.00')),
+            BankingService.create_transfer(self.account.id, other.account_number, Decimal('5.00')),
+        ]):
+            LedgerEntry.objects.filter(transaction=txn).update(
+                created_at=start_of_day(self.day + timedelta(days=offset)) + timedelta(hours=12)
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('export-transactions', args=[self.account.id]), params)
+        self.assertEqual(response.status_code, 200)
+        body = b''.join(response.streaming_content).decode()
+        if params.get('output') == 'ndjson':
+            return [json.loads(line)['amount'] for line in body.splitlines()]
+        rows = list(csv.DictReader(io.StringIO(body)))
+        return [row['amount'] for row in rows]
+
+    def test_unfiltered_export_is_oldest_first(self):
+        response = self.client.get(reverse('export-transactions', args=[self.account.id]))
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn(f'transactions_{self.account.account_number}.csv', response['Content-Disposition'])
+        self.assertEqual(self.export(), ['10.00', '20.00', '-5.00'])
+
+    def test_start_and_end_dates_are_inclusive(self):
+        second = (self.day + timedelta(days=1)).isoformat()
+
+        self.assertEqual(self.export(start=second), ['20.00', '-5.00'])
+        self.assertEqual(self.export(end=second), ['10.00', '20.00'])
+        self.assertEqual(self.export(start=second, end=second), ['20.00'])
+
+    def test_datetime_bounds(self):
+        noon = start_of_day(self.day + timedelta(days=1)) + timedelta(hours=12)
+
+        self.assertEqual(self.export(start=noon.isoformat()), ['20.00', '-5.00'])
+        self.assertEqual(self.export(end=(noon - timedelta(seconds=1)).isoformat()), ['10.00'])
+
+    def test_type(self):
+        self.assertEqual(self.export(type='DEPOSIT'), ['10.00', '20.00'])
+        self.assertEqual(self.export(type='TRANSFER'), ['-5.00'])
+
+    def test_ndjson_output(self):
+        response = self.client.get(reverse('export-transactions', args=[self.account.id]), {'output': 'ndjson'})
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(self.export(output='ndjson', type='TRANSFER'), ['-5.00'])
+
+    def test_filtered_export_that_is_empty(self):
+        self.assertEqual(self.export(type='WITHDRAWAL'), [])
+        self.assertEqual(self.export(output='ndjson', start=timezone.localdate().isoformat()), [])
+        # The CSV still carries its header
+        response = self.client.get(reverse('export-transactions', args=[self.account.id]), {'type': 'PAYMENT'})
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines(), [
+            ','.join(name for name, _ in EXPORT_FIELDS)
+        ])
+
+    def test_invalid_filters(self):
+        url = reverse('export-transactions', args=[self.account.id])
+        for params, error in (({'output': 'xml'}, 'output must be csv or ndjson'),
+                              ({'start': 'yesterday'}, 'Invalid start'),
+                              ({'end': '2024-13-01'}, 'Invalid end'),
+                              ({'type': 'REFUND'}, 'Unknown transaction type')):
+            with self.subTest(params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(error, response.data['error'])
+
+
+class StatementDownloadTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='x')
+        self.account = Account.objects.create(user=self.user)
+        BankingService.create_deposit(self.account.id, Decimal('25.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        storage = mock.patch.object(Statement._meta.get_field('file'), 'storage',
+                                    FileSystemStorage(location=directory.name))
+        storage.start()
+        self.addCleanup(storage.stop)
+
+    def download(self, **headers):
+        return self.client.get(reverse('download-statement', args=[self.account.id]), **headers)
+
+    def request_statement(self):
+        return self.client.post(reverse('create-statement', args=[self.account.id]))
+
+    def test_get_never_creates_a_statement(self):
+        response = self.download()
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(Statement.objects.exists())
+
+    def test_post_queues_the_statement_without_rendering_it(self):
+        response = self.request_statement()
+
+        self.assertEqual(response.status_code, 202)
+        statement = Statement.objects.get(account=self.account)
+        self.assertEqual(statement.status, 'PENDING')
+        self.assertEqual(response.data['status'], 'PENDING')
+        self.assertTrue(response['Location'].endswith(reverse('statement-detail', args=[statement.id])))
+        self.assertEqual(self.request_statement().data['id'], statement.id)
+        self.assertEqual(self.download().status_code, 202)
+        self.assertEqual(Statement.objects.get().status, 'PENDING')
+
+    def test_ready_statement_is_streamed_from_storage(self):
+        statement = Statement.objects.get(id=self.request_statement().data['id'])
+        self.assertTrue(render_statement(statement.id))
+
+        response = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content)[:4], b'%PDF')
+        self.assertEqual(self.download(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.request_statement().status_code, 200)
+
+    def test_newer_ready_statement_deletes_superseded_ones(self):
+        old = Statement.objects.get(id=self.request_statement().data['id'])
+        render_statement(old.id)
+        old.refresh_from_db()
+        storage = old.file.storage
+        self.assertTrue(storage.exists(old.file.name))
+
+        BankingService.create_deposit(self.account.id, Decimal('5.00'))
+        new = Statement.objects.get(id=self.request_statement().data['id'])
+        self.assertTrue(render_statement(new.id))
+
+        self.assertEqual(list(Statement.objects.filter(account=self.account)), [new])
+        self.assertFalse(storage.exists(old.file.name))
+
+
+class DashboardETagTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='x')
+        self.account = Account.objects.create(user=self.user, balance=Decimal('100.00'))
+        self.other = Account.objects.create(user=User.objects.create_user('bob', password='x'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def etag(self):
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_etag_comes_from_the_database_not_the_cache(self):
+        etag = self.etag()
+        self.assertEqual(self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        BankingService.create_transfer(self.account.id, self.other.account_number, Decimal('5.00'))
+        caches['default'].clear()  # Served by a worker whose cache never saw the write
+
+        response = self.client.get(reverse('dashboard'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['accounts'][0]['balance'], '95.00')
+
+    def test_writes_change_the_etag(self):
+        etags = [self.etag()]
+        BankingService.create_transfer(self.account.id, self.other.account_number, Decimal('5.00'))
+        etags.append(self.etag())
+        beneficiary = Beneficiary.objects.create(user=self.user, name='Bob', account_number=self.other.account_number)
+        etags.append(self.etag())
+        Beneficiary.objects.filter(id=beneficiary.id).update(nickname='B', updated_at=timezone.now() + timedelta(seconds=1))
+        etags.append(self.etag())
+
+        self.assertEqual(len(set(etags)), 4)
+        self.assertEqual(self.client.get(reverse('dashboard')).data['beneficiaries'][0]['nickname'], 'B')
+
+    def test_query_counts(self):
+        for _ in range(3):
+            Account.objects.create(user=self.user)
+        caches['default'].clear()
+
+        # Three validator queries, then three to build the payload
+        with self.assertNumQueries(6):
+            self.etag()
+        with self.assertNumQueries(3):
+            self.etag()
+
+
+class ExportStreamTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('alice', password='x')
+        self.account = Account.objects.create(user=user)
+        for amount in ('1.00', '2.00', '3.00'):
+            BankingService.create_deposit(self.account.id, Decimal(amount))
+
+    @mock.patch('apps.banking.exports.EXPORT_CHUNK_SIZE', 2)
+    def test_async_stream_matches_sync_stream_in_chunks(self):
+        entries = LedgerEntry.objects.filter(account=self.account)
+
+        async def collect(stream):
+            return [part async for part in stream]
+
+        for stream, astream in ((stream_csv, astream_csv), (stream_ndjson, astream_ndjson)):
+            parts = async_to_sync(collect)(astream(aexport_chunks(entries)))
+            self.assertEqual(''.join(parts), ''.join(stream(export_rows(entries))))
+        # Header, then one message per chunk of two rows
+        self.assertEqual(len(async_to_sync(collect)(astream_csv(aexport_chunks(entries)))), 3)
+
+
+class MonthEndStatementTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('alice', password='x')
+        self.account = Account.objects.create(user=user)
+        self.idle = Account.objects.create(user=user)
+        self.period = month_period(2026, 2)
+        Account.objects.update(created_at=timezone.make_aware(datetime(2026, 1, 1)))
+        for amount, day in (('10.00', datetime(2026, 1, 15)), ('5.00', datetime(2026, 2, 3)),
+                            ('7.00', datetime(2026, 2, 27)), ('100.00', datetime(2026, 3, 2))):
+            BankingService.create_deposit(self.account.id, Decimal(amount))
+            LedgerEntry.objects.filter(account=self.account, created_at__gte=timezone.now() - timedelta(minutes=5)
+                                       ).update(created_at=timezone.make_aware(day))
+        for account in (self.account, self.idle):
+            account.refresh_from_db()
+
+    def render(self):
+        rendered = {}
+
+        def capture(account, rows, opening, output=None, period=None):
+            rendered[account.id] = ([(amount, created_at.day) for created_at, _, _, amount in rows], opening, period)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with mock.patch('apps.banking.statements.generate_paginated_statement_pdf', side_effect=capture), \
+                mock.patch('apps.banking.statements.connection'):
+            written = render_month_end_shard([self.account.id, self.idle.id], *self.period, directory.name)
+        self.assertEqual(written, 2)
+        return rendered
+
+    def test_statement_covers_the_period_oldest_first_with_its_balances(self):
+        rows, opening, period = self.render()[self.account.id]
+
+        self.assertEqual(rows, [(Decimal('5.00'), 3), (Decimal('7.00'), 27)])
+        self.assertEqual(opening, Decimal('10.00'))
+        self.assertEqual(period, (*self.period, Decimal('22.00')))
+
+    def test_account_without_entries_in_the_period(self):
+        rows, opening, period = self.render()[self.idle.id]
+
+        self.assertEqual((rows, opening, period[2]), ([], Decimal('0.00'), Decimal('0.00')))
+
+    def test_balances_match_balance_as_of(self):
+        user = self.account.user
+        # Snapshotted up to mid-February, with an entry exactly at the period start
+        snapshotted = Account.objects.create(user=user)
+        for amount, day in (('3.00', datetime(2026, 1, 20)), ('4.00', datetime(2026, 2, 1)),
+                            ('6.00', datetime(2026, 2, 10)), ('8.00', datetime(2026, 2, 20))):
+            txn = BankingService.create_deposit(snapshotted.id, Decimal(amount))
+            LedgerEntry.objects.filter(transaction=txn).update(created_at=timezone.make_aware(day))
+        Account.objects.filter(id=snapshotted.id).update(created_at=timezone.make_aware(datetime(2026, 1, 1)))
+        build_snapshots(snapshotted, until=timezone.make_aware(datetime(2026, 2, 15)))
+        # Opened during the period with a balance and no deposit, and sharded
+        opened = Account.objects.create(user=user, balance=Decimal('50.00'))
+        Account.objects.filter(id=opened.id).update(created_at=timezone.make_aware(datetime(2026, 2, 5)))
+        BankingService.set_balance_shards(opened.id, 2)
+        BankingService.create_transfer(self.account.id, opened.account_number, Decimal('2.00'))
+        build_snapshots(self.account, until=timezone.make_aware(datetime(2026, 2, 1)))
+
+        accounts = list(Account.objects.filter(id__in=[self.account.id, self.idle.id, snapshotted.id, opened.id]))
+        start, end = self.period
+        balances = period_balances(accounts, start, end)
+
+        for account in accounts:
+            with self.subTest(account=account.id):
+                self.assertEqual(balances[account.id], (
+                    balance_as_of(account, start - timedelta(microseconds=1)),
+                    balance_as_of(account, end - timedelta(microseconds=1)),
+                ))
+        self.assertEqual(balances[snapshotted.id], (Decimal('3.00'), Decimal('21.00')))
+
+    def test_queries_do_not_depend_on_the_number_of_accounts(self):
+        user = self.account.user
+        for count in (2, 10):
+            account_ids = [self.account.id, self.idle.id] + [
+                Account.objects.create(user=user).id for _ in range(count - 2)
+            ]
+            BankingService.set_balance_shards(account_ids[-1], 2)
+            directory = tempfile.TemporaryDirectory()
+            self.addCleanup(directory.cleanup)
+            with self.subTest(accounts=count), mock.patch('apps.banking.statements.connection'), \
+                    self.assertNumQueries(4):
+                self.assertEqual(render_month_end_shard(account_ids, *self.period, directory.name), count)
+
+    def test_renders_a_pdf(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with mock.patch('apps.banking.statements.connection'):
+            render_month_end_shard([self.account.id], *self.period, directory.name)
+
+        with open(month_end_statement_path(directory.name, self.account.account_number), 'rb') as pdf:
+            self.assertEqual(pdf.read(4), b'%PDF')
+
+
+class BatchTransferTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='x')
+        self.source = Account.objects.create(user=self.user, balance=Decimal('100.00'))
+        self.destination = Account.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_items_see_earlier_items_and_invalid_ones_are_skipped(self):
+        item = {'from_account_id': self.source.id, 'to_account_number': self.destination.account_number}
+        response = self.client.post(reverse('create-batch-transfer'), {'transfers': [
+            {**item, 'amount': '60.00'},
+            {**item, 'amount': '60.00'},
+            {**item, 'to_account_number': '000000000000', 'amount': '1.00'},
+            {**item, 'amount': '40.00'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['succeeded'], response.data['failed']), (2, 2))
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['COMPLETED', 'FAILED', 'FAILED', 'COMPLETED'])
+        self.assertEqual(response.data['results'][1]['error'], 'Insufficient funds')
+        self.source.refresh_from_db()
+        self.destination.refresh_from_db()
+        self.assertEqual((self.source.balance, self.destination.balance), (Decimal('0.00'), Decimal('100.00')))
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual(
+            list(LedgerEntry.objects.filter(account=self.source).order_by('id').values_list('balance_after', flat=True)),
+            [Decimal('40.00'), Decimal('0.00')]
+        )
+
+
+class TransferConcurrencyTests(TestCase):
+
+    def test_accounts_are_locked_in_ascending_id_order(self):
+        user = User.objects.create_user('alice', password='x')
+        first, second, third = [Account.objects.create(user=user) for _ in range(3)]
+
+        with CaptureQueriesContext(connection) as queries:
+            locked = lock_accounts([third.id, None, first.id, third.id, second.id])
+
+        self.assertEqual(list(locked), [first.id, second.id, third.id])
+        self.assertEqual(len(queries), 1)
+        self.assertIn('ORDER BY "banking_account"."id" ASC', queries[0]['sql'])
+
+
+@override_settings(BANKING_TRANSFER_RETRY={'MAX_ATTEMPTS': 3, 'BASE_DELAY': 0, 'MAX_DELAY': 0})
+class RetryTests(SimpleTestCase):
+
+    def attempts(self, *outcomes):
+        """A function failing or returning ``outcomes`` in turn, and its call log"""
+        calls = []
+
+        def func():
+            calls.append(1)
+            outcome = outcomes[len(calls) - 1]
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        return func, calls
+
+    def test_lock_contention_is_retried(self):
+        func, calls = self.attempts(OperationalError('database is locked'), 'done')
+
+        self.assertEqual(run_with_retry(func), 'done')
+        self.assertEqual(len(calls), 2)
+
+    def test_gives_up_after_max_attempts(self):
+        func, calls = self.attempts(*[OperationalError('database is locked')] * 3)
+
+        with self.assertRaises(TransferContentionError):
+            run_with_retry(func)
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_are_not_retried(self):
+        func, calls = self.attempts(OperationalError('no such table'), 'done')
+
+        with self.assertRaises(OperationalError):
+            run_with_retry(func)
+        self.assertEqual(len(calls), 1)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='x')
+        self.account = Account.objects.create(user=self.user)
+        for _ in range(5):
+            BankingService.create_deposit(self.account.id, Decimal('1.00'))
+        # Two pairs of ties on created_at: the id breaks them
+        now = timezone.now()
+        ids = list(LedgerEntry.objects.order_by('id').values_list('id', flat=True))
+        LedgerEntry.objects.filter(id__in=ids[:2]).update(created_at=now - timedelta(minutes=2))
+        LedgerEntry.objects.filter(id__in=ids[2:4]).update(created_at=now - timedelta(minutes=1))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_cover_every_entry_once_newest_first(self):
+        expected = list(LedgerEntry.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        url = reverse('transaction-list') + '?pagination=cursor&page_size=2'
+        seen = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+            seen += [entry['id'] for entry in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(seen, expected)
+
+    def test_only_completed_transactions_are_listed(self):
+        Transaction.objects.create(to_account=self.account, amount=Decimal('9.00'), transaction_type='DEPOSIT',
+                                   status='PENDING')
+
+        response = self.client.get(reverse('transaction-list'), {'pagination': 'cursor', 'page_size': 10})
+
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual({entry['status'] for entry in response.data['results']}, {'COMPLETED'})
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('transaction-list'), {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalTransferTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='x')
+        # The destination has the lower id, so its credit runs before the debit
+        self.destination = Account.objects.create(user=User.objects.create_user('bob', password='x'))
+        self.source = Account.objects.create(user=self.alice, balance=Decimal('100.00'))
+
+    def transfer(self, amount='10.00', to_account=None, user=None, from_account=None):
+        return BankingService.create_transfer(
+            (from_account or self.source).id, (to_account or self.destination).account_number, Decimal(amount),
+            user=user or self.alice, mode='conditional'
+        )
+
+    def assertBalances(self, source, destination):
+        self.source.refresh_from_db()
+        self.destination.refresh_from_db()
+        self.assertEqual((self.source.total_balance, self.destination.total_balance),
+                         (Decimal(source), Decimal(destination)))
+
+    def test_transfer_posts_both_legs(self):
+        txn = self.transfer()
+
+        self.assertEqual(txn.status, 'COMPLETED')
+        self.assertBalances('90.00', '10.00')
+        self.assertEqual(
+            sorted(LedgerEntry.objects.filter(transaction=txn).values_list('amount', 'balance_after')),
+            [(Decimal('-10.00'), Decimal('90.00')), (Decimal('10.00'), Decimal('10.00'))]
+        )
+
+    def test_insufficient_funds_rolls_back_the_credit(self):
+        with self.assertRaisesMessage(ValidationError, 'Insufficient funds'):
+            self.transfer('100.01')
+
+        self.assertBalances('100.00', '0.00')
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_inactive_or_missing_destination(self):
+        Account.objects.filter(id=self.destination.id).update(status='FROZEN')
+
+        with self.assertRaisesMessage(ValidationError, 'Destination account is not active'):
+            self.transfer()
+        self.destination.account_number = '000000000000'
+        with self.assertRaisesMessage(ValidationError, 'Destination account not found'):
+            self.transfer()
+
+        self.assertBalances('100.00', '0.00')
+
+    def test_same_account(self):
+        with self.assertRaisesMessage(ValidationError, 'Cannot transfer to the same account'):
+            self.transfer(to_account=self.source)
+
+        self.assertBalances('100.00', '0.00')
+
+    def test_caller_must_own_the_source(self):
+        with self.assertRaisesMessage(ValidationError, "You don't have permission"):
+            self.transfer(user=self.destination.user)
+
+        self.assertBalances('100.00', '0.00')
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_sharded_accounts_take_the_locking_path(self):
+        BankingService.set_balance_shards(self.destination.id, 2)
+        locking = mock.patch.object(BankingService, '_execute_transfer', wraps=BankingService._execute_transfer)
+
+        with locking as execute_transfer:
+            self.transfer()
+        self.assertEqual(execute_transfer.call_count, 1)
+        self.assertBalances('90.00', '10.00')
+
+        BankingService.set_balance_shards(self.destination.id, 0)
+        BankingService.set_balance_shards(self.source.id, 2)
+        with locking as execute_transfer:
+            self.transfer('5.00')
+        self.assertEqual(execute_transfer.call_count, 1)
+        self.assertBalances('85.00', '15.00')
+
+
+class IdentifierTests(TestCase):
+
+    def test_luhn_check_digit(self):
+        self.assertEqual(luhn_check_digit('7992739871'), '3')
+        self.assertTrue(is_valid_account_number('100000000008'))
+        self.assertFalse(is_valid_account_number('100000000018'))
+        self.assertTrue(is_valid_account_number(Account.objects.create(
+            user=User.objects.create_user('alice', password='x')
+        ).account_number))
+
+    def test_references_are_unique_and_time_ordered(self):
+        generated = [next_reference_number() for _ in range(2000)]
+
+        self.assertEqual(len(set(generated)), len(generated))
+        self.assertEqual(sorted(generated), generated)
+        self.assertTrue(all(len(reference) == 15 and reference.startswith('TXN') for reference in generated))
+
+    @mock.patch('apps.banking.identifiers.time.time', return_value=1767225600.0)
+    def test_exhausted_counter_borrows_the_next_millisecond(self, _):
+        generator = ReferenceGenerator()
+
+        ids = [generator.next_id() for _ in range(MAX_COUNTER + 3)]
+
+        self.assertEqual(sorted(set(ids)), ids)
+        self.assertEqual(ids[-1] >> (WORKER_BITS + COUNTER_BITS), (ids[0] >> (WORKER_BITS + COUNTER_BITS)) + 1)
+
+    @mock.patch('apps.banking.identifiers.time.time', return_value=1767225600.0)
+    def test_workers_never_share_an_id(self, _):
+        # Only eight ids are free: a ninth process must not reuse one of them
+        ReferenceWorkerLease.objects.filter(worker_id__gte=8).update(
+            token='elsewhere', expires_at=timezone.now() + timedelta(hours=1)
+        )
+        generators = [ReferenceGenerator() for _ in range(8)]
+
+        ids = [generator.next_id() for generator in generators]
+
+        self.assertEqual(len({reference >> COUNTER_BITS for reference in ids}), 8)
+        with self.assertRaisesMessage(RuntimeError, 'reference worker ids are leased'):
+            ReferenceGenerator().next_id()
+
+    def test_one_lease_per_transaction_and_none_after_rollback(self):
+        generator = ReferenceGenerator()
+        leased = ReferenceWorkerLease.objects.filter(token=generator._token)
+
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            generator.next_id()
+            generator.next_id()
+            self.assertEqual(leased.count(), 1)
+            1 / 0
+
+        self.assertFalse(leased.exists())
+        generator.next_id()
+        self.assertEqual(leased.count(), 1)
+
+    def test_lost_lease_is_replaced(self):
+        generator = ReferenceGenerator()
+        with self.captureOnCommitCallbacks(execute=True):
+            generator.next_id()
+        worker_id = generator._lease[0]
+        # The process stalled past its lease and another one took the id
+        ReferenceWorkerLease.objects.filter(worker_id=worker_id).update(token='other')
+
+        later = timezone.now() + timedelta(seconds=settings.BANKING_REFERENCE_WORKER_LEASE)
+        with mock.patch('apps.banking.identifiers.timezone.now', return_value=later), \
+                self.captureOnCommitCallbacks(execute=True):
+            reference = generator.next_id()
+
+        self.assertNotEqual(generator._lease[0], worker_id)
+        self.assertEqual((reference >> COUNTER_BITS) & MAX_WORKER_ID, generator._lease[0])
+
+    def test_sequence_starts_above_legacy_account_numbers(self):
+        migration = importlib.import_module('apps.banking.migrations.0013_referenceworkerlease')
+        user = User.objects.create_user('alice', password='x')
+        # Random 12-digit numbers from before the sequence
+        for number in ('123456789012', '987654321098'):
+            Account.objects.create(user=user, account_number=number)
+        account_numbers.reset()
+        self.addCleanup(account_numbers.reset)
+
+        migration.start_account_numbers_above_existing(django_apps, SimpleNamespace(connection=connection))
+
+        self.assertEqual(next_account_number()[:11], '98765432110')
+        Account.objects.create(user=user, account_number='999999999990')
+        migration.start_account_numbers_above_existing(django_apps, SimpleNamespace(connection=connection))
+        account_numbers.reset()
+        with self.assertRaisesMessage(RuntimeError, 'exhausted'):
+            next_account_number()
+
+
+@override_settings(BANKING_SEQUENCE_BLOCK_SIZE=3)
+class SequenceBlockTests(TransactionTestCase):
+    # Keep the number sequences created by migrations
+    serialized_rollback = True
+
+    def setUp(self):
+        self.block = SequenceBlock(ACCOUNT_NUMBER_SEQUENCE)
+        patcher = mock.patch('apps.banking.identifiers.allocate_sequence_values', wraps=allocate_sequence_values)
+        self.allocate = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_values_come_from_memory_a_block_at_a_time(self):
+        values = [self.block.next() for _ in range(7)]
+
+        self.assertEqual(values, list(range(values[0], values[0] + 7)))
+        self.assertEqual(self.allocate.call_count, 3)
+
+    def test_block_reserved_in_a_transaction_is_kept_after_commit(self):
+        with transaction.atomic():
+            first = self.block.next()
+            # Not cached yet: another block is reserved
+            second = self.block.next()
+
+        self.assertEqual(second, first + 3)
+        self.assertEqual(self.block.next(), first + 1)
+        self.assertEqual(self.allocate.call_count, 2)
+
+    @skipIf(connection.vendor == 'postgresql', 'PostgreSQL sequences survive a rollback')
+    def test_block_reserved_in_a_rolled_back_transaction_is_not_reused(self):
+        with self.assertRaises(ZeroDivisionError), transaction.atomic():
+            first = self.block.next()
+            1 / 0
+
+        # The sequence row rolled back too, so the value comes round again
+        # from the database, never from this process's cache
+        self.assertEqual(self.block.next(), first)
+        self.assertEqual(self.allocate.call_count, 2)
+        self.assertEqual(self.block.next(), first + 1)
+
+
+class BalanceShardingTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('alice', password='x')
+        self.payer = Account.objects.create(user=user, balance=Decimal('100.00'))
+        self.hot = Account.objects.create(user=user)
+        BankingService.set_balance_shards(self.hot.id, 4)
+
+    def shard_balances(self):
+        return list(
+            AccountBalanceShard.objects.filter(account=self.hot).order_by('shard').values_list('balance', flat=True)
+        )
+
+    def test_credits_land_on_shards_not_the_account_row(self):
+        for _ in range(5):
+            BankingService.create_transfer(self.payer.id, self.hot.account_number, Decimal('2.00'))
+
+        self.hot.refresh_from_db()
+        self.assertEqual(self.hot.balance, Decimal('0.00'))
+        self.assertEqual(sum(self.shard_balances()), Decimal('10.00'))
+        self.assertEqual(self.hot.total_balance, Decimal('10.00'))
+        self.assertEqual(set(LedgerEntry.objects.filter(account=self.hot).values_list('balance_after', flat=True)),
+                         {None})
+
+    def test_debit_consolidates_shards_when_the_row_is_short(self):
+        BankingService.create_transfer(self.payer.id, self.hot.account_number, Decimal('30.00'))
+
+        BankingService.create_transfer(self.hot.id, self.payer.account_number, Decimal('25.00'))
+
+        self.hot.refresh_from_db()
+        self.assertEqual((self.hot.balance, self.shard_balances()), (Decimal('5.00'), [Decimal('0.00')] * 4))
+        with self.assertRaisesMessage(ValidationError, 'Insufficient funds'):
+            BankingService.create_transfer(self.hot.id, self.payer.account_number, Decimal('5.01'))
+
+    def test_turning_sharding_off_keeps_the_total(self):
+        BankingService.create_transfer(self.payer.id, self.hot.account_number, Decimal('30.00'))
+
+        BankingService.set_balance_shards(self.hot.id, 0)
+
+        self.hot.refresh_from_db()
+        self.assertEqual((self.hot.balance, self.hot.balance_shards), (Decimal('30.00'), 0))
+        self.assertFalse(AccountBalanceShard.objects.filter(account=self.hot).exists())
+
+
+@mock.patch('apps.banking.reconciliation.connection')
+class ReconciliationTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('alice', password='x')
+        self.account = Account.objects.create(user=user)
+        self.hot = Account.objects.create(user=user)
+        BankingService.create_deposit(self.account.id, Decimal('50.00'))
+        BankingService.set_balance_shards(self.hot.id, 4)
+        BankingService.create_transfer(self.account.id, self.hot.account_number, Decimal('20.00'))
+
+    def reconcile(self):
+        return reconcile_range(self.account.id, self.hot.id + 1)
+
+    def test_balances_match_completed_transactions(self, _):
+        self.assertEqual(self.reconcile(), (2, []))
+
+    def test_reports_drifted_balance(self, _):
+        Account.objects.filter(id=self.account.id).update(balance=F('balance') + Decimal('1.00'))
+
+        checked, mismatches = self.reconcile()
+
+        self.assertEqual(checked, 2)
+        self.assertEqual(len(mismatches), 1)
+        self.assertEqual(mismatches[0]['account_id'], self.account.id)
+        self.assertEqual((mismatches[0]['expected'], mismatches[0]['difference']), (Decimal('30.00'), Decimal('1.00')))
+
+    def test_pending_transactions_are_ignored(self, _):
+        Transaction.objects.create(to_account=self.account, amount=Decimal('9.00'), transaction_type='DEPOSIT',
+                                   status='PENDING')
+
+        self.assertEqual(self.reconcile(), (2, []))
+
+    def test_queries_do_not_depend_on_the_number_of_accounts(self, _):
+        user = self.account.user
+        for _ in range(10):
+            account = Account.objects.create(user=user)
+            BankingService.create_deposit(account.id, Decimal('5.00'))
+            BankingService.create_transfer(account.id, self.hot.account_number, Decimal('1.00'))
+
+        # Accounts, the UNION of both transaction sides, and shard totals
+        with self.assertNumQueries(3):
+            checked, mismatches = reconcile_range(self.account.id, account.id + 1)
+
+        self.assertEqual((checked, mismatches), (12, []))
+
+    def test_incremental_run_checks_touched_and_reported_accounts(self, _):
+        since = timezone.now()
+        self.assertEqual(reconcile_range(self.account.id, self.hot.id + 1, since=since), (0, []))
+
+        checked, _ = reconcile_range(self.account.id, self.hot.id + 1, since=since, recheck_ids=[self.account.id])
+        self.assertEqual(checked, 1)
+        BankingService.create_transfer(self.account.id, self.hot.account_number, Decimal('5.00'))
+        self.assertEqual(reconcile_range(self.account.id, self.hot.id + 1, since=since), (2, []))
+
+
+class DailySummaryTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user('alice', password='x')
+        self.account = Account.objects.create(user=user)
+        self.other = Account.objects.create(user=user)
+
+    def summaries(self):
+        return sorted(
+            DailyAccountSummary.objects.values_list('account_id', 'transaction_type', 'inflow', 'outflow', 'count')
+        )
+
+    def expected(self, deposits=Decimal('50.00'), transfers=Decimal('20.00'), count=2):
+        return sorted([
+            (self.account.id, 'DEPOSIT', deposits, Decimal('0.00'), 1),
+            (self.account.id, 'TRANSFER', Decimal('0.00'), transfers, count - 1),
+            (self.other.id, 'TRANSFER', transfers, Decimal('0.00'), count - 1),
+        ])
+
+    def test_committed_transactions_are_added_to_the_rollup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            BankingService.create_deposit(self.account.id, Decimal('50.00'))
+        for amount in ('15.00', '5.00'):
+            with self.captureOnCommitCallbacks(execute=True):
+                BankingService.create_transfer(self.account.id, self.other.account_number, Decimal(amount))
+
+        self.assertEqual(self.summaries(), self.expected(count=3))
+        self.assertFalse(LedgerEntry.objects.filter(summarized=False).exists())
+
+    def test_recording_a_transaction_twice_counts_it_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            BankingService.create_deposit(self.account.id, Decimal('50.00'))
+            BankingService.create_transfer(self.account.id, self.other.account_number, Decimal('20.00'))
+
+        record_transactions(list(Transaction.objects.all()))
+
+        self.assertEqual(self.summaries(), self.expected())
+
+    def test_rebuild_matches_the_incremental_rollup(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            BankingService.create_deposit(self.account.id, Decimal('50.00'))
+            BankingService.create_transfer(self.account.id, self.other.account_number, Decimal('20.00'))
+        DailyAccountSummary.objects.update(inflow=Decimal('999.00'))
+
+        self.assertEqual(rebuild_summaries(), 3)
+        self.assertEqual(self.summaries(), self.expected())
+
+    def test_transaction_recorded_after_a_rebuild_that_counted_it_is_skipped(self):
+        # Committed, but its record_transactions has not run yet
+        BankingService.create_deposit(self.account.id, Decimal('50.00'))
+        BankingService.create_transfer(self.account.id, self.other.account_number, Decimal('20.00'))
+
+        rebuild_summaries(batch_size=1)
+        record_transactions(list(Transaction.objects.all()))
+
+        self.assertEqual(self.summaries(), self.expected())
+
+    def test_transaction_the_rebuild_did_not_see_is_added_to_the_rebuilt_rows(self):
+        BankingService.create_deposit(self.account.id, Decimal('50.00'))
+        BankingService.create_transfer(self.account.id, self.other.account_number, Decimal('20.00'))
+        rebuild_summaries()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            BankingService.create_transfer(self.account.id, self.other.account_number, Decimal('10.00'))
+
+        self.assertEqual(self.summaries(), self.expected(transfers=Decimal('30.00'), count=3))
+
+    def test_rebuild_since_keeps_earlier_days(self):
+        BankingService.create_deposit(self.account.id, Decimal('50.00'))
+        LedgerEntry.objects.update(created_at=timezone.now() - timedelta(days=3))
+        rebuild_summaries()
+        BankingService.create_transfer(self.account.id, self.other.account_number, Decimal('20.00'))
+
+        self.assertEqual(rebuild_summaries(account_ids=[self.account.id], since=timezone.localdate()), 1)
+        self.assertEqual(
+            self.summaries(),
+            sorted([
+                (self.account.id, 'DEPOSIT', Decimal('50.00'), Decimal('0.00'), 1),
+                (self.account.id, 'TRANSFER', Decimal('0.00'), Decimal('20.00'), 1),
+            ])
+        )
+
+
+class BalanceCacheTests(TestCase):
+
+    def setUp(self):
+        caches['default'].clear()
+        self.account = Account.objects.create(user=User.objects.create_user('alice', password='x'),
+                                              balance=Decimal('10.00'))
+
+    def test_per_process_entries_expire_after_local_timeout(self):
+        balance_cache.set(self.account)
+        self.assertEqual(balance_cache.get(self.account.id)['balance'], Decimal('10.00'))
+
+        later = time.time() + balance_cache.config['LOCAL_TIMEOUT'] + 1
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=later):
+            self.assertIsNone(balance_cache.get(self.account.id))
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'shared': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+        BANKING_BALANCE_CACHE={'ALIAS': 'shared'}
+    )
+    def test_shared_cache_keeps_the_full_timeout(self):
+        self.assertEqual(balance_cache.timeout, balance_cache.config['TIMEOUT'])
+
+    def test_async_reads_and_primes(self):
+        async_to_sync(balance_cache.aprime)(self.account)
+        Account.objects.filter(id=self.account.id).update(balance=Decimal('20.00'))
+        self.account.refresh_from_db()
+        async_to_sync(balance_cache.aprime)(self.account)  # Never overwrites an entry
+
+        hits = balance_cache.hits
+        self.assertEqual(async_to_sync(balance_cache.aget)(self.account.id)['balance'], Decimal('10.00'))
+        self.assertEqual(balance_cache.hits, hits + 1)
+
+
+class EventBrokerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.broker = LocalBroker({'QUEUE_SIZE': 3})
+
+    def receive(self, user_id, publish, timeout=0.1):
+        """Subscribe ``user_id``, run publish(), and return what arrives"""
+        async def run():
+            subscription = self.broker.subscribe(user_id)
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, publish)
+                events = []
+                while (event := await subscription.get(timeout)) is not None:
+                    events.append(event)
+                return events
+            finally:
+                self.broker.unsubscribe(subscription)
+
+        return async_to_sync(run)()
+
+    def test_events_reach_only_their_user(self):
+        def publish():
+            self.broker.publish(1, {'type': 'balance', 'n': 1})
+            self.broker.publish(2, {'type': 'balance', 'n': 2})
+
+        self.assertEqual(self.receive(1, publish), [{'type': 'balance', 'n': 1}])
+
+    def test_publish_from_another_thread(self):
+        def publish():
+            thread = threading.Thread(target=self.broker.publish, args=(1, {'type': 'transaction'}))
+            thread.start()
+            thread.join()
+
+        self.assertEqual(self.receive(1, publish), [{'type': 'transaction'}])
+
+    def test_slow_subscriber_gets_a_single_resync(self):
+        def publish():
+            for n in range(5):
+                self.broker.publish(1, {'type': 'balance', 'n': n})
+
+        self.assertEqual(self.receive(1, publish), [{'type': 'resync'}, {'type': 'balance', 'n': 4}])
+
+    def test_unsubscribed_users_are_dropped(self):
+        self.receive(1, lambda: None, timeout=0)
+
+        self.assertEqual(dict(self.broker._subscribers), {})
+        self.broker.publish(1, {'type': 'balance'})  # No subscriber: a no-op
+
+    def test_local_broker_refuses_several_workers(self):
+        with override_settings(BANKING_EVENTS={'WORKERS': 2}), \
+                self.assertRaisesMessage(ImproperlyConfigured, 'PostgresBroker'):
+            check_broker()
+
+        with override_settings(BANKING_EVENTS={'WORKERS': 1}):
+            check_broker()
+        with override_settings(BANKING_EVENTS={'WORKERS': 2, 'BACKEND': 'apps.banking.events.PostgresBroker'}):
+            check_broker()
+        self.assertTrue(PostgresBroker.cross_process)
+
+
+class EventStreamTests(TransactionTestCase):
+    # Keep the number sequences created by migrations
+    serialized_rollback = True
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='x')
+        self.token = AccessToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def ticket(self):
+        response = self.client.post(reverse('event-ticket'))
+        self.assertEqual(response.status_code, 201)
+        return response.data['ticket']
+
+    def open(self, **params):
+        request = AsyncRequestFactory().get('/api/banking/events/', params)
+        return async_to_sync(event_stream)(request)
+
+    def read(self, publish=(), **params):
+        """
+        Open the stream, then return its first chunk and one more per event
+        in ``publish``. Runs in one event loop: the subscriber's.
+        """
+        async def run():
+            request = AsyncRequestFactory().get('/api/banking/events/', params)
+            response = await event_stream(request)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            chunks = aiter(response.streaming_content)
+            received = [await anext(chunks)]
+            for event in publish:
+                get_broker().publish(self.user.id, event)
+                received.append(await anext(chunks))
+            return [chunk.decode() for chunk in received]
+
+        return async_to_sync(run)()
+
+    def test_ticket_opens_the_stream(self):
+        ready, balance = self.read([{'type': 'balance', 'account_id': 1}], ticket=self.ticket())
+
+        self.assertIn('event: ready', ready)
+        self.assertEqual(balance, 'event: balance\ndata: {"type": "balance", "account_id": 1}\n\n')
+
+    def test_ticket_is_single_use_and_stored_hashed(self):
+        ticket = self.ticket()
+        self.assertTrue(EventStreamTicket.objects.filter(digest=ticket_digest(ticket)).exists())
+        self.assertFalse(EventStreamTicket.objects.filter(digest=ticket).exists())
+
+        self.assertEqual(self.open(ticket=ticket).status_code, 200)
+        self.assertEqual(self.open(ticket=ticket).status_code, 401)
+
+    def test_expired_missing_and_access_token_credentials_are_refused(self):
+        ticket = self.ticket()
+        EventStreamTicket.objects.update(expires_at=timezone.now())
+
+        for params in ({'ticket': ticket}, {'ticket': 'forged'}, {}, {'token': str(self.token)}):
+            with self.subTest(params=list(params)):
+                response = self.open(**params)
+                self.assertEqual(response.status_code, 401)
+                self.assertTrue(response.has_header('WWW-Authenticate'))
+
+    def test_issuing_purges_expired_tickets(self):
+        self.ticket()
+        EventStreamTicket.objects.update(expires_at=timezone.now())
+
+        self.ticket()
+
+        self.assertEqual(EventStreamTicket.objects.count(), 1)
+
+    def test_stream_closes_when_the_access_token_expires(self):
+        ticket = self.ticket()
+        EventStreamTicket.objects.update(access_expires_at=timezone.now())
+        response = self.open(ticket=ticket)
+
+        async def run():
+            return [chunk.decode() async for chunk in response.streaming_content]
+
+        ready, expired = async_to_sync(run)()
+        self.assertIn('event: token_expired', expired)
+        self.assertEqual(dict(get_broker()._subscribers), {})
+
+    def test_minting_requires_authentication(self):
+        self.assertEqual(APIClient().post(reverse('event-ticket')).status_code, 401)
+
+
+class StreamingASGIHandlerTests(SimpleTestCase):
+
+    def call(self, scope):
+        handler = StreamingASGIHandler()
+        with mock.patch.object(StreamingASGIHandler, 'handle', new_callable=mock.AsyncMock) as handle, \
+                mock.patch.object(ASGIHandler, '__call__', new_callable=mock.AsyncMock) as default:
+            async_to_sync(handler)(scope, mock.AsyncMock(), mock.AsyncMock())
+        return handle.called, default.called
+
+    def test_event_streams_skip_the_per_request_thread(self):
+        self.assertEqual(self.call({'type': 'http', 'path': '/api/banking/events/'}), (True, False))
+
+    def test_other_requests_use_the_default_handler(self):
+        for scope in ({'type': 'http', 'path': '/api/banking/accounts/'},
+                      {'type': 'http', 'path': '/api/banking/events/tickets/'},
+                      {'type': 'lifespan'}):
+            with self.subTest(scope=scope):
+                self.assertEqual(self.call(scope), (False, True))
+
+
+class BenchmarkCommandTests(SimpleTestCase):
+
+    def test_refuses_to_touch_the_database_without_debug(self):
+        # Tests run with DEBUG off; SimpleTestCase also fails on any query
+        for command in ('bench_transfers', 'bench_hot_account', 'bench_auth_queries'):
+            with self.subTest(command=command), self.assertRaisesMessage(CommandError, '--i-know'):
+                call_command(command)
@@ -2,19 +2,36 @@ from django.urls import path
 from . import views
 
 urlpatterns = [
+    # Dashboard
+    path('dashboard/', views.get_dashboard, name='dashboard'),
+    
     # Accounts
     path('accounts/', views.AccountListCreateView.as_view(), name='account-list'),
+    path('accounts/balance-cache-stats/', views.get_balance_cache_stats, name='balance-cache-stats'),
     path('accounts/<int:pk>/', views.AccountDetailView.as_view(), name='account-detail'),
     path('accounts/<int:account_id>/balance/', views.get_account_balance, name='account-balance'),
+    path('accounts/<int:account_id>/balance-history/', views.get_balance_history, name='account-balance-history'),
+    path('accounts/<int:account_id>/summary/', views.get_account_summary, name='account-summary'),
     # ADD THIS LINE FOR STATEMENT DOWNLOAD:
     path('accounts/<int:account_id>/statement/', views.download_statement, name='download-statement'),
+    path('accounts/<int:account_id>/statements/', views.create_statement, name='create-statement'),
+    path('accounts/<int:account_id>/export/', views.export_transactions, name='export-transactions'),
+    
+    # Statements
+    path('statements/<int:pk>/', views.get_statement, name='statement-detail'),
+    path('statements/<int:pk>/download/', views.download_rendered_statement, name='statement-download'),
     
     # Transactions
     path('transactions/', views.TransactionListView.as_view(), name='transaction-list'),
     path('transactions/transfer/', views.create_transfer, name='create-transfer'),
+    path('transactions/transfer/batch/', views.create_batch_transfer, name='create-batch-transfer'),
+    path('transactions/engine-stats/', views.get_transfer_engine_stats, name='transfer-engine-stats'),
     path('transactions/recent/', views.get_recent_transactions, name='recent-transactions'),
     
     # Beneficiaries
     path('beneficiaries/', views.BeneficiaryListCreateView.as_view(), name='beneficiary-list'),
     path('beneficiaries/<int:pk>/', views.BeneficiaryDeleteView.as_view(), name='beneficiary-delete'),
+    
+    # Event stream tickets (the stream itself is served under ASGI only, see config/urls_async.py)
+    path('events/tickets/', views.create_event_ticket, name='event-ticket'),
 ]
\ No newline at end of file
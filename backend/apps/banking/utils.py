@@ -3,15 +3,51 @@ from reportlab.lib import colors
 from reportlab.lib.units import inch
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.pdfgen.canvas import Canvas
 from io import BytesIO
-from datetime import datetime
+from datetime import datetime, timedelta
+from django.utils import timezone
+from functools import lru_cache
 
-def generate_statement_pdf(account, transactions):
-    """Generate PDF statement for an account"""
-    buffer = BytesIO()
+@lru_cache(maxsize=None)
+def get_statement_styles():
+    """Paragraph stylesheet, built once per process and shared by every statement"""
+    return getSampleStyleSheet()
+
+@lru_cache(maxsize=None)
+def get_transaction_table_style():
+    """Table style for the transaction history, shared by every statement"""
+    return TableStyle([
+        # Header styling
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 11),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('TOPPADDING', (0, 0), (-1, 0), 12),
+        
+        # Body styling
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('TOPPADDING', (0, 1), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
+        
+        # Alternate row colors
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ])
+
+def generate_statement_pdf(account, transactions, output=None):
+    """
+    Generate PDF statement for an account.
+    Writes to ``output`` (a path or file object) if given, else to a new BytesIO.
+    """
+    buffer = output if output is not None else BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
     elements = []
-    styles = getSampleStyleSheet()
+    styles = get_statement_styles()
     
     # Title
     title_text = f"<b>ACCOUNT STATEMENT</b>"
@@ -24,7 +60,7 @@ def generate_statement_pdf(account, transactions):
     <b>Account Number:</b> {account.account_number}<br/>
     <b>Account Type:</b> {account.account_type}<br/>
     <b>Account Holder:</b> {account.user.get_full_name() or account.user.username}<br/>
-    <b>Current Balance:</b> ${account.balance}<br/>
+    <b>Current Balance:</b> ${account.total_balance}<br/>
     <b>Currency:</b> {account.currency}<br/>
     <b>Statement Date:</b> {datetime.now().strftime('%B %d, %Y')}<br/>
     """
@@ -58,27 +94,7 @@ def generate_statement_pdf(account, transactions):
         
         # Create table
         table = Table(data, colWidths=[1.5*inch, 1*inch, 2*inch, 1*inch, 1*inch])
-        table.setStyle(TableStyle([
-            # Header styling
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('TOPPADDING', (0, 0), (-1, 0), 12),
-            
-            # Body styling
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (-1, -1), 9),
-            ('TOPPADDING', (0, 1), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 1), (-1, -1), 8),
-            
-            # Alternate row colors
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-        ]))
+        table.setStyle(get_transaction_table_style())
         
         elements.append(table)
     else:
@@ -98,5 +114,154 @@ def generate_statement_pdf(account, transactions):
     
     # Build PDF
     doc.build(elements)
-    buffer.seek(0)
-    return buffer
\ No newline at end of file
+    if output is None:
+        buffer.seek(0)
+    return buffer
+
+# Paginated statements: fixed row height so every page holds a known number
+# of rows and only one page of data is in memory at a time
+PAGE_MARGIN = 0.5*inch
+ROW_HEIGHT = 16
+FIRST_PAGE_ROWS = 30
+PAGE_ROWS = 40
+PAGINATED_COL_WIDTHS = [1.3*inch, 1*inch, 2.3*inch, 1.2*inch, 1.2*inch]
+
+@lru_cache(maxsize=None)
+def get_paginated_table_style():
+    """Compact table style for paginated statements, shared by every page"""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2563eb')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ALIGN', (3, 0), (-1, -1), 'RIGHT'),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f1f5f9')]),
+        
+        # Brought forward / carried forward rows
+        ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, 1), (-1, 1), colors.beige),
+        ('BACKGROUND', (0, -1), (-1, -1), colors.beige),
+    ])
+
+def _draw_paragraph(canvas, text, style, x, top, width):
+    """Draw a paragraph with its top edge at ``top``; returns the new top"""
+    para = Paragraph(text, style)
+    _, height = para.wrapOn(canvas, width, 10*inch)
+    para.drawOn(canvas, x, top - height)
+    return top - height
+
+def generate_paginated_statement_pdf(account, rows, opening_balance, output=None, period=None):
+    """
+    Render a statement page by page with bounded memory.
+
+    ``rows`` is an iterable of (created_at, transaction_type, description,
+    signed_amount) tuples in chronological order, typically a chunked
+    database iterator. Each page is one table with the column headers
+    repeated, a "brought forward" balance at the top and a "carried forward"
+    balance at the bottom; the running balance is computed from
+    ``opening_balance`` and the amounts. Writes to ``output`` (a path or
+    file object) if given, else to a new BytesIO.
+
+    ``period`` is (start, end, closing_balance) for a statement of the
+    [start, end) period: the header then shows the period and its opening
+    and closing balances instead of the current balance.
+    """
+    buffer = output if output is not None else BytesIO()
+    page_width, page_height = letter
+    content_width = page_width - 2*PAGE_MARGIN
+    styles = get_statement_styles()
+    table_style = get_paginated_table_style()
+    
+    c = Canvas(buffer, pagesize=letter, pageCompression=1)
+    c.setTitle(f"Statement {account.account_number}")
+    holder = account.user.get_full_name() or account.user.username
+    balance = opening_balance
+    page_number = 0
+    
+    def start_page():
+        top = page_height - PAGE_MARGIN
+        if page_number == 1:
+            top = _draw_paragraph(c, "<b>ACCOUNT STATEMENT</b>", styles['Title'], PAGE_MARGIN, top, content_width)
+            if period:
+                start, end, closing_balance = period
+                last_day = timezone.localtime(end - timedelta(microseconds=1))
+                balances = f"""
+                <b>Currency:</b> {account.currency}<br/>
+                <b>Statement Period:</b> {timezone.localtime(start).strftime('%B %d, %Y')} - {last_day.strftime('%B %d, %Y')}<br/>
+                <b>Opening Balance:</b> ${opening_balance:,.2f}<br/>
+                <b>Closing Balance:</b> ${closing_balance:,.2f}<br/>
+                """
+            else:
+                balances = f"""
+                <b>Current Balance:</b> ${account.total_balance}<br/>
+                <b>Currency:</b> {account.currency}<br/>
+                <b>Statement Date:</b> {datetime.now().strftime('%B %d, %Y')}<br/>
+                """
+            account_info = f"""
+            <b>Account Number:</b> {account.account_number}<br/>
+            <b>Account Type:</b> {account.account_type}<br/>
+            <b>Account Holder:</b> {holder}<br/>
+            {balances}
+            """
+            top = _draw_paragraph(c, account_info, styles['Normal'], PAGE_MARGIN, top - 0.1*inch, content_width)
+            top = _draw_paragraph(c, "<b>TRANSACTION HISTORY</b>", styles['Heading2'], PAGE_MARGIN, top - 0.1*inch, content_width)
+        else:
+            c.setFont('Helvetica-Bold', 10)
+            c.drawString(PAGE_MARGIN, top - 12, f"Account {account.account_number} - {holder}")
+            top -= 24
+        
+        # Footer
+        c.setFont('Helvetica-Oblique', 7)
+        c.drawString(PAGE_MARGIN, PAGE_MARGIN - 12,
+                     "DemoBank - DEMO APPLICATION. This is a demonstration only. No real money or transactions.")
+        c.drawRightString(page_width - PAGE_MARGIN, PAGE_MARGIN - 12, f"Page {page_number}")
+        return top
+    
+    def draw_page(chunk, last):
+        nonlocal balance, page_number
+        page_number += 1
+        top = start_page()
+        
+        data = [
+            ['Date', 'Type', 'Description', 'Amount', 'Balance'],
+            ['', '', 'Balance brought forward', '', f"${balance:,.2f}"],
+        ]
+        for created_at, transaction_type, description, amount in chunk:
+            balance += amount
+            data.append([
+                created_at.strftime('%Y-%m-%d %H:%M'),
+                transaction_type,
+                description[:36] if description else '-',
+                f"+${amount:,.2f}" if amount > 0 else f"-${-amount:,.2f}",
+                f"${balance:,.2f}"
+            ])
+        data.append(['', '', 'Closing balance' if last else 'Balance carried forward', '', f"${balance:,.2f}"])
+        
+        table = Table(data, colWidths=PAGINATED_COL_WIDTHS, rowHeights=ROW_HEIGHT)
+        table.setStyle(table_style)
+        _, height = table.wrapOn(c, content_width, top)
+        table.drawOn(c, PAGE_MARGIN, top - height)
+        c.showPage()
+    
+    chunk = []
+    capacity = FIRST_PAGE_ROWS
+    for row in rows:
+        if len(chunk) == capacity:
+            draw_page(chunk, last=False)
+            chunk = []
+            capacity = PAGE_ROWS
+        chunk.append(row)
+    
+    if chunk or page_number == 0:
+        draw_page(chunk, last=True)
+    
+    c.save()
+    if output is None:
+        buffer.seek(0)
+    return buffer
@@ -1,77 +1,282 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from django.db.models import Q
-from .models import Account, Transaction, Beneficiary
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.exceptions import ValidationError
+from .models import Account, Transaction, LedgerEntry, Statement, Beneficiary
 from .serializers import (AccountSerializer, TransactionSerializer, 
-                          TransferSerializer, BeneficiarySerializer)
+                          LedgerEntrySerializer, TransferSerializer,
+                          BatchTransferSerializer, StatementSerializer,
+                          BeneficiarySerializer)
 from .services import BankingService
-from .utils import generate_statement_pdf
-from django.http import HttpResponse
-from datetime import datetime
+from .pagination import KeysetPagination
+from .balances import balance_as_of, daily_balance_series, parse_as_of
+from .summaries import summarize
+from .concurrency import stats as transfer_engine_stats
+from .cache import balance_cache
+from .dashboard import dashboard_cache
+from .conditional import ConditionalGetMixin, conditional_get, make_etag
+from .events import get_events_settings, issue_stream_ticket
+from .exports import export_rows, stream_csv, stream_ndjson
+from .idempotency import idempotent
+from .statements import find_current_statement, request_statement
+from django.db.models import Count, Max, Sum
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.urls import reverse
+from django.utils.dateparse import parse_date
+from datetime import datetime, timedelta
+
+def ledger_head(user):
+    return LedgerEntry.objects.filter(
+        account__user=user
+    ).order_by('-id').values_list('id', 'created_at')
+
+def latest_ledger_entry(user):
+    """(id, created_at) of the newest ledger entry on the user's accounts"""
+    return ledger_head(user).first() or (None, None)
+
+async def alatest_ledger_entry(user):
+    return await ledger_head(user).afirst() or (None, None)
+
+# Aggregates that change whenever an account list response would: credits
+# to sharded accounts touch only their shard rows
+ACCOUNT_LIST_STATE = {
+    'count': Count('id', distinct=True),
+    'last_modified': Max('updated_at'),
+    'shards_modified': Max('shards__updated_at'),
+}
+
+def account_list_validators(user, state, querystring):
+    last_modified = max(filter(None, [state['last_modified'], state['shards_modified']]), default=None)
+    return make_etag('accounts', user.id, state['count'], last_modified, querystring), last_modified
+
+def dashboard_validators(user):
+    """
+    ETag of the user's dashboard, from database state every process sees:
+    the ledger head, the accounts (and their shards) and the beneficiaries
+    """
+    last_entry_id, _ = latest_ledger_entry(user)
+    accounts = Account.objects.filter(user=user).aggregate(**ACCOUNT_LIST_STATE)
+    beneficiaries = Beneficiary.objects.filter(user=user).aggregate(
+        count=Count('id'), last_modified=Max('updated_at')
+    )
+    return make_etag(
+        'dashboard', user.id, last_entry_id,
+        accounts['count'], accounts['last_modified'], accounts['shards_modified'],
+        beneficiaries['count'], beneficiaries['last_modified']
+    )
 
 # Account Views
-class AccountListCreateView(generics.ListCreateAPIView):
+class AccountListCreateView(ConditionalGetMixin, generics.ListCreateAPIView):
     serializer_class = AccountSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         return Account.objects.filter(user=self.request.user)
     
+    def get_validators(self):
+        state = self.get_queryset().aggregate(**ACCOUNT_LIST_STATE)
+        return account_list_validators(self.request.user, state, self.request.GET.urlencode())
+    
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-class AccountDetailView(generics.RetrieveUpdateAPIView):
+class AccountDetailView(ConditionalGetMixin, generics.RetrieveUpdateAPIView):
     serializer_class = AccountSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         return Account.objects.filter(user=self.request.user)
+    
+    def get_validators(self):
+        row = self.get_queryset().filter(
+            pk=self.kwargs['pk']
+        ).annotate(shards_modified=Max('shards__updated_at')).values_list('updated_at', 'shards_modified').first()
+        if row is None:
+            return None, None
+        updated_at = max(filter(None, row))
+        return make_etag('account', self.kwargs['pk'], updated_at), updated_at
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_account_balance(request, account_id):
+    if 'as_of' not in request.query_params:
+        cached = balance_cache.get(account_id)
+        if cached and cached['user_id'] == request.user.id:
+            return conditional_get(request, lambda: Response({
+                'account_number': cached['account_number'],
+                'balance': cached['balance'],
+                'currency': cached['currency']
+            }), etag=make_etag('balance', account_id, cached['balance']))
+    
     try:
         account = Account.objects.get(id=account_id, user=request.user)
-        return Response({
+        
+        # Historical balance: nearest snapshot plus the entries after it
+        if 'as_of' in request.query_params:
+            as_of = parse_as_of(request.query_params['as_of'])
+            if as_of is None:
+                return Response({'error': 'Invalid as_of, expected a date or datetime'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            return conditional_get(request, lambda: Response({
+                'account_number': account.account_number,
+                'balance': balance_as_of(account, as_of),
+                'currency': account.currency,
+                'as_of': as_of
+            }), etag=make_etag('balance', account_id, account.updated_at, as_of))
+        
+        balance = account.total_balance
+        balance_cache.prime(account)
+        return conditional_get(request, lambda: Response({
             'account_number': account.account_number,
-            'balance': account.balance,
+            'balance': balance,
             'currency': account.currency
-        })
+        }), etag=make_etag('balance', account_id, balance))
+    except Account.DoesNotExist:
+        return Response({'error': 'Account not found'}, status=status.HTTP_404_NOT_FOUND)
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_balance_cache_stats(request):
+    """Hit/miss counters of the balance cache in this process"""
+    return Response(balance_cache.stats())
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_balance_history(request, account_id):
+    """End-of-day balance series for the last ?days= days (default 30)"""
+    try:
+        days = int(request.query_params.get('days', 30))
+    except ValueError:
+        return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= days <= 3660:
+        return Response({'error': 'days must be between 1 and 3660'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        account = Account.objects.get(id=account_id, user=request.user)
+    except Account.DoesNotExist:
+        return Response({'error': 'Account not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    series = daily_balance_series(account, days)
+    # Money goes out as decimal strings, like the serializers' DecimalFields
+    return Response({
+        'account_number': account.account_number,
+        'currency': account.currency,
+        **series,
+        'opening_balance': str(series['opening_balance']),
+        'balances': [str(balance) for balance in series['balances']],
+    })
+
+SUMMARY_MAX_DAYS = {'day': 366, 'month': 3660}
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_account_summary(request, account_id):
+    """
+    Inflow/outflow/count per ?period=day|month (default month), read from the
+    daily rollup. Window: ?start= / ?end= dates, by default the last 30 days
+    or the last 12 months.
+    """
+    period = request.query_params.get('period', 'month')
+    if period not in SUMMARY_MAX_DAYS:
+        return Response({'error': 'period must be day or month'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        end = parse_date(request.query_params.get('end', '')) or None
+        start = parse_date(request.query_params.get('start', '')) or None
+    except ValueError:
+        end = start = None
+    if ('end' in request.query_params and end is None) or ('start' in request.query_params and start is None):
+        return Response({'error': 'start and end must be dates (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    end = end or timezone.localdate()
+    if start is None:
+        if period == 'month':
+            months = end.year * 12 + end.month - 12
+            start = end.replace(year=months // 12, month=months % 12 + 1, day=1)
+        else:
+            start = end - timedelta(days=29)
+    if not 0 <= (end - start).days < SUMMARY_MAX_DAYS[period]:
+        return Response({'error': f'The window must cover 1 to {SUMMARY_MAX_DAYS[period]} days'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        account = Account.objects.get(id=account_id, user=request.user)
     except Account.DoesNotExist:
         return Response({'error': 'Account not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response({
+        'account_number': account.account_number,
+        'currency': account.currency,
+        'period': period,
+        'start': start,
+        'end': end,
+        'results': summarize(account, period, start, end)
+    })
 
 # Transaction Views
-class TransactionListView(generics.ListAPIView):
-    serializer_class = TransactionSerializer
+def get_user_ledger(user):
+    """
+    Ledger entries of all the user's accounts, one per transaction: for a
+    transfer between two of the user's own accounts only the debit leg is kept.
+    Only COMPLETED transactions post entries: PENDING or FAILED rows (which
+    BankingService never commits, but older data may hold) are not listed.
+    """
+    return LedgerEntry.objects.filter(
+        account__user=user
+    ).exclude(
+        amount__gt=0, transaction__from_account__user=user
+    ).select_related('transaction__from_account', 'transaction__to_account')
+
+class TransactionListView(ConditionalGetMixin, generics.ListAPIView):
+    """
+    Transaction history from the ledger: completed transactions only (see
+    get_user_ledger), each with the signed amount and running balance
+    """
+    serializer_class = LedgerEntrySerializer
     permission_classes = [IsAuthenticated]
     
+    @property
+    def paginator(self):
+        # ?pagination=cursor (or a cursor from a previous page) switches to
+        # keyset pagination: no COUNT(*), constant cost per page
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or KeysetPagination.cursor_query_param in params:
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
+    
+    def get_validators(self):
+        # Ledger entries are append-only: the newest id identifies the state
+        last_id, last_created = latest_ledger_entry(self.request.user)
+        etag = make_etag('transactions', self.request.user.id, last_id, self.request.GET.urlencode())
+        return etag, last_created
+    
     def get_queryset(self):
         user = self.request.user
-        user_accounts = Account.objects.filter(user=user)
         
-        # Get all transactions where user is sender or receiver
-        queryset = Transaction.objects.filter(
-            Q(from_account__in=user_accounts) | Q(to_account__in=user_accounts)
-        ).select_related('from_account', 'to_account')
-        
-        # Filter by account if specified
+        # Filter by account if specified: that account's legs only
         account_id = self.request.query_params.get('account_id')
         if account_id:
-            queryset = queryset.filter(
-                Q(from_account__id=account_id) | Q(to_account__id=account_id)
-            )
+            queryset = LedgerEntry.objects.filter(
+                account_id=account_id, account__user=user
+            ).select_related('transaction__from_account', 'transaction__to_account')
+        else:
+            queryset = get_user_ledger(user)
         
         # Filter by type if specified
         txn_type = self.request.query_params.get('type')
         if txn_type:
-            queryset = queryset.filter(transaction_type=txn_type)
+            queryset = queryset.filter(transaction__transaction_type=txn_type)
         
         return queryset
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@idempotent
 def create_transfer(request):
     serializer = TransferSerializer(data=request.data)
     
@@ -89,21 +294,107 @@ def create_transfer(request):
                 TransactionSerializer(transaction).data,
                 status=status.HTTP_201_CREATED
             )
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except ValidationError as e:
+            return Response({'error': str(e.detail[0])}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotent
+def create_batch_transfer(request):
+    serializer = BatchTransferSerializer(data=request.data)
+    
+    if serializer.is_valid():
+        results = BankingService.create_batch_transfer(
+            serializer.validated_data['transfers'],
+            user=request.user
+        )
+        
+        items = []
+        for index, (txn, error) in enumerate(results):
+            if txn:
+                items.append({
+                    'index': index,
+                    'status': 'COMPLETED',
+                    'transaction': TransactionSerializer(txn).data
+                })
+            else:
+                items.append({'index': index, 'status': 'FAILED', 'error': error})
+        
+        succeeded = sum(1 for txn, error in results if txn)
+        return Response({
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'results': items
+        })
     
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_transfer_engine_stats(request):
+    """Retry and lock-wait counters of the transfer engine in this process"""
+    return Response(transfer_engine_stats.snapshot())
+
+RECENT_TRANSACTIONS = 10
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_recent_transactions(request):
-    user_accounts = Account.objects.filter(user=request.user)
-    transactions = Transaction.objects.filter(
-        Q(from_account__in=user_accounts) | Q(to_account__in=user_accounts)
-    ).select_related('from_account', 'to_account')[:10]
+    last_id, last_created = latest_ledger_entry(request.user)
+    
+    def render():
+        entries = get_user_ledger(request.user)[:RECENT_TRANSACTIONS]
+        serializer = LedgerEntrySerializer(entries, many=True)
+        return Response(serializer.data)
     
-    serializer = TransactionSerializer(transactions, many=True)
-    return Response(serializer.data)
+    return conditional_get(request, render,
+                           etag=make_etag('recent', request.user.id, last_id),
+                           last_modified=last_created)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_dashboard(request):
+    """
+    Everything the dashboard needs in one response: accounts with balances,
+    totals per currency, recent transactions and beneficiaries, cached per
+    user under its ETag. The ETag takes three queries on every request; a
+    cache miss runs three more to build the payload, whatever the number of
+    accounts.
+    """
+    user = request.user
+    etag = dashboard_validators(user)
+    
+    def render():
+        payload = dashboard_cache.get(user.id, etag)
+        if payload is None:
+            # Shard totals come from the same query, so total_balance needs
+            # no per-account lookup for sharded accounts. The aggregate makes
+            # it a GROUP BY query, which ignores Meta.ordering
+            accounts = list(
+                Account.objects.filter(user=user).select_related('user').annotate(
+                    shard_total=Sum('shards__balance')
+                ).order_by(*Account._meta.ordering)
+            )
+            totals = {}
+            for account in accounts:
+                totals[account.currency] = totals.get(account.currency, 0) + account.total_balance
+            
+            payload = {
+                'accounts': AccountSerializer(accounts, many=True).data,
+                'total_balance': [
+                    {'currency': currency, 'balance': balance} for currency, balance in sorted(totals.items())
+                ],
+                'recent_transactions': LedgerEntrySerializer(
+                    get_user_ledger(user)[:RECENT_TRANSACTIONS], many=True
+                ).data,
+                'beneficiaries': BeneficiarySerializer(Beneficiary.objects.filter(user=user), many=True).data,
+            }
+            dashboard_cache.set(user.id, etag, payload)
+        return Response(payload)
+    
+    return conditional_get(request, render, etag=etag)
 
 # Beneficiary Views
 class BeneficiaryListCreateView(generics.ListCreateAPIView):
@@ -123,43 +414,157 @@ class BeneficiaryDeleteView(generics.DestroyAPIView):
     def get_queryset(self):
         return Beneficiary.objects.filter(user=self.request.user)
 
+def statement_response(account, statement):
+    # Streamed from storage in chunks; FileResponse sets Content-Length
+    # Use 'inline' to view in browser or 'attachment' to force download
+    return FileResponse(
+        statement.file.open('rb'),
+        content_type='application/pdf',
+        filename=f'statement_{account.account_number}.pdf',
+        as_attachment=False
+    )
+
+def statement_pending_response(request, statement):
+    """202 pointing at the statement resource the client can poll"""
+    response = Response(StatementSerializer(statement, context={'request': request}).data,
+                        status=status.HTTP_202_ACCEPTED)
+    response['Location'] = request.build_absolute_uri(reverse('statement-detail', args=[statement.id]))
+    response['Retry-After'] = '2'
+    return response
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def download_statement(request, account_id):
+    """
+    The PDF statement of the account's current history, once rendered.
+    Read-only: statements are requested with a POST to create-statement.
+    """
+    try:
+        account = Account.objects.select_related('user').get(id=account_id, user=request.user)
+    except Account.DoesNotExist:
+        return Response({'error': 'Account not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    # Statements are cached per ledger position: unchanged history is
+    # served from storage, and revalidated with an ETag
+    statement = find_current_statement(account)
+    if statement is None:
+        return Response({'error': 'No statement has been requested for the current history'},
+                        status=status.HTTP_404_NOT_FOUND)
+    if statement.status != 'READY':
+        return statement_pending_response(request, statement)
+    
+    return conditional_get(
+        request, lambda: statement_response(account, statement),
+        etag=make_etag('statement', account.id, statement.last_entry_id)
+    )
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_statement(request, account_id):
+    """Queue PDF rendering for the account's current history"""
     try:
         account = Account.objects.get(id=account_id, user=request.user)
-        transactions = Transaction.objects.filter(
-            Q(from_account=account) | Q(to_account=account)
-        ).order_by('-created_at')[:50]
-        
-        # CORRECTION 1: Get the PDF content properly
-        # The function should return bytes or a BytesIO object
-        pdf_buffer = generate_statement_pdf(account, transactions)
-        
-        # CORRECTION 2: Handle BytesIO object properly
-        # If generate_statement_pdf returns a BytesIO object, get its value
-        if hasattr(pdf_buffer, 'getvalue'):
-            pdf_content = pdf_buffer.getvalue()
-        else:
-            pdf_content = pdf_buffer
-        
-        # CORRECTION 3: Create response with proper content
-        response = HttpResponse(pdf_content, content_type='application/pdf')
-        
-        # CORRECTION 4: Add Content-Length header for proper binary handling
-        response['Content-Length'] = len(pdf_content)
-        
-        # CORRECTION 5: Use 'inline' to view in browser or 'attachment' to force download
-        # Changed to 'inline' for easier testing
-        response['Content-Disposition'] = f'inline; filename="statement_{account.account_number}.pdf"'
-        
-        # CORRECTION 6: Add cache control headers to prevent caching issues
-        response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response['Pragma'] = 'no-cache'
-        response['Expires'] = '0'
-        
-        return response
-        
     except Account.DoesNotExist:
-        # CORRECTION 7: Return proper HttpResponse for 404, not DRF Response
-        return HttpResponse({'error': 'Account not found'}, status=404)
\ No newline at end of file
+        return Response({'error': 'Account not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    statement = request_statement(account)
+    if statement.status != 'READY':
+        return statement_pending_response(request, statement)
+    return Response(StatementSerializer(statement, context={'request': request}).data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_statement(request, pk):
+    try:
+        statement = Statement.objects.get(id=pk, account__user=request.user)
+    except Statement.DoesNotExist:
+        return Response({'error': 'Statement not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response(StatementSerializer(statement, context={'request': request}).data)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_rendered_statement(request, pk):
+    try:
+        statement = Statement.objects.select_related('account').get(id=pk, account__user=request.user)
+    except Statement.DoesNotExist:
+        return Response({'error': 'Statement not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    if statement.status != 'READY':
+        return Response({'error': 'Statement is not ready', 'status': statement.status},
+                        status=status.HTTP_409_CONFLICT)
+    
+    return conditional_get(
+        request, lambda: statement_response(statement.account, statement),
+        etag=make_etag('statement', statement.account_id, statement.last_entry_id)
+    )
+
+def export_entries(account, params):
+    """
+    (entries, output) for an export of ``account`` filtered by ``params``:
+    ?start= / ?end= (date or datetime), ?type=, ?output=csv|ndjson.
+    Invalid parameters raise ValueError with the message for the client.
+    """
+    output = params.get('output', 'csv')
+    if output not in ('csv', 'ndjson'):
+        raise ValueError('output must be csv or ndjson')
+    
+    entries = LedgerEntry.objects.filter(account=account)
+    
+    # Filter by date range if specified
+    for param, lookup, end_of_day in (('start', 'created_at__gte', False), ('end', 'created_at__lte', True)):
+        if param in params:
+            bound = parse_as_of(params[param], end_of_day=end_of_day)
+            if bound is None:
+                raise ValueError(f'Invalid {param}, expected a date or datetime')
+            entries = entries.filter(**{lookup: bound})
+    
+    # Filter by type if specified
+    txn_type = params.get('type')
+    if txn_type:
+        if txn_type not in dict(Transaction.TRANSACTION_TYPES):
+            raise ValueError('Unknown transaction type')
+        entries = entries.filter(transaction__transaction_type=txn_type)
+    
+    return entries, output
+
+def export_response(account, output, content):
+    content_type = 'application/x-ndjson' if output == 'ndjson' else 'text/csv'
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="transactions_{account.account_number}.{output}"'
+    response['Cache-Control'] = 'no-store'
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_transactions(request, account_id):
+    """
+    Stream an account's full history as CSV (default) or NDJSON.
+    Filters: ?start= / ?end= (date or datetime), ?type=, ?output=csv|ndjson
+    """
+    try:
+        account = Account.objects.get(id=account_id, user=request.user)
+    except Account.DoesNotExist:
+        return Response({'error': 'Account not found'}, status=status.HTTP_404_NOT_FOUND)
+    
+    try:
+        entries, output = export_entries(account, request.query_params)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    rows = export_rows(entries)
+    return export_response(account, output, stream_ndjson(rows) if output == 'ndjson' else stream_csv(rows))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_event_ticket(request):
+    """
+    A single-use ticket for the event stream (GET events/?ticket=...),
+    which EventSource opens without an Authorization header
+    """
+    ticket = issue_stream_ticket(request.user, request.auth)
+    return Response({
+        'ticket': ticket,
+        'expires_in': get_events_settings()['TICKET_TTL']
+    }, status=status.HTTP_201_CREATED)
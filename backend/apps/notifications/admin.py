@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import OutboxEvent
 
-# Register your models here.
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event_type', 'status', 'attempts', 'created_at', 'delivered_at')
+    list_filter = ('status', 'event_type')
+    readonly_fields = ('event_type', 'payload', 'delivered_to', 'last_error', 'created_at', 'delivered_at')
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class NotificationsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'notifications'
+    name = 'apps.notifications'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from apps.notifications.outbox import Dispatcher
+
+
+class Command(BaseCommand):
+    help = ("Deliver pending notification outbox events to the configured sinks. "
+            "Several dispatchers may run at once; each claims its own batches")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no event is due instead of polling')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to wait when no event is due')
+
+    def handle(self, *args, **options):
+        dispatcher = Dispatcher()
+        delivered = failed = 0
+        try:
+            while True:
+                batch_delivered, batch_failed = dispatcher.run_once()
+                delivered += batch_delivered
+                failed += batch_failed
+                if batch_delivered or batch_failed:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            dispatcher.close()
+        self.stdout.write(self.style.SUCCESS(f"Delivered {delivered} events, {failed} not delivered"))
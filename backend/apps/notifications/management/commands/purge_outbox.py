@@ -0,0 +1,22 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.notifications.models import OutboxEvent
+
+
+class Command(BaseCommand):
+    help = "Delete delivered outbox events older than --days"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted = 0
+        while True:
+            ids = list(OutboxEvent.objects.filter(status='DELIVERED', delivered_at__lte=cutoff).values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted += OutboxEvent.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} delivered outbox events"))
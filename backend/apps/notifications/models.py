@@ -1,3 +1,39 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class OutboxEvent(models.Model):
+    """
+    A notification waiting to be delivered, written in the same database
+    transaction as the change it reports (see signals.py) and delivered to
+    the configured sinks by ``manage.py dispatch_outbox``.
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('DELIVERED', 'Delivered'),
+        ('FAILED', 'Failed'),
+    ]
+    
+    event_type = models.CharField(max_length=50)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When the event may next be claimed: pushed forward by the lease of a
+    # dispatcher working on it and by the retry delay after a failure
+    available_at = models.DateTimeField(default=timezone.now)
+    # Names of the sinks that have accepted the event, so a retry only
+    # goes to the ones that failed
+    delivered_to = models.JSONField(default=list, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at', 'id'], name='outbox_pending_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.event_type} #{self.id} ({self.status})"
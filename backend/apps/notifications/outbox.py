@@ -0,0 +1,132 @@
+"""
+Delivery of OutboxEvent rows to the configured sinks.
+
+A dispatcher claims a batch of due events with SELECT ... FOR UPDATE SKIP
+LOCKED and leases them by moving available_at forward, then commits, so
+other dispatchers skip the batch while it is sent. The lease is at least
+LEASE seconds, and longer if sending a whole batch can take more (see
+Dispatcher.lease_seconds). Each event goes to every sink that has not
+accepted it yet, all of a batch concurrently; events a sink rejected are
+retried with exponential backoff until MAX_ATTEMPTS, then marked FAILED.
+"""
+import logging
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OUTBOX_SETTINGS = {
+    'SINKS': [
+        {'NAME': 'console', 'BACKEND': 'apps.notifications.sinks.ConsoleSink'},
+    ],
+    'BATCH_SIZE': 100,
+    'CONCURRENCY': 8,
+    'MAX_ATTEMPTS': 8,
+    'LEASE': 60,        # minimum seconds a claimed batch is hidden from other dispatchers
+    'RETRY_DELAY': 5,   # seconds before the first retry, doubled after each failure
+}
+
+
+def get_outbox_settings():
+    return {**DEFAULT_OUTBOX_SETTINGS, **getattr(settings, 'NOTIFICATIONS_OUTBOX', {})}
+
+
+def load_sinks(config):
+    return [
+        import_string(entry['BACKEND'])(entry['NAME'], **entry.get('OPTIONS', {}))
+        for entry in config
+    ]
+
+
+class Dispatcher:
+    def __init__(self, options=None):
+        self.options = options or get_outbox_settings()
+        self.sinks = load_sinks(self.options['SINKS'])
+        self.executor = ThreadPoolExecutor(max_workers=self.options['CONCURRENCY'],
+                                           thread_name_prefix='outbox')
+        self.lease = self.lease_seconds()
+
+    def lease_seconds(self):
+        """
+        LEASE, or the worst case of a batch if longer: BATCH_SIZE events
+        for each sink, CONCURRENCY at a time, each taking up to twice the
+        slowest sink's timeout (connecting, then waiting for the response)
+        """
+        rounds = math.ceil(self.options['BATCH_SIZE'] * len(self.sinks) / self.options['CONCURRENCY'])
+        slowest = max((sink.timeout for sink in self.sinks), default=0)
+        return max(self.options['LEASE'], math.ceil(rounds * 2 * slowest))
+
+    def close(self):
+        self.executor.shutdown()
+
+    def claim(self):
+        """Lease the next batch of due events; returns them"""
+        now = timezone.now()
+        with transaction.atomic():
+            events = list(
+                OutboxEvent.objects.select_for_update(skip_locked=True)
+                .filter(status='PENDING', available_at__lte=now)
+                .order_by('id')[:self.options['BATCH_SIZE']]
+            )
+            if events:
+                OutboxEvent.objects.filter(id__in=[event.id for event in events]).update(
+                    available_at=now + timedelta(seconds=self.lease),
+                    attempts=F('attempts') + 1,
+                )
+        for event in events:
+            event.attempts += 1
+        return events
+
+    def _send(self, sink, event):
+        try:
+            sink.send(event)
+        except Exception as e:
+            logger.warning("Sink %s failed on outbox event %s: %s", sink.name, event.id, e)
+            return f"{sink.name}: {e}"
+        return None
+
+    def dispatch(self, events):
+        """Send ``events`` to their pending sinks and record the outcome"""
+        work = [
+            (event, sink, self.executor.submit(self._send, sink, event))
+            for event in events
+            for sink in self.sinks
+            if sink.name not in event.delivered_to
+        ]
+        errors = {}
+        for event, sink, future in work:
+            error = future.result()
+            if error is None:
+                event.delivered_to.append(sink.name)
+            else:
+                errors.setdefault(event.id, []).append(error)
+
+        now = timezone.now()
+        for event in events:
+            if event.id not in errors:
+                event.status, event.delivered_at, event.last_error = 'DELIVERED', now, ''
+                continue
+            event.last_error = '\n'.join(errors[event.id])
+            if event.attempts >= self.options['MAX_ATTEMPTS']:
+                event.status = 'FAILED'
+            else:
+                delay = self.options['RETRY_DELAY'] * 2 ** (event.attempts - 1)
+                event.available_at = now + timedelta(seconds=delay)
+        OutboxEvent.objects.bulk_update(
+            events, ['status', 'available_at', 'delivered_to', 'last_error', 'delivered_at']
+        )
+        return len(events) - len(errors), len(errors)
+
+    def run_once(self):
+        """Claim and send one batch; returns (delivered, failed) counts"""
+        events = self.claim()
+        if not events:
+            return 0, 0
+        return self.dispatch(events)
@@ -0,0 +1,28 @@
+from django.dispatch import receiver
+from apps.banking.signals import transaction_recorded
+from .models import OutboxEvent
+
+
+def transaction_payload(txn, owners):
+    return {
+        'transaction_id': txn.id,
+        'reference_number': txn.reference_number,
+        'transaction_type': txn.transaction_type,
+        'amount': txn.amount,
+        'from_account': txn.from_account_id,
+        'to_account': txn.to_account_id,
+        # Users to notify: the owners of both sides
+        'users': sorted({owners.get(txn.from_account_id), owners.get(txn.to_account_id)} - {None}),
+        'created_at': txn.created_at,
+    }
+
+
+@receiver(transaction_recorded)
+def write_outbox(sender, transactions, accounts, **kwargs):
+    # Inside the transfer's atomic block: the events commit or roll back
+    # with it, and one INSERT covers a whole batch
+    owners = {account.id: account.user_id for account in accounts}
+    OutboxEvent.objects.bulk_create([
+        OutboxEvent(event_type='transaction.completed', payload=transaction_payload(txn, owners))
+        for txn in transactions
+    ])
@@ -0,0 +1,83 @@
+"""
+Destinations for outbox events. A sink is configured by an entry of
+NOTIFICATIONS_OUTBOX['SINKS'] and receives each event once it commits
+(at least once: a dispatcher that dies mid-batch redelivers after its
+lease). send() raises to have the event retried.
+"""
+import hashlib
+import hmac
+import json
+import sys
+import threading
+import urllib.request
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+def event_message(event):
+    return {
+        'id': event.id,
+        'type': event.event_type,
+        'payload': event.payload,
+        'created_at': event.created_at,
+    }
+
+
+class BaseSink:
+    # Longest a send() may block, in seconds: dispatchers size the lease
+    # of a claimed batch from it
+    timeout = 1
+
+    def __init__(self, name, **options):
+        self.name = name
+
+    def send(self, event):
+        raise NotImplementedError
+
+
+class ConsoleSink(BaseSink):
+    """Writes each event to stdout as a line of JSON"""
+    _lock = threading.Lock()
+
+    def send(self, event):
+        line = json.dumps(event_message(event), cls=DjangoJSONEncoder)
+        with self._lock:
+            sys.stdout.write(line + '\n')
+            sys.stdout.flush()
+
+
+class FileSink(BaseSink):
+    """Appends each event to ``path`` as a line of JSON, for tests and local runs"""
+
+    def __init__(self, name, path, **options):
+        super().__init__(name)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, event):
+        line = json.dumps(event_message(event), cls=DjangoJSONEncoder)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+class WebhookSink(BaseSink):
+    """
+    POSTs each event as JSON to ``url``. With ``secret`` set, the body is
+    signed in an X-Signature header (hex HMAC-SHA256). Receivers should
+    drop duplicates by the event id.
+    """
+
+    def __init__(self, name, url, secret=None, timeout=5, **options):
+        super().__init__(name)
+        self.url = url
+        self.secret = secret
+        self.timeout = timeout
+
+    def send(self, event):
+        body = json.dumps(event_message(event), cls=DjangoJSONEncoder).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.secret:
+            headers['X-Signature'] = hmac.new(self.secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+        request = urllib.request.Request(self.url, data=body, headers=headers, method='POST')
+        # Non-2xx responses raise HTTPError
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
@@ -1,3 +1,120 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from apps.banking.models import Account
+from apps.banking.services import BankingService
+from .models import OutboxEvent
+from .outbox import DEFAULT_OUTBOX_SETTINGS, Dispatcher
+from .sinks import BaseSink
 
-# Create your tests here.
+
+class RecordingSink(BaseSink):
+    """Test sink: records the events it accepts, fails while ``failures`` lasts"""
+    sent = {}
+    failures = {}
+
+    def send(self, event):
+        if self.failures.get(self.name, 0) > 0:
+            self.failures[self.name] -= 1
+            raise ConnectionError('sink down')
+        self.sent.setdefault(self.name, []).append(event.id)
+
+
+class OutboxWriteTests(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='x')
+        self.bob = User.objects.create_user('bob', password='x')
+        self.source = Account.objects.create(user=self.alice, balance=Decimal('100.00'))
+        self.destination = Account.objects.create(user=self.bob)
+
+    def test_transfer_writes_one_event_for_both_owners(self):
+        txn = BankingService.create_transfer(self.source.id, self.destination.account_number, Decimal('10.00'))
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.event_type, event.status), ('transaction.completed', 'PENDING'))
+        self.assertEqual(event.payload['reference_number'], txn.reference_number)
+        self.assertEqual(event.payload['users'], sorted([self.alice.id, self.bob.id]))
+
+    def test_batch_writes_one_event_per_transaction(self):
+        item = {'from_account_id': self.source.id, 'to_account_number': self.destination.account_number,
+                'amount': Decimal('10.00')}
+        BankingService.create_batch_transfer([item, item, {**item, 'amount': Decimal('500.00')}], user=self.alice)
+
+        self.assertEqual(OutboxEvent.objects.count(), 2)
+
+    def test_failed_transfer_writes_nothing(self):
+        with self.assertRaises(ValidationError):
+            BankingService.create_transfer(self.source.id, self.destination.account_number, Decimal('500.00'))
+
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+class DispatcherTests(TestCase):
+
+    def setUp(self):
+        RecordingSink.sent, RecordingSink.failures = {}, {}
+        self.dispatcher = Dispatcher({**DEFAULT_OUTBOX_SETTINGS, 'MAX_ATTEMPTS': 2, 'CONCURRENCY': 2, 'SINKS': [
+            {'NAME': 'first', 'BACKEND': 'apps.notifications.tests.RecordingSink'},
+            {'NAME': 'second', 'BACKEND': 'apps.notifications.tests.RecordingSink'},
+        ]})
+        self.addCleanup(self.dispatcher.close)
+        self.event = OutboxEvent.objects.create(event_type='test', payload={})
+
+    def make_due(self):
+        OutboxEvent.objects.update(available_at=timezone.now())
+
+    def test_delivers_to_every_sink(self):
+        self.assertEqual(self.dispatcher.run_once(), (1, 0))
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.status, 'DELIVERED')
+        self.assertEqual(RecordingSink.sent, {'first': [self.event.id], 'second': [self.event.id]})
+        self.assertEqual(self.dispatcher.run_once(), (0, 0))
+
+    def test_claimed_batch_is_leased(self):
+        self.assertEqual([event.id for event in self.dispatcher.claim()], [self.event.id])
+
+        self.assertEqual(self.dispatcher.claim(), [])
+
+    def test_lease_covers_a_batch_of_slow_sends(self):
+        webhook = {'NAME': 'webhook', 'BACKEND': 'apps.notifications.sinks.WebhookSink',
+                   'OPTIONS': {'url': 'http://localhost/', 'timeout': 5}}
+        dispatcher = Dispatcher({**DEFAULT_OUTBOX_SETTINGS, 'BATCH_SIZE': 100, 'CONCURRENCY': 8, 'LEASE': 60,
+                                 'SINKS': [webhook]})
+        self.addCleanup(dispatcher.close)
+        # 13 rounds of 8 sends, each up to 2 x 5s
+        self.assertEqual(dispatcher.lease, 130)
+
+        before = timezone.now()
+        dispatcher.claim()
+        self.event.refresh_from_db()
+        self.assertGreaterEqual(self.event.available_at, before + timedelta(seconds=130))
+
+    def test_retry_goes_only_to_the_failed_sink(self):
+        RecordingSink.failures = {'second': 1}
+
+        with self.assertLogs('apps.notifications.outbox', 'WARNING'):
+            self.assertEqual(self.dispatcher.run_once(), (0, 1))
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.status, self.event.delivered_to), ('PENDING', ['first']))
+        self.assertGreater(self.event.available_at, timezone.now() + timedelta(seconds=1))
+
+        self.make_due()
+        self.assertEqual(self.dispatcher.run_once(), (1, 0))
+        self.assertEqual(RecordingSink.sent, {'first': [self.event.id], 'second': [self.event.id]})
+
+    def test_gives_up_after_max_attempts(self):
+        RecordingSink.failures = {'first': 5}
+
+        with self.assertLogs('apps.notifications.outbox', 'WARNING'):
+            self.dispatcher.run_once()
+            self.make_due()
+            self.dispatcher.run_once()
+
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.status, self.event.attempts), ('FAILED', 2))
+        self.assertIn('sink down', self.event.last_error)
@@ -8,8 +8,20 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Async views for the read-only endpoints; set DJANGO_ROOT_URLCONF=config.urls
+# to serve the synchronous views only
+os.environ.setdefault('DJANGO_ROOT_URLCONF', 'config.urls_async')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+
+from apps.banking.events import check_broker  # noqa: E402
+from .handlers import StreamingASGIHandler  # noqa: E402
+
+# Fail now rather than silently drop events published by other workers
+check_broker()
+
+# get_asgi_application(), with event streams served without a thread each
+application = StreamingASGIHandler()
@@ -0,0 +1,20 @@
+from django.core.handlers.asgi import ASGIHandler
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """
+    ASGIHandler that holds long-lived event streams without a thread each.
+
+    Django gives every ASGI request a thread of its own for synchronous
+    work (signals, ORM calls), kept until the response finishes: for an
+    event stream open for an hour, that is an idle thread per connection.
+    Requests to ``shared_thread_paths`` run their few, short synchronous
+    steps on the process-wide sync thread instead.
+    """
+    shared_thread_paths = ('/api/banking/events/',)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] in self.shared_thread_paths:
+            await self.handle(scope, receive, send)
+        else:
+            await super().__call__(scope, receive, send)
@@ -63,12 +63,13 @@ INSTALLED_APPS = [
     # Local apps
     'apps.accounts',
     'apps.banking',
+    'apps.notifications',
 ]
 
 # Middleware configuration
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'config.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,8 +79,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-# URL configuration
-ROOT_URLCONF = 'config.urls'
+# URL configuration: asgi.py switches to config.urls_async, which serves
+# the read-only endpoints with async views
+ROOT_URLCONF = os.getenv('DJANGO_ROOT_URLCONF', 'config.urls')
 
 # Templates
 TEMPLATES = [
@@ -125,7 +127,7 @@ else:
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.accounts.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -140,6 +142,15 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'apps.accounts.serializers.RotatingTokenRefreshSerializer',
+}
+
+# Blacklist of rotated refresh tokens (apps/accounts/blacklist.py). Each
+# process keeps a Bloom filter of the blacklisted token ids
+TOKEN_BLACKLIST = {
+    'CAPACITY': 1_000_000,  # ids before the filter is rebuilt (~1.8 MB at the error rate below)
+    'ERROR_RATE': 0.001,    # share of unknown ids that still cost a lookup query
+    'SYNC_INTERVAL': 5,     # seconds between pulls of other processes' entries
 }
 
 # Password Validation
@@ -179,4 +190,99 @@ SECURE_CONTENT_TYPE_NOSNIFF = True
 X_FRAME_OPTIONS = 'DENY'
 
 # URL settings to prevent conflicts
-APPEND_SLASH = True
\ No newline at end of file
+APPEND_SLASH = True
+# Transfer engine: retries for deadlocks / serialization failures
+BANKING_TRANSFER_RETRY = {
+    'MAX_ATTEMPTS': int(os.getenv('TRANSFER_RETRY_MAX_ATTEMPTS', '5')),
+    'BASE_DELAY': 0.02,  # seconds, doubled on every attempt
+    'MAX_DELAY': 0.5,    # cap for a single backoff sleep
+}
+
+# Transfer execution strategy: 'locking' (SELECT FOR UPDATE) or
+# 'conditional' (guarded single-statement UPDATEs)
+BANKING_TRANSFER_MODE = os.getenv('TRANSFER_MODE', 'locking')
+
+# Cache framework: local memory by default, point CACHES at Redis/Memcached
+# to share cached balances between workers
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'bank-demo',
+    }
+}
+
+# Authenticated users and profiles, so token authentication skips the
+# User query (see apps/accounts/cache.py)
+ACCOUNTS_USER_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 60,  # seconds; bounds staleness after writes that bypass signals
+}
+
+# Balance cache used by the balance endpoint and AccountSerializer
+BANKING_BALANCE_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,  # seconds
+    # With a per-process cache (LocMemCache) other workers never see a
+    # write: their entries expire after this many seconds instead
+    'LOCAL_TIMEOUT': 2,
+}
+
+# Rendered PDF statements (private, never served from MEDIA_URL). Queued
+# statements are rendered by `manage.py process_statements --loop`
+STATEMENTS_ROOT = Path(os.getenv('STATEMENTS_ROOT', BASE_DIR / 'private'))
+
+# Profile picture variants: render threads per process (0 = leave new
+# pictures to `manage.py process_profile_pictures`)
+ACCOUNTS_PICTURE_WORKERS = int(os.getenv('PICTURE_WORKERS', '1'))
+
+# Account numbers reserved per database round trip by each process
+BANKING_SEQUENCE_BLOCK_SIZE = int(os.getenv('SEQUENCE_BLOCK_SIZE', '100'))
+
+# Seconds a process holds its transaction-reference worker id without
+# renewing it (renewed after half of this); 1024 ids are shared by all
+# processes, and the id of a crashed one is free again after this
+BANKING_REFERENCE_WORKER_LEASE = int(os.getenv('REFERENCE_WORKER_LEASE', '600'))
+
+# Idempotency-Key support on money-moving endpoints (seconds)
+BANKING_IDEMPOTENCY = {
+    'TTL': 24 * 60 * 60,   # how long a stored response is replayed
+    'LOCK_TIMEOUT': 60,    # an unfinished request's claim expires after this
+    'WAIT_TIMEOUT': 10,    # how long a concurrent duplicate waits for the result
+    'POLL_INTERVAL': 0.05,
+}
+
+# Per-user dashboard payload cache, keyed by its ETag (database validators)
+BANKING_DASHBOARD_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,  # seconds
+}
+
+# Server-sent balance/transaction events (ASGI only). LocalBroker reaches
+# subscribers in the publishing process; with several workers use
+# 'apps.banking.events.PostgresBroker'
+BANKING_EVENTS = {
+    'BACKEND': os.getenv('EVENTS_BACKEND', 'apps.banking.events.LocalBroker'),
+    'QUEUE_SIZE': 100,  # events buffered per connection before a resync
+    'HEARTBEAT': 15,    # seconds between keep-alive comments
+    'TICKET_TTL': 30,   # seconds a stream ticket stays valid
+    # Worker processes serving the stream (uvicorn and gunicorn read
+    # WEB_CONCURRENCY): with more than one, asgi.py refuses LocalBroker
+    'WORKERS': int(os.getenv('WEB_CONCURRENCY', '1')),
+}
+
+# Transaction notifications, written to an outbox table with each transfer
+# and delivered by `manage.py dispatch_outbox`. SINKS entries take a NAME
+# (recorded per delivered event: keep it stable), a BACKEND class and its
+# OPTIONS, e.g. {'NAME': 'webhook', 'BACKEND':
+# 'apps.notifications.sinks.WebhookSink', 'OPTIONS': {'url': ..., 'secret': ...}}
+NOTIFICATIONS_OUTBOX = {
+    'SINKS': [
+        {'NAME': 'console', 'BACKEND': 'apps.notifications.sinks.ConsoleSink'},
+    ],
+    'BATCH_SIZE': 100,
+    'CONCURRENCY': 8,   # sink calls in flight per dispatcher
+    'MAX_ATTEMPTS': 8,
+    'LEASE': 60,        # minimum seconds a claimed batch is hidden from other dispatchers
+                        # (longer when BATCH_SIZE / CONCURRENCY x sink timeout needs it)
+    'RETRY_DELAY': 5,   # seconds before the first retry, doubled after each failure
+}
@@ -0,0 +1,19 @@
+"""
+URL configuration for ASGI deployments (see asgi.py): the read-only
+endpoints below are served by async views, everything else by the
+synchronous views of config.urls. The event stream exists only here: under
+WSGI each open stream would hold a worker thread.
+"""
+from django.urls import path
+from apps.accounts import async_views as account_views
+from apps.banking import async_views as banking_views
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/auth/profile/', account_views.get_user_profile),
+    path('api/banking/accounts/', banking_views.account_list),
+    path('api/banking/accounts/<int:account_id>/balance/', banking_views.get_account_balance),
+    path('api/banking/transactions/recent/', banking_views.get_recent_transactions),
+    path('api/banking/accounts/<int:account_id>/export/', banking_views.export_transactions),
+    path('api/banking/events/', banking_views.event_stream, name='event-stream'),
+] + sync_urlpatterns
@@ -1,25 +1,40 @@
 import React from 'react';
 
 const ProfilePicture = ({ user, size = 40, className = '' }) => {
+  // Relative media URLs are served by the backend host
+  const resolveUrl = (pictureUrl) => {
+    // If it's already a full URL, use it as-is
+    if (pictureUrl.startsWith('http')) {
+      return pictureUrl;
+    }
+    
+    // If it starts with /media/, add the backend URL
+    if (pictureUrl.startsWith('/media/')) {
+      return `https://bank-demo-production.up.railway.app${pictureUrl}`;
+    }
+    
+    // If it's just a filename, construct the full URL
+    return `https://bank-demo-production.up.railway.app/media/profiles/${pictureUrl}`;
+  };
+
+  // The smallest resized variant that still looks sharp at this size, once
+  // the backend has rendered them; the original upload until then
+  const getVariant = () => {
+    const variants = user?.profile?.profile_picture_variants;
+    if (!variants) {
+      return null;
+    }
+    const pixels = size * (window.devicePixelRatio || 1);
+    return pixels <= variants.thumbnail.size ? variants.thumbnail : variants.medium;
+  };
+
   const getProfilePictureUrl = () => {
+    const variant = getVariant();
+    if (variant) {
+      return resolveUrl(variant.jpeg);
+    }
     if (user?.profile?.profile_picture) {
-      console.log('Raw profile picture URL:', user.profile.profile_picture); // Debug
-      
-      // Handle different URL formats
-      let pictureUrl = user.profile.profile_picture;
-      
-      // If it's already a full URL, use it as-is
-      if (pictureUrl.startsWith('http')) {
-        return pictureUrl;
-      }
-      
-      // If it starts with /media/, add the backend URL
-      if (pictureUrl.startsWith('/media/')) {
-        return `https://bank-demo-production.up.railway.app${pictureUrl}`;
-      }
-      
-      // If it's just a filename, construct the full URL
-      return `https://bank-demo-production.up.railway.app/media/profiles/${pictureUrl}`;
+      return resolveUrl(user.profile.profile_picture);
     }
     return null;
   };
@@ -32,8 +47,7 @@ const ProfilePicture = ({ user, size = 40, className = '' }) => {
   };
 
   const profilePictureUrl = getProfilePictureUrl();
-  
-  console.log('Final profile picture URL:', profilePictureUrl); // Debug
+  const variant = getVariant();
 
   return (
     <div 
@@ -54,22 +68,22 @@ const ProfilePicture = ({ user, size = 40, className = '' }) => {
       }}
     >
       {profilePictureUrl ? (
-        <img 
-          src={profilePictureUrl} 
-          alt={`${user?.username}'s profile`}
-          style={{ 
-            width: '100%', 
-            height: '100%', 
-            objectFit: 'cover' 
-          }}
-          onError={(e) => {
-            console.error('Image failed to load:', profilePictureUrl);
-            e.target.style.display = 'none';
-          }}
-          onLoad={() => {
-            console.log('Image loaded successfully:', profilePictureUrl);
-          }}
-        />
+        <picture style={{ width: '100%', height: '100%' }}>
+          {variant && <source srcSet={resolveUrl(variant.webp)} type="image/webp" />}
+          <img 
+            src={profilePictureUrl} 
+            alt={`${user?.username}'s profile`}
+            style={{ 
+              width: '100%', 
+              height: '100%', 
+              objectFit: 'cover' 
+            }}
+            onError={(e) => {
+              console.error('Image failed to load:', profilePictureUrl);
+              e.target.style.display = 'none';
+            }}
+          />
+        </picture>
       ) : (
         <span>{getInitials()}</span>
       )}
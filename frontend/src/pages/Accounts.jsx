@@ -50,14 +50,29 @@ const Accounts = () => {
         return;
       }
       
-      const response = await fetch(
-        `https://bank-demo-production.up.railway.app/api/banking/accounts/${accountId}/statement/`,
-        {
-          headers: {
-            'Authorization': `Bearer ${token}`
-          }
-        }
+      const headers = { 'Authorization': `Bearer ${token}` };
+      // Request (or reuse) the statement of the current history
+      let response = await fetch(
+        `https://bank-demo-production.up.railway.app/api/banking/accounts/${accountId}/statements/`,
+        { method: 'POST', headers }
       );
+      if (!response.ok) {
+        throw new Error('Failed to request statement');
+      }
+      
+      // Not rendered yet (202): poll it until it is ready
+      let statement = await response.json();
+      const statusUrl = `https://bank-demo-production.up.railway.app/api/banking/statements/${statement.id}/`;
+      for (let attempt = 0; !statement.download_url && statement.status !== 'FAILED' && attempt < 30; attempt++) {
+        await new Promise((resolve) => setTimeout(resolve, 2000));
+        const polled = await fetch(statusUrl, { headers });
+        if (!polled.ok) break;
+        statement = await polled.json();
+      }
+      if (!statement.download_url) {
+        throw new Error('Statement is not ready');
+      }
+      response = await fetch(statement.download_url, { headers });
       
       if (!response.ok) {
         throw new Error('Failed to download statement');
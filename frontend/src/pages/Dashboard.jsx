@@ -4,7 +4,7 @@ import React, { useState, useEffect } from 'react';
 import { useAuth } from '../context/AuthContext';
 import { Link } from 'react-router-dom';
 import accountService from '../services/accountService';
-import transactionService from '../services/transactionService';
+import eventService from '../services/eventService';
 import Card from '../components/common/Card';
 import ProfilePicture from '../components/ProfilePicture'; // ADD THIS IMPORT
 
@@ -18,20 +18,39 @@ const Dashboard = () => {
 
   useEffect(() => {
     fetchDashboardData();
+
+    // Pushed updates instead of polling: balances are patched in place,
+    // anything else reloads the (cached) dashboard in the background
+    const refresh = () => fetchDashboardData(false);
+    return eventService.subscribe({
+      balance: (event) => {
+        if (event.balance === null) {
+          refresh();  // Sharded account: only the server knows the total
+          return;
+        }
+        setAccounts((previous) => previous.map((account) =>
+          account.id === event.account_id ? { ...account, balance: event.balance } : account
+        ));
+      },
+      transaction: refresh,
+      resync: refresh,
+      ready: ({ reconnected }) => reconnected && refresh(),
+    });
   }, []);
 
-  const fetchDashboardData = async () => {
+  useEffect(() => {
+    setTotalBalance(accounts.reduce((sum, account) => sum + (parseFloat(account.balance) || 0), 0));
+  }, [accounts]);
+
+  const fetchDashboardData = async (showSpinner = true) => {
     try {
-      setLoading(true);
+      setLoading(showSpinner);
       setError('');
       
-      // Fetch accounts
-      const accountsData = await accountService.getAccounts();
-      console.log('Accounts Data:', accountsData); // DEBUG
-      
-      // Fetch transactions
-      const transactionsData = await transactionService.getRecentTransactions();
-      console.log('Transactions Data:', transactionsData); // DEBUG
+      // Fetch accounts and recent transactions in a single request
+      const dashboard = await accountService.getDashboard();
+      const accountsData = dashboard.accounts || [];
+      const transactionsData = dashboard.recent_transactions || [];
 
       setAccounts(accountsData);
       setTransactions(transactionsData);
@@ -42,7 +61,6 @@ const Dashboard = () => {
         return sum + balance;
       }, 0);
       
-      console.log('Total Balance:', total); // DEBUG
       setTotalBalance(total);
       
     } catch (error) {
@@ -22,6 +22,12 @@ const accountService = {
     const response = await api.get(`/banking/accounts/${accountId}/balance/`);
     return response.data;
   },
+
+  // Accounts, recent transactions and beneficiaries in one request
+  getDashboard: async () => {
+    const response = await api.get('/banking/dashboard/');
+    return response.data;
+  },
 };
 
 export default accountService;
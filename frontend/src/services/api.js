@@ -1,6 +1,6 @@
 import axios from 'axios';
 
-const API_URL = 'https://bank-demo-production.up.railway.app/api';  // ← CHANGED THIS LINE
+export const API_URL = 'https://bank-demo-production.up.railway.app/api';  // ← CHANGED THIS LINE
 
 const api = axios.create({
   baseURL: API_URL,
@@ -0,0 +1,68 @@
+import api, { API_URL } from './api';
+
+const EVENT_TYPES = ['balance', 'transaction', 'resync'];
+
+const eventService = {
+  // Live balance and transaction events (server-sent events). `handlers`
+  // maps event types to callbacks; `ready` is called with
+  // { reconnected: true } after a reconnect, when events may have been
+  // missed. Returns a function that closes the stream.
+  subscribe: (handlers) => {
+    let source = null;
+    let closed = false;
+    let connected = false;
+    let retryDelay = 1000;
+
+    const open = async () => {
+      if (closed || !localStorage.getItem('access_token')) return;
+
+      // EventSource cannot send headers: open the stream with a single-use
+      // ticket, minted by an authenticated request (which also refreshes
+      // an expired access token)
+      let ticket;
+      try {
+        ({ data: { ticket } } = await api.post('/banking/events/tickets/'));
+      } catch (error) {
+        if (error.response?.status !== 401) retry();
+        return;
+      }
+      if (closed) return;
+      source = new EventSource(`${API_URL}/banking/events/?ticket=${encodeURIComponent(ticket)}`);
+
+      source.addEventListener('ready', () => {
+        handlers.ready?.({ reconnected: connected });
+        connected = true;
+        retryDelay = 1000;
+      });
+      EVENT_TYPES.forEach((type) => {
+        source.addEventListener(type, (event) => handlers[type]?.(JSON.parse(event.data)));
+      });
+      source.addEventListener('token_expired', reopen);
+      // A ticket opens one connection: EventSource's own reconnect would
+      // reuse it, so every dropped connection reopens with a new one
+      source.onerror = reopen;
+    };
+
+    const reopen = () => {
+      // Both token_expired and the error of the closing stream land here
+      if (!source) return;
+      source.close();
+      source = null;
+      retry();
+    };
+
+    const retry = () => {
+      // Back off while the stream is unavailable (e.g. served over WSGI)
+      setTimeout(open, retryDelay);
+      retryDelay = Math.min(retryDelay * 2, 60000);
+    };
+
+    open();
+    return () => {
+      closed = true;
+      source?.close();
+    };
+  },
+};
+
+export default eventService;